@@ -0,0 +1,238 @@
+import os
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional
+from sqlalchemy import func, case, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from . import models
+from .changes import settled_before
+
+# Test pass/fail analytics.
+#
+# test_result_rollup holds one row of counts per day, part type, part
+# number, product and test type. refresh_rollup() folds the test results
+# added since the last refresh into it, so failure rate questions are
+# answered from a few thousand rollup rows instead of a join over every
+# result. The rollup_watermarks row remembers the last result_id folded in
+# and is locked for the refresh, so concurrent refreshes cannot count a
+# result twice.
+#
+# Results younger than the change feed's settle delay are left for the next
+# refresh: a transaction that took a lower result_id may still be about to
+# commit, and the watermark must not move past it. created_at is stamped by
+# the database clock, which is the clock settled_before reads.
+#
+# A result is attributed to the part and test type its test has when it is
+# folded in. Retyping a test or moving it to another part afterwards is only
+# picked up by rebuild_rollup().
+#
+# The inventory has no vendor column; name_product is the closest grouping
+# and is offered next to part_type and part_number.
+
+ROLLUP_NAME = "test_results"
+ROLLUP_BATCH_SIZE = int(os.getenv("ROLLUP_BATCH_SIZE", "50000"))
+# A read refreshes the rollup first when the last refresh is older than this
+ROLLUP_REFRESH_SECONDS = int(os.getenv("ROLLUP_REFRESH_SECONDS", "30"))
+
+PASS_RESULTS = ("pass", "passed", "ok", "success", "successful")
+FAIL_RESULTS = ("fail", "failed", "failure", "error")
+
+DIMENSIONS = {
+    "part_type": models.TestResultRollup.part_type,
+    "part_number": models.TestResultRollup.part_number,
+    "name_product": models.TestResultRollup.name_product,
+    "test_type": models.TestResultRollup.test_type,
+}
+WINDOWS = ("day", "week", "month", "all")
+
+# Lock the watermark row, creating it on first use
+def lock_watermark(db: Session) -> models.RollupWatermark:
+    watermark = db.query(models.RollupWatermark).filter(
+        models.RollupWatermark.rollup == ROLLUP_NAME
+    ).with_for_update().first()
+    if watermark is not None:
+        return watermark
+
+    try:
+        with db.begin_nested():
+            db.add(models.RollupWatermark(rollup=ROLLUP_NAME, last_id=0))
+    except IntegrityError:
+        # Another refresh created it first
+        pass
+    return lock_watermark(db)
+
+def watermark_state(db: Session):
+    return db.query(
+        models.RollupWatermark.last_id,
+        models.RollupWatermark.refreshed_at
+    ).filter(models.RollupWatermark.rollup == ROLLUP_NAME).first()
+
+# Counts of the results in (last_id, upper_id], grouped like the rollup
+def aggregate_results(db: Session, last_id: int, upper_id: int):
+    outcome = func.lower(func.trim(models.TestResult.result))
+    return db.query(
+        func.date(models.TestResult.created_at, type_=models.TestResultRollup.day.type),
+        func.coalesce(models.Inventory.type, ""),
+        func.coalesce(models.Inventory.part_number, ""),
+        func.coalesce(models.Inventory.name_product, ""),
+        models.Test.test_type,
+        func.count(models.TestResult.result_id),
+        func.sum(case((outcome.in_(PASS_RESULTS), 1), else_=0)),
+        func.sum(case((outcome.in_(FAIL_RESULTS), 1), else_=0))
+    ).join(
+        models.Test, models.Test.test_id == models.TestResult.test_id
+    ).outerjoin(
+        models.Inventory, models.Inventory.part_id == models.Test.part_id
+    ).filter(
+        models.TestResult.result_id > last_id,
+        models.TestResult.result_id <= upper_id
+    ).group_by(
+        func.date(models.TestResult.created_at),
+        models.Inventory.type,
+        models.Inventory.part_number,
+        models.Inventory.name_product,
+        models.Test.test_type
+    ).all()
+
+# Add one batch of counts to the rollup rows, loading the affected days once
+def apply_counts(db: Session, groups):
+    days = {group[0] for group in groups}
+    existing = {
+        (row.day, row.part_type, row.part_number, row.name_product, row.test_type): row
+        for row in db.query(models.TestResultRollup).filter(models.TestResultRollup.day.in_(days))
+    }
+    for day, part_type, part_number, name_product, test_type, total, passed, failed in groups:
+        test_type = test_type.value if test_type is not None else ""
+        key = (day, part_type, part_number, name_product, test_type)
+        row = existing.get(key)
+        if row is None:
+            row = existing[key] = models.TestResultRollup(
+                day=day, part_type=part_type, part_number=part_number,
+                name_product=name_product, test_type=test_type,
+                total=0, passed=0, failed=0
+            )
+            db.add(row)
+        row.total += total
+        row.passed += passed or 0
+        row.failed += failed or 0
+
+# Fold up to `max_results` new results into the rollup and commit. Returns
+# the number of results folded in.
+def refresh_rollup(db: Session, max_results: int = ROLLUP_BATCH_SIZE) -> int:
+    watermark = lock_watermark(db)
+    last_id = watermark.last_id or 0
+
+    # Stop below the oldest result that has not settled yet
+    unsettled = db.query(func.min(models.TestResult.result_id)).filter(
+        models.TestResult.result_id > last_id,
+        models.TestResult.created_at >= settled_before(db)
+    ).scalar()
+    newest = db.query(func.max(models.TestResult.result_id)).filter(models.TestResult.result_id > last_id)
+    if unsettled is not None:
+        newest = newest.filter(models.TestResult.result_id < unsettled)
+    newest = newest.scalar()
+    if newest is None:
+        watermark.refreshed_at = datetime.utcnow()
+        db.commit()
+        return 0
+
+    upper_id = min(newest, last_id + max_results)
+    groups = aggregate_results(db, last_id, upper_id)
+    apply_counts(db, groups)
+    watermark.last_id = upper_id
+    watermark.refreshed_at = datetime.utcnow()
+    db.commit()
+    return sum(group[5] for group in groups)
+
+# Refresh until caught up
+def refresh_all(db: Session) -> int:
+    folded = 0
+    while True:
+        batch = refresh_rollup(db)
+        folded += batch
+        if not batch:
+            return folded
+
+# Recount everything, e.g. after tests were retyped or moved to other parts
+def rebuild_rollup(db: Session) -> int:
+    watermark = lock_watermark(db)
+    db.execute(delete(models.TestResultRollup))
+    watermark.last_id = 0
+    db.flush()
+    return refresh_all(db)
+
+def refresh_if_stale(db: Session):
+    state = watermark_state(db)
+    refreshed_at = state.refreshed_at if state else None
+    if refreshed_at is not None and refreshed_at.tzinfo is not None:
+        refreshed_at = refreshed_at.astimezone(timezone.utc).replace(tzinfo=None)
+    if refreshed_at is None or refreshed_at < datetime.utcnow() - timedelta(seconds=ROLLUP_REFRESH_SECONDS):
+        refresh_rollup(db)
+
+def window_start(day: date, window: str) -> Optional[date]:
+    if window == "day":
+        return day
+    if window == "week":
+        return day - timedelta(days=day.weekday())
+    if window == "month":
+        return day.replace(day=1)
+    return None
+
+def failure_rate(passed: int, failed: int) -> float:
+    # Results that are neither a pass nor a fail don't count towards the rate
+    decided = passed + failed
+    return round(failed / decided, 4) if decided else 0.0
+
+# Failure rates grouped by `group_by` (keys of DIMENSIONS) and time window.
+# `filters` maps dimension names to the value to keep.
+def failure_rates(
+    db: Session,
+    group_by: List[str],
+    window: str = "all",
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    filters: Optional[dict] = None,
+    min_results: int = 1,
+    limit: int = 100
+) -> List[dict]:
+    columns = [DIMENSIONS[name] for name in group_by]
+    if window != "all":
+        columns.append(models.TestResultRollup.day)
+    query = db.query(
+        *columns,
+        func.sum(models.TestResultRollup.total),
+        func.sum(models.TestResultRollup.passed),
+        func.sum(models.TestResultRollup.failed)
+    )
+    if since is not None:
+        query = query.filter(models.TestResultRollup.day >= since)
+    if until is not None:
+        query = query.filter(models.TestResultRollup.day <= until)
+    for name, value in (filters or {}).items():
+        query = query.filter(DIMENSIONS[name] == value)
+    if columns:
+        query = query.group_by(*columns)
+
+    # Days are folded into weeks and months here; the rollup is small enough
+    rates = {}
+    for row in query:
+        dimensions = row[:len(group_by)]
+        start = window_start(row[len(group_by)], window) if window != "all" else None
+        counts = rates.setdefault((start, *dimensions), [0, 0, 0])
+        counts[0] += row[-3] or 0
+        counts[1] += row[-2] or 0
+        counts[2] += row[-1] or 0
+
+    rows = []
+    for (start, *dimensions), (total, passed, failed) in rates.items():
+        if total < min_results:
+            continue
+        row = dict(zip(group_by, dimensions))
+        row.update(
+            window_start=start, total=total, passed=passed, failed=failed,
+            failure_rate=failure_rate(passed, failed)
+        )
+        rows.append(row)
+    # Windows come out oldest first, worst first within a window
+    rows.sort(key=lambda row: (row["window_start"] or date.min, -row["failure_rate"], -row["failed"]))
+    return rows[:limit]
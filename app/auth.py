@@ -1,13 +1,17 @@
 from datetime import datetime, timedelta
+from threading import Lock
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import event, func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from . import models, schemas
+from . import models, schemas, database
 from .database import get_db
 import os
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -16,6 +20,9 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
+REFRESH_TOKEN_EXPIRE_MINUTES = int(os.getenv("REFRESH_TOKEN_EXPIRE_MINUTES", str(7 * 24 * 60)))
+# How stale another worker's view of revoked tokens may get
+TOKEN_REVOCATION_SYNC_SECONDS = float(os.getenv("TOKEN_REVOCATION_SYNC_SECONDS", "5"))
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
@@ -47,23 +54,161 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+# Token claims and revocation.
+#
+# Tokens carry the user's id (uid), role and token version (ver) next to
+# sub, so get_user_with_role can authorize from the verified token alone.
+# Every user has a token_versions counter; revoke_tokens() bumps it when a
+# user's role changes, the user is deleted or the password is reset, and
+# tokens with an older ver stop working. Workers keep the counters of
+# revoked users in memory and pick up other workers' revocations from the
+# table at most TOKEN_REVOCATION_SYNC_SECONDS later.
+#
+# Access tokens are short-lived; POST /auth/refresh trades a refresh token
+# for a new pair. Tokens issued before the claims existed carry only sub and
+# still go through the database.
+
+class RevocationSet:
+    def __init__(self, sync_seconds: float = TOKEN_REVOCATION_SYNC_SECONDS):
+        self.sync_seconds = sync_seconds
+        self._versions = {}
+        self._synced_at = None
+        self._cursor = None
+        self._lock = Lock()
+
+    # Read counters changed since the last sync; the table only has rows
+    # for users whose tokens were revoked
+    def sync(self):
+        now = time.monotonic()
+        if self._synced_at is not None and now - self._synced_at < self.sync_seconds:
+            return
+        with self._lock:
+            if self._synced_at is not None and now - self._synced_at < self.sync_seconds:
+                return
+            db = database.SessionLocal()
+            try:
+                query = db.query(
+                    models.TokenVersion.user_id,
+                    models.TokenVersion.version,
+                    models.TokenVersion.updated_at
+                )
+                if self._cursor is not None:
+                    # Overlap a little so rows committed late are not missed
+                    query = query.filter(models.TokenVersion.updated_at >= self._cursor - timedelta(minutes=1))
+                for user_id, version, updated_at in query:
+                    self._versions[user_id] = max(version, self._versions.get(user_id, 0))
+                    if updated_at is not None and (self._cursor is None or updated_at > self._cursor):
+                        self._cursor = updated_at
+            finally:
+                db.close()
+            self._synced_at = now
+
+    def current(self, user_id: int) -> int:
+        self.sync()
+        return self._versions.get(user_id, 0)
+
+    def set(self, user_id: int, version: int):
+        with self._lock:
+            self._versions[user_id] = max(version, self._versions.get(user_id, 0))
+
+revocations = RevocationSet()
+
+def token_version(db: Session, user_id: int) -> int:
+    return db.query(models.TokenVersion.version).filter(models.TokenVersion.user_id == user_id).scalar() or 0
+
+# Invalidate every token issued to the user so far; call before committing
+def revoke_tokens(db: Session, user_id: int):
+    updated = db.query(models.TokenVersion).filter(models.TokenVersion.user_id == user_id).update(
+        {"version": models.TokenVersion.version + 1, "updated_at": func.now()},
+        synchronize_session=False
+    )
+    if not updated:
+        try:
+            with db.begin_nested():
+                db.add(models.TokenVersion(user_id=user_id, version=1))
+        except IntegrityError:
+            # Another request created the row first
+            return revoke_tokens(db, user_id)
+    # Applied to this worker's counters once the transaction commits (see
+    # track_revocations), so a rollback doesn't reject still-valid tokens
+    db.info.setdefault("revoked_token_versions", {})[user_id] = token_version(db, user_id)
+
+def apply_revocations(session):
+    for user_id, version in session.info.pop("revoked_token_versions", {}).items():
+        revocations.set(user_id, version)
+
+def discard_revocations(session):
+    session.info.pop("revoked_token_versions", None)
+
+def track_revocations(session_factory):
+    event.listen(session_factory, "after_commit", apply_revocations)
+    event.listen(session_factory, "after_rollback", discard_revocations)
+
+# Access and refresh token for a freshly authenticated user
+def create_user_tokens(db: Session, user) -> dict:
+    claims = {"sub": user.username, "uid": user.user_id, "role": user.role, "ver": token_version(db, user.user_id)}
+    return {
+        "access_token": create_access_token(
+            dict(claims, type="access"), expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        ),
+        "refresh_token": create_access_token(
+            dict(claims, type="refresh"), expires_delta=timedelta(minutes=REFRESH_TOKEN_EXPIRE_MINUTES)
+        ),
+        "token_type": "bearer"
+    }
+
+def credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+# Verified, unrevoked claims of a token of the given type
+def decode_token(token: str, token_type: str = "access") -> dict:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        token_data = schemas.TokenData(username=username)
     except JWTError:
-        raise credentials_exception
-    user = get_user(db, username=token_data.username)
+        raise credentials_exception()
+    if payload.get("sub") is None or payload.get("type", "access") != token_type:
+        raise credentials_exception()
+    if "uid" in payload and payload.get("ver", 0) < revocations.current(payload["uid"]):
+        raise credentials_exception()
+    return payload
+
+# The caller as described by the token. user_id, username and role come from
+# the claims; any other attribute loads the User row on first use.
+class TokenPrincipal:
+    def __init__(self, payload: dict, db: Session):
+        self.user_id = payload["uid"]
+        self.username = payload["sub"]
+        self.role = payload["role"]
+        self._db = db
+        self._user = None
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if self._user is None:
+            self._user = self._db.query(models.User).filter(
+                models.User.user_id == self.user_id,
+                models.User.is_deleted == False
+            ).first()
+            if self._user is None:
+                raise credentials_exception()
+        return getattr(self._user, name)
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    payload = decode_token(token)
+    if "uid" in payload:
+        user = db.query(models.User).filter(
+            models.User.user_id == payload["uid"],
+            models.User.is_deleted == False
+        ).first()
+    else:
+        user = get_user(db, username=payload["sub"])
     if user is None:
-        raise credentials_exception
+        raise credentials_exception()
     return user
 
 def get_current_active_user(current_user = Depends(get_current_user)):
@@ -73,7 +218,12 @@ def get_current_active_user(current_user = Depends(get_current_user)):
 
 # Role-based access control
 def get_user_with_role(role_required: str):
-    def role_checker(current_user = Depends(get_current_active_user)):
+    def role_checker(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+        payload = decode_token(token)
+        if "role" in payload and "uid" in payload:
+            current_user = TokenPrincipal(payload, db)
+        else:
+            current_user = get_current_active_user(get_current_user(token, db))
         if role_required == "admin" and current_user.role != "admin":
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -0,0 +1,227 @@
+import json
+import os
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Iterable, Optional
+
+try:
+    import redis
+except ImportError:  # optional dependency, only needed for REDIS_URL
+    redis = None
+
+# Response cache for read-heavy endpoints.
+#
+# Handlers cache the rendered JSON body under a key scoped by the caller's
+# role (and user id for regular users) and attach tags naming what the body
+# depends on, e.g. "ticket:42" or "users". Mutating handlers call
+# invalidate() with the same tags after they commit.
+#
+# Invalidation is generational: every tag has a version number and each
+# entry remembers the versions it was built against, so invalidating a tag
+# is a single counter bump and stale entries simply stop matching.
+#
+# The default backend is an in-process LRU, so with several workers an
+# invalidation only reaches the worker that handled the write and the others
+# keep serving their copy until CACHE_TTL_SECONDS runs out. Set REDIS_URL to
+# share entries and tag versions between workers.
+
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "1").lower() not in ("0", "false", "no", "off")
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", "30"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "5000"))
+REDIS_URL = os.getenv("REDIS_URL")
+
+# Tag counters are an LRU as well, since there is one per ticket or test id.
+# A tag that was dropped reads as the highest version dropped so far, never
+# as a value it had before, so an entry built before the drop can't match.
+class MemoryBackend:
+    name = "memory"
+
+    def __init__(self, max_entries: int, max_tags: Optional[int] = None):
+        self.max_entries = max_entries
+        self.max_tags = max_tags or 4 * max_entries
+        self._entries = OrderedDict()
+        self._tags = OrderedDict()
+        self._dropped_version = 0
+        self._lock = Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: int):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def tag_versions(self, tags):
+        with self._lock:
+            versions = []
+            for tag in tags:
+                if tag in self._tags:
+                    self._tags.move_to_end(tag)
+                versions.append(self._tags.get(tag, self._dropped_version))
+            return versions
+
+    def bump_tags(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._tags[tag] = self._tags.get(tag, self._dropped_version) + 1
+                self._tags.move_to_end(tag)
+            while len(self._tags) > self.max_tags:
+                _, version = self._tags.popitem(last=False)
+                self._dropped_version = max(self._dropped_version, version)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+# A Redis outage degrades to cache misses instead of failing requests
+class RedisBackend:
+    name = "redis"
+
+    def __init__(self, url: str, prefix: str = "cache:"):
+        self.client = redis.Redis.from_url(url, socket_timeout=0.2)
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self.client.get(self.prefix + key)
+        except redis.RedisError:
+            return None
+
+    def set(self, key: str, value: bytes, ttl: int):
+        try:
+            self.client.set(self.prefix + key, value, ex=ttl)
+        except redis.RedisError:
+            pass
+
+    # None means the versions are unknown and nothing may be cached
+    def tag_versions(self, tags):
+        if not tags:
+            return []
+        try:
+            versions = self.client.mget([self.prefix + "tag:" + tag for tag in tags])
+        except redis.RedisError:
+            return None
+        return [int(version or 0) for version in versions]
+
+    def bump_tags(self, tags):
+        pipeline = self.client.pipeline(transaction=False)
+        for tag in tags:
+            pipeline.incr(self.prefix + "tag:" + tag)
+        try:
+            pipeline.execute()
+        except redis.RedisError:
+            pass
+
+    # Tag versions are kept so entries in other workers stay comparable
+    def clear(self):
+        try:
+            keys = [key for key in self.client.scan_iter(self.prefix + "*") if not key.startswith((self.prefix + "tag:").encode())]
+            if keys:
+                self.client.delete(*keys)
+        except redis.RedisError:
+            pass
+
+    def __len__(self):
+        return 0
+
+# Result of a cache lookup. The tag versions are read before the handler
+# queries the database, so a write that commits while the body is being
+# built leaves the stored entry already stale instead of fresh-looking.
+class CacheLookup:
+    def __init__(self, cache, namespace: str, key: str, versions, body: Optional[bytes] = None):
+        self.cache = cache
+        self.namespace = namespace
+        self.key = key
+        self.versions = versions
+        self.body = body
+
+    # Store a rendered body and hand it back so callers can return it directly
+    def store(self, body: bytes) -> bytes:
+        if self.cache.enabled and self.versions is not None:
+            self.cache.backend.set(self.key, json.dumps(self.versions).encode() + b"\n" + body, self.cache.ttl)
+            self.cache._count(self.namespace, "stores")
+        return body
+
+class ResponseCache:
+    def __init__(self, backend, enabled: bool = True, ttl: int = CACHE_TTL_SECONDS):
+        self.backend = backend
+        self.enabled = enabled
+        self.ttl = ttl
+        self._stats = {}
+        self._invalidations = 0
+        self._lock = Lock()
+
+    def _count(self, namespace: str, field: str):
+        with self._lock:
+            counters = self._stats.setdefault(namespace, {"hits": 0, "misses": 0, "stores": 0})
+            counters[field] += 1
+
+    @staticmethod
+    def scope(user) -> str:
+        # Regular users only see their own rows, so they never share entries
+        if user.role == "user":
+            return f"user:{user.user_id}"
+        return f"role:{user.role}"
+
+    def key(self, namespace: str, user, *parts) -> str:
+        return ":".join([namespace, self.scope(user), *(str(part) for part in parts)])
+
+    def get(self, namespace: str, key: str, tags: Iterable[str]) -> CacheLookup:
+        if not self.enabled:
+            return CacheLookup(self, namespace, key, None)
+        versions = self.backend.tag_versions(list(tags))
+        stored = self.backend.get(key) if versions is not None else None
+        if stored is not None:
+            stored_versions, _, body = stored.partition(b"\n")
+            if json.loads(stored_versions) == versions:
+                self._count(namespace, "hits")
+                return CacheLookup(self, namespace, key, versions, body)
+        self._count(namespace, "misses")
+        return CacheLookup(self, namespace, key, versions)
+
+    def invalidate(self, *tags: str):
+        if tags:
+            self.backend.bump_tags(tags)
+            with self._lock:
+                self._invalidations += len(tags)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            namespaces = {}
+            for namespace, counters in self._stats.items():
+                lookups = counters["hits"] + counters["misses"]
+                namespaces[namespace] = dict(counters, hit_ratio=round(counters["hits"] / lookups, 4) if lookups else 0.0)
+        return {
+            "enabled": self.enabled,
+            "backend": self.backend.name,
+            "ttl_seconds": self.ttl,
+            "entries": len(self.backend),
+            "invalidations": self._invalidations,
+            "namespaces": namespaces,
+        }
+
+def make_backend():
+    if REDIS_URL and redis is not None:
+        return RedisBackend(REDIS_URL)
+    return MemoryBackend(CACHE_MAX_ENTRIES)
+
+response_cache = ResponseCache(make_backend(), enabled=CACHE_ENABLED)
@@ -0,0 +1,174 @@
+import os
+import random
+from datetime import datetime, timedelta
+from sqlalchemy import event, func, insert, update, select, inspect
+from sqlalchemy.orm import Session
+from . import models
+
+# Append-only change feed behind GET /changes.
+#
+# Every ORM flush that creates, updates or deletes a tracked row appends a
+# change_log row in the same transaction (see record_flush). Set-based
+# UPDATE statements bypass the unit of work, so the handlers that use them
+# call record_changes explicitly. change_id is the client's sync cursor.
+#
+# Each entity also has a version counter that is bumped in the same
+# transaction; list endpoints derive their ETag from it (see conditional.py).
+# The counter is split into COLLECTION_VERSION_SHARDS rows so that writers of
+# one collection don't all queue on a single row lock until they commit.
+
+# Changes younger than this are held back from the feed so that a
+# transaction that took an earlier change_id but commits later is not
+# skipped by a client that already moved its cursor past it
+SETTLE_SECONDS = float(os.getenv("CHANGE_FEED_SETTLE_SECONDS", "2"))
+COLLECTION_VERSION_SHARDS = int(os.getenv("COLLECTION_VERSION_SHARDS", "16"))
+
+ENTITIES = {
+    "ticket": (models.Ticket, "ticket_id"),
+    "comment": (models.Comment, "comment_id"),
+    "inventory": (models.Inventory, "part_id"),
+    "test": (models.Test, "test_id"),
+    "notification": (models.Notification, "notification_id"),
+}
+
+# created_at is left to the database's now(), the clock settled_before reads
+def change_row(entity: str, entity_id: int, operation: str, owner_id=None):
+    return {
+        "entity": entity,
+        "entity_id": entity_id,
+        "operation": operation,
+        "owner_id": owner_id,
+    }
+
+# Every committed writer adds one to some shard, so the sum changes whenever
+# a change becomes visible. A pooled connection always bumps the same shard:
+# a transaction that flushes more than once never holds two shards of one
+# entity, and the entities are locked in sorted order, so bumps can't deadlock.
+def bump_versions(connection, entities):
+    shard = connection.info.setdefault("collection_version_shard", random.randrange(COLLECTION_VERSION_SHARDS))
+    connection.execute(
+        update(models.CollectionVersion.__table__).where(
+            models.CollectionVersion.entity.in_(sorted(entities)),
+            models.CollectionVersion.shard == shard
+        ).values(
+            version=models.CollectionVersion.version + 1,
+            updated_at=datetime.utcnow()
+        )
+    )
+
+# `owners` maps entity_id -> owner_id when the rows don't share one owner
+def record_changes(db: Session, entity: str, entity_ids, operation: str, owner_id=None, owners=None):
+    rows = [
+        change_row(entity, entity_id, operation, owners[entity_id] if owners else owner_id)
+        for entity_id in entity_ids
+    ]
+    if rows:
+        db.execute(insert(models.ChangeLog), rows)
+        bump_versions(db.connection(), {entity})
+
+# Set-based INSERT that also yields the new primary keys, so the rows can be
+# passed to record_changes. Without RETURNING (MySQL) the ids can't be
+# derived from one multi-row INSERT: auto_increment_increment and
+# interleaved allocation leave gaps, so each row is inserted on its own and
+# its id read back.
+def insert_rows(db: Session, model, rows) -> list:
+    if not rows:
+        return []
+    connection = db.connection()
+    primary_key = inspect(model).primary_key[0]
+    if connection.dialect.insert_executemany_returning_sort_by_parameter_order:
+        return list(connection.execute(
+            insert(model.__table__).returning(primary_key, sort_by_parameter_order=True), rows
+        ).scalars())
+    statement = insert(model.__table__)
+    return [connection.execute(statement, row).inserted_primary_key[0] for row in rows]
+
+# Create the missing version shards so bump_versions only ever has to UPDATE
+def ensure_versions(db: Session):
+    existing = set(db.query(models.CollectionVersion.entity, models.CollectionVersion.shard).all())
+    missing = [
+        (entity, shard)
+        for entity in ENTITIES
+        for shard in range(COLLECTION_VERSION_SHARDS)
+        if (entity, shard) not in existing
+    ]
+    if missing:
+        db.execute(insert(models.CollectionVersion), [
+            {"entity": entity, "shard": shard, "version": 0, "updated_at": datetime.utcnow()}
+            for entity, shard in missing
+        ])
+        db.commit()
+
+def ticket_owner(connection, ticket_id):
+    return connection.execute(
+        select(models.Ticket.created_by).where(models.Ticket.ticket_id == ticket_id)
+    ).scalar()
+
+def test_owner(connection, test_id):
+    return connection.execute(
+        select(models.Test.created_by).where(models.Test.test_id == test_id)
+    ).scalar()
+
+def is_soft_deleted(obj) -> bool:
+    history = inspect(obj).attrs.is_deleted.history
+    return bool(history.added) and history.added[0] is True
+
+# Translate one flushed object into a list of
+# (entity, entity_id, operation, owner_id)
+def describe(connection, obj, operation: str):
+    if isinstance(obj, models.Ticket):
+        if operation == "update" and is_soft_deleted(obj):
+            operation = "delete"
+        return [("ticket", obj.ticket_id, operation, obj.created_by)]
+    if isinstance(obj, models.Comment):
+        if operation == "update" and is_soft_deleted(obj):
+            operation = "delete"
+        owner_id = ticket_owner(connection, obj.ticket_id)
+        # Tickets embed their comments, so the parent changes as well
+        return [
+            ("comment", obj.comment_id, operation, owner_id),
+            ("ticket", obj.ticket_id, "update", owner_id),
+        ]
+    if isinstance(obj, models.Inventory):
+        return [("inventory", obj.part_id, operation, None)]
+    if isinstance(obj, models.Test):
+        if operation == "update" and is_soft_deleted(obj):
+            operation = "delete"
+        return [("test", obj.test_id, operation, obj.created_by)]
+    if isinstance(obj, models.Notification):
+        if operation == "update" and is_soft_deleted(obj):
+            operation = "delete"
+        return [("notification", obj.notification_id, operation, obj.user_id)]
+    # New attachments and results change the parent's response
+    if isinstance(obj, models.Attachment) and operation == "create":
+        if obj.ticket_id:
+            return [("ticket", obj.ticket_id, "update", ticket_owner(connection, obj.ticket_id))]
+        if obj.test_id:
+            return [("test", obj.test_id, "update", test_owner(connection, obj.test_id))]
+    if isinstance(obj, models.TestResult) and operation == "create":
+        return [("test", obj.test_id, "update", test_owner(connection, obj.test_id))]
+    return []
+
+def record_flush(session, flush_context):
+    connection = session.connection()
+    changes = []
+    for operation, objects in (
+        ("create", session.new),
+        ("update", [obj for obj in session.dirty if session.is_modified(obj, include_collections=False)]),
+        ("delete", session.deleted),
+    ):
+        for obj in objects:
+            changes.extend(change_row(*change) for change in describe(connection, obj, operation))
+
+    if changes:
+        connection.execute(insert(models.ChangeLog.__table__), changes)
+        bump_versions(connection, {change["entity"] for change in changes})
+
+def track_changes(session_factory):
+    event.listen(session_factory, "after_flush", record_flush)
+
+# Cutoff for rows stamped by the database's now() (change_log, test results).
+# Taken from the same clock, so the settle window holds whatever time zone
+# the database server runs in.
+def settled_before(db: Session):
+    return db.query(func.now()).scalar() - timedelta(seconds=SETTLE_SECONDS)
@@ -0,0 +1,228 @@
+import os
+import time
+import zlib
+from threading import Lock
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # optional dependency, gzip only without it
+    brotli = None
+
+# Response compression.
+#
+# An ASGI middleware that negotiates br or gzip from Accept-Encoding and
+# compresses responses whose Content-Type is on the allowlist and whose body
+# reaches COMPRESSION_MIN_SIZE bytes. Body chunks are held back only until
+# that size is reached or the body ends (the http middlewares in main.py
+# forward even small bodies as a chunk plus an empty final message). After
+# that the stream is compressed chunk by chunk and flushed after every
+# chunk, so a consumer of an export gets each piece as soon as it is
+# produced. Event streams are never held back.
+#
+# Strong ETags are weakened on compressed responses, since the bytes differ
+# from the identity representation; If-None-Match uses weak comparison, so
+# conditional requests keep matching.
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_LEVEL = int(os.getenv("COMPRESSION_BROTLI_LEVEL", "4"))
+COMPRESSION_TYPES = tuple(
+    content_type.strip()
+    for content_type in os.getenv(
+        "COMPRESSION_TYPES",
+        "application/json,application/x-ndjson,text/,application/javascript,image/svg+xml"
+    ).split(",")
+    if content_type.strip()
+)
+
+# Bytes in and out and time spent compressing, per encoding
+class CompressionStats:
+    def __init__(self):
+        self._encodings = {}
+        self._skipped = {}
+        self._lock = Lock()
+
+    def record(self, encoding: str, bytes_in: int, bytes_out: int, seconds: float, finished: bool):
+        with self._lock:
+            counters = self._encodings.setdefault(
+                encoding, {"responses": 0, "bytes_in": 0, "bytes_out": 0, "seconds": 0.0}
+            )
+            counters["responses"] += int(finished)
+            counters["bytes_in"] += bytes_in
+            counters["bytes_out"] += bytes_out
+            counters["seconds"] += seconds
+
+    def skip(self, reason: str):
+        with self._lock:
+            self._skipped[reason] = self._skipped.get(reason, 0) + 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            encodings = {}
+            for encoding, counters in self._encodings.items():
+                bytes_in, bytes_out = counters["bytes_in"], counters["bytes_out"]
+                encodings[encoding] = {
+                    "responses": counters["responses"],
+                    "bytes_in": bytes_in,
+                    "bytes_out": bytes_out,
+                    "bytes_saved": bytes_in - bytes_out,
+                    "ratio": round(bytes_out / bytes_in, 4) if bytes_in else 0.0,
+                    "compress_ms": round(counters["seconds"] * 1000, 1),
+                    # Bytes saved per millisecond of compression time
+                    "saved_per_ms": round((bytes_in - bytes_out) / (counters["seconds"] * 1000), 1)
+                    if counters["seconds"] else 0.0,
+                }
+            return {"encodings": encodings, "skipped": dict(self._skipped)}
+
+compression_stats = CompressionStats()
+
+def accepted_encodings(header: str) -> dict:
+    encodings = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            encodings[name.strip().lower()] = quality
+    return encodings
+
+class Compressor:
+    def __init__(self, encoding: str, gzip_level: int, brotli_level: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_level)
+        else:
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        if self.encoding == "br":
+            out = self._brotli.process(data)
+            return out + (self._brotli.finish() if final else self._brotli.flush())
+        out = self._zlib.compress(data)
+        return out + self._zlib.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app,
+        minimum_size: int = COMPRESSION_MIN_SIZE,
+        gzip_level: int = COMPRESSION_GZIP_LEVEL,
+        brotli_level: int = COMPRESSION_BROTLI_LEVEL,
+        content_types=COMPRESSION_TYPES,
+        stats: CompressionStats = compression_stats,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_level = brotli_level
+        self.content_types = tuple(content_types)
+        self.stats = stats
+
+    def select_encoding(self, scope):
+        accepted = accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        wildcard = accepted.get("*", 0.0)
+        candidates = (["br"] if brotli is not None else []) + ["gzip"]
+        best = None
+        best_quality = 0.0
+        for encoding in candidates:
+            quality = accepted.get(encoding, wildcard)
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def compressible_type(self, content_type: str) -> bool:
+        content_type = content_type.split(";")[0].strip().lower()
+        return any(
+            content_type.startswith(allowed) if allowed.endswith("/") else content_type == allowed
+            for allowed in self.content_types
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = self.select_encoding(scope)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor = None
+        passthrough = False
+        pending = []
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                # Held back until the body shows whether to compress
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is None and not passthrough:
+                headers = MutableHeaders(raw=start_message["headers"])
+                content_type = headers.get("content-type", "")
+                reason = None
+                if "content-encoding" in headers:
+                    reason = "already_encoded"
+                elif not self.compressible_type(content_type):
+                    reason = "content_type"
+                if reason:
+                    self.stats.skip(reason)
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+
+                pending.append(body)
+                buffered = sum(len(chunk) for chunk in pending)
+                if more_body and buffered < self.minimum_size and not content_type.startswith("text/event-stream"):
+                    return
+                body = b"".join(pending)
+                pending.clear()
+                if not more_body and buffered < self.minimum_size:
+                    self.stats.skip("too_small")
+                    passthrough = True
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": body, "more_body": False})
+                    return
+
+                compressor = Compressor(encoding, self.gzip_level, self.brotli_level)
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    headers["ETag"] = "W/" + etag
+                started = time.perf_counter()
+                data = compressor.compress(body, final=not more_body)
+                self.stats.record(encoding, len(body), len(data), time.perf_counter() - started, not more_body)
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    headers["Content-Length"] = str(len(data))
+                await send(start_message)
+                await send({"type": "http.response.body", "body": data, "more_body": more_body})
+                return
+
+            if passthrough:
+                await send(message)
+                return
+
+            started = time.perf_counter()
+            data = compressor.compress(body, final=not more_body)
+            self.stats.record(encoding, len(body), len(data), time.perf_counter() - started, not more_body)
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
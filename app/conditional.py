@@ -0,0 +1,97 @@
+import hashlib
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import Request, Response
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from . import models
+
+# Conditional GET for the polling frontend.
+#
+# Validators come from the change feed tables, so they can be computed with
+# one indexed query before the handler loads or serializes anything:
+# - a single row is versioned by the count and newest change_id of its
+#   change_log rows (the count also catches a change that committed late
+#   with a lower change_id)
+# - a list is versioned by the sum of its collection version shards; every
+#   writer of the collection bumps one shard in its own transaction
+# A handler reads the validators first; if the client already holds them it
+# answers 304, otherwise it runs as before and attaches them to the response.
+
+CACHE_CONTROL = "private, no-cache"
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha1(":".join(str(part) for part in parts).encode()).hexdigest()[:20]
+    return f'"{digest}"'
+
+def as_utc(value):
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).replace(microsecond=0)
+
+# Validators of one row, e.g. detail_validators(db, "ticket", 42)
+def detail_validators(db: Session, entity: str, entity_id: int):
+    count, last_change, last_modified = db.query(
+        func.count(models.ChangeLog.change_id),
+        func.max(models.ChangeLog.change_id),
+        func.max(models.ChangeLog.created_at)
+    ).filter(
+        models.ChangeLog.entity == entity,
+        models.ChangeLog.entity_id == entity_id
+    ).one()
+    return make_etag(entity, entity_id, count, last_change or 0), as_utc(last_modified)
+
+# Validators of a list. The representation depends on the caller and the
+# query string, so both are part of the tag.
+def collection_validators(db: Session, entity: str, request: Request, current_user):
+    version, last_modified = db.query(
+        func.coalesce(func.sum(models.CollectionVersion.version), 0),
+        func.max(models.CollectionVersion.updated_at)
+    ).filter(models.CollectionVersion.entity == entity).one()
+    query = "&".join(sorted(str(request.query_params).split("&")))
+    return (
+        make_etag(entity, version, current_user.user_id, current_user.role, request.url.path, query),
+        as_utc(last_modified)
+    )
+
+def etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # Weak comparison is what RFC 9110 prescribes for If-None-Match
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+# True when the client's cached copy is still current
+def is_fresh(request: Request, etag: str, last_modified=None) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+
+    # If-Modified-Since is only consulted when no ETag was sent
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = as_utc(parsedate_to_datetime(if_modified_since))
+        except (TypeError, ValueError):
+            return False
+        return last_modified <= since
+    return False
+
+def validator_headers(etag: str, last_modified=None) -> dict:
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    return headers
+
+def not_modified(etag: str, last_modified=None) -> Response:
+    return Response(status_code=304, headers=validator_headers(etag, last_modified))
+
+def set_validators(response: Response, etag: str, last_modified=None):
+    response.headers.update(validator_headers(etag, last_modified))
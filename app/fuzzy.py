@@ -0,0 +1,157 @@
+import re
+from sqlalchemy import func, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from . import models
+
+# Typo-tolerant matching for part numbers and product names.
+#
+# Many serials share the same part number and product name, so the index is
+# kept over the distinct values (inventory_terms) rather than over every part.
+# Each term is normalized (upper case, no spaces or punctuation, look-alike
+# characters folded together) and split into trigrams (inventory_trigrams).
+# A search ranks the terms sharing enough trigrams with the query, then
+# expands the best terms to parts through the regular inventory columns.
+
+FIELDS = ("part_number", "name_product")
+
+# Characters that get mistyped for each other on part labels
+CONFUSABLES = str.maketrans({"O": "0", "Q": "0", "I": "1", "L": "1"})
+NON_ALNUM = re.compile(r"[^0-9A-Z]+")
+
+def normalize(text: str) -> str:
+    if not text:
+        return ""
+    return NON_ALNUM.sub("", text.upper()).translate(CONFUSABLES)
+
+def trigrams(text: str) -> set:
+    value = normalize(text)
+    if not value:
+        return set()
+    padded = f"$${value}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+# Jaccard similarity, used for part numbers (whole-value matches)
+def similarity(query_grams: set, grams: set) -> float:
+    if not query_grams or not grams:
+        return 0.0
+    shared = len(query_grams & grams)
+    return shared / (len(query_grams) + len(grams) - shared)
+
+# Share of the query found in the value, used for product names where the
+# query is usually a fragment of a longer name
+def word_similarity(query_grams: set, grams: set) -> float:
+    if not query_grams or not grams:
+        return 0.0
+    return len(query_grams & grams) / len(query_grams)
+
+def score(query_grams: set, field: str, value: str) -> float:
+    if field == "part_number":
+        return similarity(query_grams, trigrams(value))
+    return word_similarity(query_grams, trigrams(value))
+
+def add_term(db: Session, field: str, value: str):
+    exists = db.query(models.InventoryTerm.term_id).filter(
+        models.InventoryTerm.field == field,
+        models.InventoryTerm.value == value
+    ).first()
+    if exists:
+        return
+
+    try:
+        with db.begin_nested():
+            term = models.InventoryTerm(field=field, value=value)
+            db.add(term)
+            db.flush()
+            grams = trigrams(value)
+            if grams:
+                db.execute(insert(models.InventoryTrigram), [
+                    {"trigram": gram, "term_id": term.term_id} for gram in grams
+                ])
+    except IntegrityError:
+        # Another request indexed the same value first
+        pass
+
+# Index a part's values; only values not seen before add rows
+def index_part(db: Session, part):
+    for field in FIELDS:
+        value = getattr(part, field)
+        if value:
+            add_term(db, field, value)
+
+# Recreate the whole index; commits once per batch so it can run on a large table
+def rebuild_index(db: Session, batch_size: int = 5000) -> int:
+    db.query(models.InventoryTrigram).delete(synchronize_session=False)
+    db.query(models.InventoryTerm).delete(synchronize_session=False)
+    db.commit()
+
+    for field in FIELDS:
+        column = getattr(models.Inventory, field)
+        values = [value for value, in db.query(column).filter(column.isnot(None)).distinct()]
+        for start in range(0, len(values), batch_size):
+            db.execute(insert(models.InventoryTerm), [
+                {"field": field, "value": value} for value in values[start:start + batch_size]
+            ])
+        db.commit()
+
+    indexed = 0
+    last_id = 0
+    while True:
+        terms = db.query(models.InventoryTerm.term_id, models.InventoryTerm.value).filter(
+            models.InventoryTerm.term_id > last_id
+        ).order_by(models.InventoryTerm.term_id).limit(batch_size).all()
+        if not terms:
+            break
+
+        rows = [
+            {"trigram": gram, "term_id": term.term_id}
+            for term in terms
+            for gram in trigrams(term.value)
+        ]
+        if rows:
+            db.execute(insert(models.InventoryTrigram), rows)
+        db.commit()
+
+        indexed += len(terms)
+        last_id = terms[-1].term_id
+    return indexed
+
+def search(db: Session, query: str, limit: int = 10, min_score: float = 0.3, candidate_limit: int = 200):
+    query_grams = trigrams(query)
+    if not query_grams:
+        return []
+
+    # Neither score can reach min_score with fewer shared trigrams than this
+    min_hits = max(1, int(len(query_grams) * min_score))
+    hits = func.count(models.InventoryTrigram.trigram).label("hits")
+    candidates = db.query(models.InventoryTrigram.term_id, hits).filter(
+        models.InventoryTrigram.trigram.in_(query_grams)
+    ).group_by(
+        models.InventoryTrigram.term_id
+    ).having(hits >= min_hits).order_by(hits.desc()).limit(candidate_limit).all()
+    if not candidates:
+        return []
+
+    terms = db.query(models.InventoryTerm).filter(
+        models.InventoryTerm.term_id.in_([term_id for term_id, _ in candidates])
+    ).all()
+    ranked = [(score(query_grams, term.field, term.value), term) for term in terms]
+    ranked = [(value, term) for value, term in ranked if value >= min_score]
+    ranked.sort(key=lambda match: (-match[0], match[1].term_id))
+
+    # Expand the best terms to parts until the page is full
+    matches = []
+    seen = set()
+    for value, term in ranked:
+        if len(matches) >= limit:
+            break
+        column = getattr(models.Inventory, term.field)
+        parts = db.query(models.Inventory).filter(
+            column == term.value
+        ).order_by(models.Inventory.part_id).limit(limit).all()
+        for part in parts:
+            if part.part_id in seen or len(matches) >= limit:
+                continue
+            seen.add(part.part_id)
+            matches.append((value, part))
+    return matches
@@ -0,0 +1,140 @@
+import asyncio
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import func, text
+from . import models, database
+
+# Deep readiness check behind GET /health/ready.
+#
+# A worker reports ready when startup has finished and every check is
+# within its threshold:
+#   database    SELECT 1 round trip, skipped (and failing) when the
+#               connection pool is saturated so the probe never queues
+#               behind requests for a connection
+#   pool        checked-out connections / (pool size + max overflow)
+#   uploads     free space on the uploads volume
+#   jobs        due jobs waiting in the queue and the age of the oldest
+#   event_loop  worst lag of a 100 ms timer over the last few seconds
+#
+# Results are cached for HEALTH_CACHE_SECONDS, so load balancers probing
+# every worker several times a second cost one check per worker and second.
+
+HEALTH_CACHE_SECONDS = float(os.getenv("HEALTH_CACHE_SECONDS", "1"))
+HEALTH_MAX_DB_LATENCY_MS = float(os.getenv("HEALTH_MAX_DB_LATENCY_MS", "500"))
+HEALTH_MAX_POOL_USAGE = float(os.getenv("HEALTH_MAX_POOL_USAGE", "0.9"))
+HEALTH_MIN_FREE_UPLOAD_MB = float(os.getenv("HEALTH_MIN_FREE_UPLOAD_MB", "512"))
+HEALTH_MAX_QUEUED_JOBS = int(os.getenv("HEALTH_MAX_QUEUED_JOBS", "10000"))
+HEALTH_MAX_JOB_WAIT_SECONDS = float(os.getenv("HEALTH_MAX_JOB_WAIT_SECONDS", "600"))
+HEALTH_MAX_LOOP_LAG_MS = float(os.getenv("HEALTH_MAX_LOOP_LAG_MS", "500"))
+UPLOAD_DIR = "uploads"
+
+LOOP_PROBE_SECONDS = 0.1
+LOOP_LAG_WINDOW = 50  # samples, i.e. the last ~5 seconds
+
+def ms(seconds: float) -> float:
+    return round(seconds * 1000, 1)
+
+def check_pool() -> dict:
+    pool = database.engine.pool
+    # Only QueuePool has a size; other pools never run out
+    if not hasattr(pool, "size") or not hasattr(pool, "_max_overflow"):
+        return {"ok": True, "usage": 0.0}
+    capacity = pool.size() + max(pool._max_overflow, 0)
+    checked_out = pool.checkedout()
+    usage = round(checked_out / capacity, 3) if capacity else 0.0
+    return {"ok": usage < HEALTH_MAX_POOL_USAGE, "checked_out": checked_out, "capacity": capacity, "usage": usage}
+
+def check_database(pool_ok: bool) -> dict:
+    if not pool_ok:
+        return {"ok": False, "detail": "connection pool saturated"}
+    started = time.perf_counter()
+    try:
+        with database.engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+    except Exception as exc:
+        return {"ok": False, "detail": exc.__class__.__name__}
+    latency = time.perf_counter() - started
+    return {"ok": ms(latency) <= HEALTH_MAX_DB_LATENCY_MS, "latency_ms": ms(latency)}
+
+def check_uploads() -> dict:
+    try:
+        usage = shutil.disk_usage(UPLOAD_DIR)
+    except OSError as exc:
+        return {"ok": False, "detail": exc.__class__.__name__}
+    free_mb = round(usage.free / 1024 / 1024, 1)
+    return {"ok": free_mb >= HEALTH_MIN_FREE_UPLOAD_MB, "free_mb": free_mb}
+
+def check_jobs(database_ok: bool) -> dict:
+    if not database_ok:
+        return {"ok": True, "detail": "skipped"}
+    now = datetime.utcnow()
+    db = database.SessionLocal()
+    try:
+        queued, oldest = db.query(func.count(models.Job.job_id), func.min(models.Job.run_at)).filter(
+            models.Job.status == "queued",
+            models.Job.run_at <= now
+        ).one()
+    except Exception as exc:
+        return {"ok": False, "detail": exc.__class__.__name__}
+    finally:
+        db.close()
+    wait = (now - oldest.replace(tzinfo=None)).total_seconds() if oldest is not None else 0.0
+    return {
+        "ok": queued <= HEALTH_MAX_QUEUED_JOBS and wait <= HEALTH_MAX_JOB_WAIT_SECONDS,
+        "queued": queued,
+        "oldest_wait_seconds": round(wait, 1),
+    }
+
+class Readiness:
+    def __init__(self):
+        self.started = threading.Event()
+        self._lags = []
+        self._monitor = None
+        self._cached_at = None
+        self._cached = None
+        self._lock = threading.Lock()
+
+    # Called from the last startup hook, inside the event loop
+    def mark_started(self):
+        if self._monitor is None:
+            self._monitor = asyncio.get_running_loop().create_task(self._watch_loop())
+        self.started.set()
+
+    async def _watch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + LOOP_PROBE_SECONDS
+            await asyncio.sleep(LOOP_PROBE_SECONDS)
+            self._lags.append(max(0.0, loop.time() - expected))
+            del self._lags[:-LOOP_LAG_WINDOW]
+
+    def check_event_loop(self) -> dict:
+        if self._monitor is None:
+            return {"ok": True, "detail": "not monitored"}
+        lag = max(self._lags, default=0.0)
+        return {"ok": ms(lag) <= HEALTH_MAX_LOOP_LAG_MS, "max_lag_ms": ms(lag)}
+
+    def _run_checks(self) -> dict:
+        checks = {"pool": check_pool()}
+        checks["database"] = check_database(checks["pool"]["ok"])
+        checks["uploads"] = check_uploads()
+        checks["jobs"] = check_jobs(checks["database"]["ok"])
+        checks["event_loop"] = self.check_event_loop()
+        failing = [name for name, result in checks.items() if not result["ok"]]
+        return {"status": "unready" if failing else "ready", "failing": failing, "checks": checks}
+
+    # Blocking; call from a worker thread
+    def report(self) -> dict:
+        if not self.started.is_set():
+            return {"status": "starting", "failing": ["startup"], "checks": {}}
+        with self._lock:
+            now = time.monotonic()
+            if self._cached is None or now - self._cached_at >= HEALTH_CACHE_SECONDS:
+                self._cached = self._run_checks()
+                self._cached_at = now
+            return self._cached
+
+readiness = Readiness()
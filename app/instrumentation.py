@@ -0,0 +1,96 @@
+import json
+import logging
+import os
+import re
+import time
+from contextvars import ContextVar
+from sqlalchemy import event
+from . import metrics
+
+logger = logging.getLogger("app.sql")
+
+# Requests whose DB time exceeds this are logged at WARNING
+SLOW_REQUEST_DB_MS = float(os.getenv("SLOW_REQUEST_DB_MS", "200"))
+# The same statement shape repeated this often in one request looks like N+1
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "5"))
+
+PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|\?|\b\d+\b|'(?:[^']|'')*'")
+PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+WHITESPACE = re.compile(r"\s+")
+
+# Statement with literals and bind parameters collapsed, so the same query
+# with different ids maps to the same shape
+def statement_shape(statement: str) -> str:
+    shape = PLACEHOLDER.sub("?", statement)
+    shape = PLACEHOLDER_LIST.sub("(?)", shape)
+    return WHITESPACE.sub(" ", shape).strip()
+
+# SQL activity of one request
+class RequestStats:
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_statement = None
+        self.shapes = {}
+
+    def record(self, statement: str, elapsed: float):
+        self.count += 1
+        self.total_time += elapsed
+        if elapsed > self.slowest_time:
+            self.slowest_time = elapsed
+            self.slowest_statement = statement
+        shape = statement_shape(statement)
+        self.shapes[shape] = self.shapes.get(shape, 0) + 1
+
+    def suspected_n_plus_one(self, threshold: int = N_PLUS_ONE_THRESHOLD):
+        return {shape: count for shape, count in self.shapes.items() if count >= threshold}
+
+    def server_timing(self, total_time: float) -> str:
+        return (
+            f'db;dur={self.total_time * 1000:.1f};desc="{self.count} queries", '
+            f"total;dur={total_time * 1000:.1f}"
+        )
+
+request_stats: ContextVar = ContextVar("request_stats", default=None)
+
+# The start time lives on the execution context, so a statement that fails
+# (and never reaches after_cursor_execute) can't shift later timings
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_started = time.perf_counter()
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_query_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    metrics.observe_query(statement, elapsed)
+    stats = request_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+
+def instrument_engine(engine):
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+# Emit one structured log line per request
+def log_request(method: str, path: str, status_code: int, total_time: float, stats: RequestStats):
+    suspects = stats.suspected_n_plus_one()
+    level = logging.WARNING if suspects or stats.total_time * 1000 >= SLOW_REQUEST_DB_MS else logging.DEBUG
+    if not logger.isEnabledFor(level):
+        return
+    record = {
+        "method": method,
+        "path": path,
+        "status": status_code,
+        "duration_ms": round(total_time * 1000, 1),
+        "db_queries": stats.count,
+        "db_time_ms": round(stats.total_time * 1000, 1),
+        "db_slowest_ms": round(stats.slowest_time * 1000, 1),
+        "db_slowest_statement": stats.slowest_statement,
+    }
+    if suspects:
+        record["n_plus_one"] = [{"statement": shape, "count": count} for shape, count in suspects.items()]
+
+    logger.log(level, json.dumps(record))
@@ -0,0 +1,287 @@
+import json
+import logging
+import os
+import socket
+import threading
+import traceback
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import case, func, update, delete
+from sqlalchemy.orm import Session
+from . import models, database
+
+logger = logging.getLogger("app.jobs")
+
+# Durable job queue for slow side effects.
+#
+# Handlers call enqueue() instead of doing the work inline. The job row is
+# written in the request's own transaction, so it exists exactly when the
+# request's changes were committed, and it survives restarts of either
+# process. worker.py claims queued jobs (highest priority first, oldest
+# first within a priority) and runs them in its own threads.
+#
+# A job's handler gets a session and the job's payload as keyword
+# arguments. Its writes are committed together with the job's "done"
+# status, so database side effects happen once; anything it sends to the
+# outside world (SMS, email) may repeat if the worker dies mid-job.
+#
+# A failing job is retried after an exponential backoff until max_attempts
+# is reached and then stays "failed" for inspection at /jobs. A job whose
+# worker stopped heartbeating for JOB_LEASE_SECONDS is put back in the
+# queue. Per-kind concurrency limits are checked when claiming, so with
+# several workers they can briefly be exceeded by the number of workers.
+
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_RETRY_BASE_SECONDS = int(os.getenv("JOB_RETRY_BASE_SECONDS", "10"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+# Finished jobs are deleted after this many hours; failed ones are kept
+JOB_RETENTION_HOURS = int(os.getenv("JOB_RETENTION_HOURS", "24"))
+
+STATUSES = ("queued", "running", "done", "failed")
+
+class JobHandler:
+    def __init__(self, kind: str, func, priority: int, concurrency: Optional[int], max_attempts: int):
+        self.kind = kind
+        self.func = func
+        self.priority = priority
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+
+HANDLERS = {}
+
+# Register a job handler, e.g.
+#   @jobs.handler("send_otp", priority=10, concurrency=4)
+#   def send_otp(db, email_or_phone): ...
+def handler(kind: str, priority: int = 0, concurrency: Optional[int] = None, max_attempts: int = JOB_MAX_ATTEMPTS):
+    def register(func):
+        HANDLERS[kind] = JobHandler(kind, func, priority, concurrency, max_attempts)
+        return func
+    return register
+
+# Queue a job in the caller's transaction; it runs once the caller commits
+def enqueue(db: Session, kind: str, payload: dict, priority: Optional[int] = None, delay_seconds: int = 0) -> models.Job:
+    registered = HANDLERS.get(kind)
+    job = models.Job(
+        kind=kind,
+        payload=json.dumps(payload),
+        priority=priority if priority is not None else (registered.priority if registered else 0),
+        status="queued",
+        attempts=0,
+        max_attempts=registered.max_attempts if registered else JOB_MAX_ATTEMPTS,
+        run_at=datetime.utcnow() + timedelta(seconds=delay_seconds)
+    )
+    db.add(job)
+    return job
+
+# Claim the next runnable job for `worker_id`, or None
+def claim(db: Session, worker_id: str) -> Optional[models.Job]:
+    now = datetime.utcnow()
+    running = dict(db.query(models.Job.kind, func.count(models.Job.job_id)).filter(
+        models.Job.status == "running"
+    ).group_by(models.Job.kind).all())
+    saturated = [
+        kind for kind, registered in HANDLERS.items()
+        if registered.concurrency is not None and running.get(kind, 0) >= registered.concurrency
+    ]
+
+    query = db.query(models.Job).filter(
+        models.Job.status == "queued",
+        models.Job.run_at <= now
+    )
+    if saturated:
+        query = query.filter(models.Job.kind.notin_(saturated))
+    job = query.order_by(
+        models.Job.priority.desc(),
+        models.Job.job_id
+    ).with_for_update(skip_locked=True).first()
+    if job is None:
+        db.rollback()
+        return None
+
+    job.status = "running"
+    job.attempts += 1
+    job.locked_by = worker_id
+    job.locked_at = now
+    db.commit()
+    return job
+
+def retry_delay(attempts: int) -> timedelta:
+    return timedelta(seconds=JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+
+# Run one claimed job in a fresh session and record the outcome
+def execute(job_id: int, kind: str, payload: str, attempts: int, max_attempts: int):
+    db = database.SessionLocal()
+    try:
+        registered = HANDLERS.get(kind)
+        if registered is None:
+            raise LookupError(f"No handler registered for job kind '{kind}'")
+        registered.func(db, **json.loads(payload))
+        # The handler's writes commit together with the job's completion,
+        # unless the lease expired and the job was claimed again meanwhile
+        completed = db.execute(update(models.Job).where(
+            models.Job.job_id == job_id,
+            models.Job.status == "running",
+            models.Job.attempts == attempts
+        ).values(
+            status="done",
+            finished_at=datetime.utcnow(),
+            locked_by=None,
+            last_error=None
+        )).rowcount
+        if not completed:
+            db.rollback()
+            logger.warning("Job %s (%s) lost its lease; discarding this run", job_id, kind)
+            return False
+        db.commit()
+        return True
+    except Exception:
+        db.rollback()
+        error = traceback.format_exc(limit=5)
+        logger.warning("Job %s (%s) failed on attempt %s/%s", job_id, kind, attempts, max_attempts, exc_info=True)
+        values = {"locked_by": None, "last_error": error[-4000:]}
+        if attempts >= max_attempts:
+            values.update(status="failed", finished_at=datetime.utcnow())
+        else:
+            values.update(status="queued", run_at=datetime.utcnow() + retry_delay(attempts))
+        db.execute(update(models.Job).where(
+            models.Job.job_id == job_id,
+            models.Job.status == "running",
+            models.Job.attempts == attempts
+        ).values(**values))
+        db.commit()
+        return False
+    finally:
+        db.close()
+
+# Claim and run one job; False when the queue had nothing runnable
+def work_once(worker_id: str) -> bool:
+    db = database.SessionLocal()
+    try:
+        job = claim(db, worker_id)
+        if job is None:
+            return False
+        claimed = (job.job_id, job.kind, job.payload, job.attempts, job.max_attempts)
+    finally:
+        db.close()
+    execute(*claimed)
+    return True
+
+# Run everything that is due, e.g. from tests or a one-off maintenance script
+def drain(worker_id: str = "drain") -> int:
+    count = 0
+    while work_once(worker_id):
+        count += 1
+    return count
+
+# Keep the leases of this worker's running jobs alive
+def heartbeat(db: Session, worker_id: str):
+    db.execute(update(models.Job).where(
+        models.Job.status == "running",
+        models.Job.locked_by == worker_id
+    ).values(locked_at=datetime.utcnow()))
+    db.commit()
+
+# Requeue jobs of workers that died and drop old finished jobs. A job whose
+# attempts are used up fails instead: one that kills its worker would
+# otherwise be requeued forever.
+def maintain(db: Session) -> dict:
+    now = datetime.utcnow()
+    exhausted = models.Job.attempts >= models.Job.max_attempts
+    expired = db.execute(update(models.Job).where(
+        models.Job.status == "running",
+        models.Job.locked_at < now - timedelta(seconds=JOB_LEASE_SECONDS)
+    ).values(
+        status=case((exhausted, "failed"), else_="queued"),
+        finished_at=case((exhausted, now), else_=None),
+        last_error=case(
+            (exhausted, f"Lease expired after {JOB_LEASE_SECONDS}s on the last attempt; the worker died or hung"),
+            else_=models.Job.last_error
+        ),
+        locked_by=None,
+        run_at=now
+    )).rowcount
+    pruned = db.execute(delete(models.Job).where(
+        models.Job.status == "done",
+        models.Job.finished_at < now - timedelta(hours=JOB_RETENTION_HOURS)
+    )).rowcount
+    db.commit()
+    if expired:
+        logger.warning("Released %s jobs with expired leases (requeued, or failed when out of attempts)", expired)
+    return {"expired": expired, "pruned": pruned}
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+# Worker main loop: `concurrency` threads claiming jobs until `stop` is set.
+# Running jobs are finished before returning.
+def run_worker(concurrency: int = 4, stop: Optional[threading.Event] = None, poll_seconds: float = JOB_POLL_SECONDS):
+    stop = stop or threading.Event()
+    worker_id = worker_name()
+
+    def loop():
+        while not stop.is_set():
+            try:
+                if not work_once(worker_id):
+                    stop.wait(poll_seconds)
+            except Exception:
+                logger.exception("Job worker loop error")
+                stop.wait(poll_seconds)
+
+    threads = [threading.Thread(target=loop, name=f"job-worker-{n}", daemon=True) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    logger.info("Job worker %s started with %s threads", worker_id, concurrency)
+
+    maintenance_interval = max(1, JOB_LEASE_SECONDS // 3)
+    while not stop.wait(maintenance_interval):
+        db = database.SessionLocal()
+        try:
+            heartbeat(db, worker_id)
+            maintain(db)
+        except Exception:
+            logger.exception("Job maintenance failed")
+        finally:
+            db.close()
+    for thread in threads:
+        thread.join()
+    logger.info("Job worker %s stopped", worker_id)
+
+# Queue depth per kind for the dashboard
+def stats(db: Session) -> dict:
+    now = datetime.utcnow()
+    kinds = {}
+    for kind, status, count in db.query(
+        models.Job.kind, models.Job.status, func.count(models.Job.job_id)
+    ).group_by(models.Job.kind, models.Job.status):
+        counters = kinds.setdefault(kind, dict.fromkeys(STATUSES, 0))
+        counters[status] = count
+
+    for kind, oldest in db.query(models.Job.kind, func.min(models.Job.run_at)).filter(
+        models.Job.status == "queued",
+        models.Job.run_at <= now
+    ).group_by(models.Job.kind):
+        if oldest is not None:
+            if oldest.tzinfo is not None:
+                oldest = oldest.astimezone(timezone.utc).replace(tzinfo=None)
+            kinds[kind]["oldest_due_seconds"] = round((now - oldest).total_seconds(), 1)
+
+    for kind, counters in kinds.items():
+        registered = HANDLERS.get(kind)
+        counters.setdefault("oldest_due_seconds", 0.0)
+        counters["concurrency"] = registered.concurrency if registered else None
+    return {
+        "queued": sum(counters["queued"] for counters in kinds.values()),
+        "running": sum(counters["running"] for counters in kinds.values()),
+        "failed": sum(counters["failed"] for counters in kinds.values()),
+        "kinds": kinds,
+    }
+
+# Put a failed job back in the queue with a fresh set of attempts
+def retry(db: Session, job_id: int) -> bool:
+    updated = db.execute(update(models.Job).where(
+        models.Job.job_id == job_id,
+        models.Job.status == "failed"
+    ).values(status="queued", attempts=0, run_at=datetime.utcnow(), finished_at=None)).rowcount
+    db.commit()
+    return bool(updated)
@@ -3,10 +3,19 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import JSONResponse
 import os
+import time
 from fastapi.security import OAuth2PasswordRequestForm
 from . import models
-from .database import engine
-from .routers import users, auth, inventory, notifications, tickets, tests
+from .database import engine, SessionLocal
+from .instrumentation import RequestStats, request_stats, instrument_engine, log_request
+from .changes import track_changes, ensure_versions
+from .serial_index import serial_index
+from .serialization import DEFAULT_RESPONSE_CLASS
+from .compression import CompressionMiddleware
+from .ratelimit import RateLimitMiddleware
+from .health import readiness
+from .metrics import instrument_pool, record_pool_capacity, track_in_flight, observe_request, route_label
+from .routers import users, auth, inventory, notifications, tickets, tests, changes, cache, compression, analytics, jobs, health, metrics, profiling
 from datetime import timedelta
 from . import schemas
 from .database import get_db
@@ -16,11 +25,31 @@ from . import auth as auth_utils  # นำเข้าเป็นชื่อ
 # Create database tables if they don't exist
 models.Base.metadata.create_all(bind=engine)
 
+# create_all skips tables that already exist, so indexes added to a model
+# later (e.g. users.phone, inventory.name_product) are created here
+for table in models.Base.metadata.sorted_tables:
+    for index in table.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+# Record query count and DB time per request, and pool usage for /metrics
+instrument_engine(engine)
+instrument_pool(engine)
+
+# Append to the change feed on every flush
+track_changes(SessionLocal)
+
+# Apply token revocations to this worker once they are committed
+auth_utils.track_revocations(SessionLocal)
+
 # Create directories for file uploads
 os.makedirs("uploads/profile_pics", exist_ok=True)
 os.makedirs("uploads/test_files", exist_ok=True)
 
-app = FastAPI(title="Inventory Management System API")
+app = FastAPI(title="Inventory Management System API", default_response_class=DEFAULT_RESPONSE_CLASS)
+
+# Token-bucket rate limits per IP, user and route class. Added before CORS,
+# which wraps it, so 429 responses still carry the CORS headers.
+app.add_middleware(RateLimitMiddleware)
 
 # Configure CORS
 app.add_middleware(
@@ -45,6 +74,58 @@ async def errors_handling(request: Request, call_next):
             content={"detail": str(exc)},
         )
 
+# SQL instrumentation: query count, DB time and N+1 suspects per request
+@app.middleware("http")
+async def instrument_requests(request: Request, call_next):
+    stats = RequestStats()
+    token = request_stats.set(stats)
+    started = time.perf_counter()
+    track_in_flight(1)
+    try:
+        response = await call_next(request)
+    finally:
+        request_stats.reset(token)
+        track_in_flight(-1)
+    total_time = time.perf_counter() - started
+    observe_request(request.method, route_label(request.scope), response.status_code, total_time)
+
+    response.headers["X-Query-Count"] = str(stats.count)
+    response.headers["Server-Timing"] = stats.server_timing(total_time)
+    log_request(request.method, request.url.path, response.status_code, total_time, stats)
+    return response
+
+# Compress large JSON/text responses; added last so it wraps every other
+# middleware and sees the final headers
+app.add_middleware(CompressionMiddleware)
+
+# Warm the in-memory serial number index used by barcode scans
+@app.on_event("startup")
+def build_serial_index():
+    db = SessionLocal()
+    try:
+        serial_index.build(db)
+    finally:
+        db.close()
+
+# Version rows behind the list ETags
+@app.on_event("startup")
+def create_collection_versions():
+    db = SessionLocal()
+    try:
+        ensure_versions(db)
+    finally:
+        db.close()
+
+# Each worker reports its own pool to the db_pool_capacity gauge
+@app.on_event("startup")
+def report_pool_capacity():
+    record_pool_capacity(engine)
+
+# Registered last: readiness flips once the hooks above have run
+@app.on_event("startup")
+async def mark_ready():
+    readiness.mark_started()
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(users.router)
@@ -52,6 +133,14 @@ app.include_router(inventory.router)
 app.include_router(notifications.router)
 app.include_router(tickets.router)
 app.include_router(tests.router)
+app.include_router(changes.router)
+app.include_router(cache.router)
+app.include_router(compression.router)
+app.include_router(analytics.router)
+app.include_router(jobs.router)
+app.include_router(health.router)
+app.include_router(metrics.router)
+app.include_router(profiling.router)
 
 @app.get("/")
 def read_root():
@@ -70,11 +159,7 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token_expires = timedelta(minutes=auth_utils.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = auth_utils.create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
-    )
-    return {"access_token": access_token, "token_type": "bearer"}
+    return auth_utils.create_user_tokens(db, user)
 
 if __name__ == "__main__":
     import uvicorn
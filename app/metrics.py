@@ -0,0 +1,174 @@
+import logging
+import os
+import time
+from threading import Lock
+from sqlalchemy import event, func
+from . import models, database
+
+try:
+    import prometheus_client
+    from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, multiprocess
+    from prometheus_client.core import GaugeMetricFamily
+except ImportError:  # optional dependency, /metrics answers 404 without it
+    prometheus_client = None
+
+logger = logging.getLogger("app.metrics")
+
+# Prometheus metrics behind GET /metrics.
+#
+# Request counts, latencies and in-flight requests are recorded by the
+# instrument_requests middleware in main.py, labelled with the route
+# template (/tickets/{ticket_id}) rather than the raw path. SQL statement
+# counts and durations come from the engine hooks in instrumentation.py,
+# pool checkouts from pool events.
+#
+# Each worker process updates its own counters. When serve.py runs several
+# workers it sets PROMETHEUS_MULTIPROC_DIR, the client library keeps the
+# values in per-process files there and a scrape of any worker adds them
+# up. Gauges use "livesum", so exited workers drop out.
+#
+# Domain gauges (tickets by status, parts by status, unread notifications)
+# are read from the database at scrape time by the worker that answers,
+# at most every METRICS_DOMAIN_CACHE_SECONDS.
+
+METRICS_ENABLED = prometheus_client is not None and os.getenv("METRICS_ENABLED", "1").lower() not in ("0", "false", "no", "off")
+METRICS_DOMAIN_CACHE_SECONDS = float(os.getenv("METRICS_DOMAIN_CACHE_SECONDS", "15"))
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+if METRICS_ENABLED:
+    REQUESTS = Counter(
+        "http_requests_total", "HTTP requests by route and status code",
+        ["method", "route", "status"]
+    )
+    REQUEST_DURATION = Histogram(
+        "http_request_duration_seconds", "HTTP request latency by route",
+        ["method", "route"], buckets=LATENCY_BUCKETS
+    )
+    IN_FLIGHT = Gauge(
+        "http_requests_in_flight", "Requests being handled", multiprocess_mode="livesum"
+    )
+    QUERIES = Counter("db_queries_total", "SQL statements executed", ["operation"])
+    QUERY_DURATION = Histogram(
+        "db_query_duration_seconds", "SQL statement duration", ["operation"], buckets=QUERY_BUCKETS
+    )
+    POOL_CHECKED_OUT = Gauge(
+        "db_pool_checked_out", "Connections checked out of the pool", multiprocess_mode="livesum"
+    )
+    POOL_CAPACITY = Gauge(
+        "db_pool_capacity", "Pool size plus max overflow", multiprocess_mode="livesum"
+    )
+
+# Label for a statement: its first keyword, e.g. SELECT or INSERT
+def statement_operation(statement: str) -> str:
+    keyword = statement.lstrip().split(None, 1)[:1]
+    return keyword[0].upper() if keyword else "OTHER"
+
+def track_in_flight(delta: int):
+    if METRICS_ENABLED:
+        IN_FLIGHT.inc(delta)
+
+def observe_request(method: str, route: str, status_code: int, seconds: float):
+    if METRICS_ENABLED:
+        REQUESTS.labels(method, route, str(status_code)).inc()
+        REQUEST_DURATION.labels(method, route).observe(seconds)
+
+def observe_query(statement: str, seconds: float):
+    if METRICS_ENABLED:
+        operation = statement_operation(statement)
+        QUERIES.labels(operation).inc()
+        QUERY_DURATION.labels(operation).observe(seconds)
+
+# Route template of a handled request; unmatched paths share one label so
+# scanners can't create a series per URL
+def route_label(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+def instrument_pool(engine):
+    if not METRICS_ENABLED:
+        return
+    pool = engine.pool
+    event.listen(pool, "checkout", lambda *args: POOL_CHECKED_OUT.inc())
+    event.listen(pool, "checkin", lambda *args: POOL_CHECKED_OUT.dec())
+
+# Called from a startup hook, which runs in every serving worker. With
+# gunicorn's preload the app is imported only in the master, so setting the
+# gauge at import would report one pool instead of one per worker.
+def record_pool_capacity(engine):
+    if not METRICS_ENABLED:
+        return
+    pool = engine.pool
+    if hasattr(pool, "size") and hasattr(pool, "_max_overflow"):
+        POOL_CAPACITY.set(pool.size() + max(pool._max_overflow, 0))
+
+class DomainCollector:
+    def __init__(self, cache_seconds: float = METRICS_DOMAIN_CACHE_SECONDS):
+        self.cache_seconds = cache_seconds
+        self._values = None
+        self._read_at = None
+        self._lock = Lock()
+
+    def read(self) -> dict:
+        db = database.SessionLocal()
+        try:
+            # ticket_stats keeps the totals under owner 0
+            tickets = db.query(models.TicketStats.status, func.sum(models.TicketStats.count)).filter(
+                models.TicketStats.owner_id == 0
+            ).group_by(models.TicketStats.status).all()
+            parts = db.query(models.Inventory.status, func.count(models.Inventory.part_id)).group_by(
+                models.Inventory.status
+            ).all()
+            unread = db.query(func.count(models.Notification.notification_id)).filter(
+                models.Notification.is_read == False,
+                models.Notification.is_deleted == False
+            ).scalar()
+        finally:
+            db.close()
+        return {"tickets": tickets, "parts": parts, "unread": unread or 0}
+
+    # Nothing to check for name clashes, and registering must not query
+    def describe(self):
+        return []
+
+    def collect(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._values is None or now - self._read_at >= self.cache_seconds:
+                try:
+                    self._values = self.read()
+                except Exception:
+                    # A scrape still returns the process metrics
+                    logger.warning("Reading domain metrics failed", exc_info=True)
+                    if self._values is None:
+                        return
+                self._read_at = now
+            values = self._values
+
+        tickets = GaugeMetricFamily("tickets", "Tickets by status", labels=["status"])
+        for status, count in values["tickets"]:
+            tickets.add_metric([str(status)], count or 0)
+        yield tickets
+        parts = GaugeMetricFamily("inventory_parts", "Inventory parts by status", labels=["status"])
+        for status, count in values["parts"]:
+            parts.add_metric([status or "unknown"], count)
+        yield parts
+        yield GaugeMetricFamily("notifications_unread", "Unread notifications", value=values["unread"])
+
+domain_collector = DomainCollector()
+
+if METRICS_ENABLED and not MULTIPROCESS:
+    prometheus_client.REGISTRY.register(domain_collector)
+
+# Exposition text and content type for a scrape, or None when disabled
+def render_latest():
+    if not METRICS_ENABLED:
+        return None
+    registry = prometheus_client.REGISTRY
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(domain_collector)
+    return prometheus_client.generate_latest(registry), prometheus_client.CONTENT_TYPE_LATEST
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, Enum, Text, TIMESTAMP, Float
+from sqlalchemy import Boolean, Column, Date, ForeignKey, Integer, String, DateTime, Enum, Text, TIMESTAMP, Float, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -120,7 +120,7 @@ class User(Base):
     email = Column(String(100), unique=True, index=True)
     first_name = Column(String(50))
     last_name = Column(String(50))
-    phone = Column(String(20))
+    phone = Column(String(20), index=True)
     password_hash = Column(String(255))
     role = Column(String(20), default="user")
     is_active = Column(Boolean, default=True)
@@ -141,7 +141,7 @@ class Inventory(Base):
 
     part_id = Column(Integer, primary_key=True, index=True)
     type = Column(String(20))
-    name_product = Column(String(255))
+    name_product = Column(String(255), index=True)
     part_number = Column(String(50), index=True)
     serial_number = Column(String(50), unique=True, index=True)
     location = Column(String(20))
@@ -156,6 +156,22 @@ class Inventory(Base):
     ticket_parts = relationship("TicketPart", back_populates="part")
     tests = relationship("Test", back_populates="part")
 
+# InventoryTerm model (distinct part numbers and product names for fuzzy search)
+class InventoryTerm(Base):
+    __tablename__ = "inventory_terms"
+    __table_args__ = (UniqueConstraint("field", "value"),)
+
+    term_id = Column(Integer, primary_key=True, index=True)
+    field = Column(String(20))
+    value = Column(String(255))
+
+# InventoryTrigram model (trigram postings for InventoryTerm)
+class InventoryTrigram(Base):
+    __tablename__ = "inventory_trigrams"
+
+    trigram = Column(String(3), primary_key=True)
+    term_id = Column(Integer, ForeignKey("inventory_terms.term_id"), primary_key=True, index=True)
+
 # Tests model
 class Test(Base):
     __tablename__ = "tests"
@@ -232,6 +248,25 @@ class Ticket(Base):
     attachments = relationship("Attachment", back_populates="ticket")
     ticket_parts = relationship("TicketPart", back_populates="ticket")
 
+# TicketStats model (ticket counters per owner; owner_id 0 counts all tickets)
+class TicketStats(Base):
+    __tablename__ = "ticket_stats"
+
+    owner_id = Column(Integer, primary_key=True)
+    status = Column(String(20), primary_key=True)
+    priority = Column(String(20), primary_key=True)
+    category = Column(String(20), primary_key=True)
+    count = Column(Integer, default=0)
+
+# TicketSearchTerm model (inverted index for ticket full-text search)
+class TicketSearchTerm(Base):
+    __tablename__ = "ticket_search_terms"
+
+    term = Column(String(50), primary_key=True)
+    ticket_id = Column(Integer, ForeignKey("tickets.ticket_id"), primary_key=True, index=True)
+    source = Column(String(20), primary_key=True)
+    frequency = Column(Integer, default=1)
+
 # TicketPart model
 class TicketPart(Base):
     __tablename__ = "ticket_parts"
@@ -339,4 +374,126 @@ class InventoryItem(Base):
 
     # Relationships
     creator = relationship("User", foreign_keys=[created_by])
-    modifier = relationship("User", foreign_keys=[last_modified_by])
\ No newline at end of file
+    modifier = relationship("User", foreign_keys=[last_modified_by])
+# StockReservation model
+class StockReservation(Base):
+    __tablename__ = "stock_reservations"
+
+    reservation_id = Column(Integer, primary_key=True, index=True)
+    item_id = Column(Integer, ForeignKey("inventory_items.item_id"), index=True)
+    ticket_id = Column(Integer, ForeignKey("tickets.ticket_id"), nullable=True)
+    quantity = Column(Integer)
+    status = Column(String(20), default="active", index=True)
+    created_by = Column(Integer, ForeignKey("users.user_id"))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), index=True)
+
+    # Relationships
+    item = relationship("InventoryItem")
+    ticket = relationship("Ticket")
+    creator = relationship("User", foreign_keys=[created_by])
+
+# InventoryItemStats model (running aggregates per category)
+class InventoryItemStats(Base):
+    __tablename__ = "inventory_item_stats"
+
+    category = Column(String(100), primary_key=True)
+    item_count = Column(Integer, default=0)
+    total_quantity = Column(Integer, default=0)
+    total_value = Column(Float, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+# LowStockThreshold model
+class LowStockThreshold(Base):
+    __tablename__ = "low_stock_thresholds"
+
+    category = Column(String(100), primary_key=True)
+    threshold = Column(Integer)
+    updated_by = Column(Integer, ForeignKey("users.user_id"))
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+# ChangeLog model (append-only change feed; change_id is the sync cursor)
+class ChangeLog(Base):
+    __tablename__ = "change_log"
+    __table_args__ = (
+        Index("ix_change_log_entity_change", "entity", "change_id"),
+        Index("ix_change_log_entity_row", "entity", "entity_id"),
+    )
+
+    change_id = Column(Integer, primary_key=True, index=True)
+    entity = Column(String(20))
+    entity_id = Column(Integer)
+    operation = Column(String(10))
+    owner_id = Column(Integer, nullable=True, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+# CollectionVersion model (one shard is bumped in the same transaction as
+# every change_log row; a collection's version is the sum of its shards)
+class CollectionVersion(Base):
+    __tablename__ = "collection_version_shards"
+
+    entity = Column(String(20), primary_key=True)
+    shard = Column(Integer, primary_key=True, autoincrement=False)
+    version = Column(Integer, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+# TestResultRollup model (daily test result counts per part and test type)
+class TestResultRollup(Base):
+    __tablename__ = "test_result_rollup"
+
+    day = Column(Date, primary_key=True)
+    part_type = Column(String(20), primary_key=True)
+    part_number = Column(String(50), primary_key=True)
+    name_product = Column(String(255), primary_key=True)
+    test_type = Column(String(20), primary_key=True)
+    total = Column(Integer, default=0)
+    passed = Column(Integer, default=0)
+    failed = Column(Integer, default=0)
+
+# RollupWatermark model (last source row folded into a rollup table)
+class RollupWatermark(Base):
+    __tablename__ = "rollup_watermarks"
+
+    rollup = Column(String(50), primary_key=True)
+    last_id = Column(Integer, default=0)
+    refreshed_at = Column(DateTime(timezone=True), nullable=True)
+
+# Job model (durable queue for side effects, run by worker.py)
+class Job(Base):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_claim", "status", "priority", "run_at"),
+    )
+
+    job_id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(50), index=True)
+    payload = Column(Text)
+    priority = Column(Integer, default=0)
+    status = Column(String(10), default="queued")
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=5)
+    run_at = Column(DateTime(timezone=True))
+    locked_by = Column(String(100), nullable=True)
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+# OTPCode model (password reset codes when OTP_BACKEND=db; code_hash is an HMAC)
+class OTPCode(Base):
+    __tablename__ = "otp_codes"
+
+    identity = Column(String(120), primary_key=True)
+    code_hash = Column(String(64), nullable=True)
+    expires_at = Column(DateTime(timezone=True), nullable=True)
+    attempts = Column(Integer, default=0)
+    requests = Column(Integer, default=0)
+    window_ends_at = Column(DateTime(timezone=True), nullable=True)
+
+# TokenVersion model (tokens carrying an older version are revoked)
+class TokenVersion(Base):
+    __tablename__ = "token_versions"
+
+    user_id = Column(Integer, ForeignKey("users.user_id"), primary_key=True)
+    version = Column(Integer, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
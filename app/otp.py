@@ -0,0 +1,184 @@
+import heapq
+import hmac
+import hashlib
+import os
+import secrets
+import time
+from datetime import datetime, timedelta
+from threading import Lock
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from . import models, database
+
+# One-time passwords for password resets.
+#
+# Codes are kept as an HMAC of the code, never in clear, and checked with a
+# constant-time comparison. Every identity (email or phone) gets at most
+# OTP_REQUESTS_PER_WINDOW codes per OTP_REQUEST_WINDOW_SECONDS and
+# OTP_MAX_ATTEMPTS guesses per code; a code is gone after it was used, after
+# too many wrong guesses or after OTP_TTL_SECONDS.
+#
+# Codes are kept in the otp_codes table by default, where every API worker
+# and the job worker that delivers them can see them. OTP_BACKEND=memory
+# keeps them in the process instead, for a single API worker (development);
+# codes are then delivered from that process. Expiry in memory is driven by a
+# min-heap of deadlines, so each call only pops what has already expired
+# instead of scanning every entry.
+
+OTP_BACKEND = os.getenv("OTP_BACKEND", "db")
+OTP_TTL_SECONDS = int(os.getenv("OTP_TTL_SECONDS", "300"))
+OTP_MAX_ATTEMPTS = int(os.getenv("OTP_MAX_ATTEMPTS", "5"))
+OTP_REQUESTS_PER_WINDOW = int(os.getenv("OTP_REQUESTS_PER_WINDOW", "3"))
+OTP_REQUEST_WINDOW_SECONDS = int(os.getenv("OTP_REQUEST_WINDOW_SECONDS", "900"))
+OTP_LENGTH = 6
+
+_HMAC_KEY = (os.getenv("SECRET_KEY") or "otp").encode()
+
+def normalize_identity(email_or_phone: str) -> str:
+    return email_or_phone.strip().lower()
+
+def generate_code() -> str:
+    return "".join(secrets.choice("0123456789") for _ in range(OTP_LENGTH))
+
+def code_digest(identity: str, code: str) -> str:
+    return hmac.new(_HMAC_KEY, f"{identity}:{code}".encode(), hashlib.sha256).hexdigest()
+
+class MemoryOTPStore:
+    name = "memory"
+
+    def __init__(self):
+        self._codes = {}      # identity -> [digest, expires_at, attempts]
+        self._requests = {}   # identity -> [window_ends_at, count]
+        self._deadlines = []  # (deadline, identity, kind)
+        self._lock = Lock()
+
+    def _expire(self, now: float):
+        while self._deadlines and self._deadlines[0][0] <= now:
+            deadline, identity, kind = heapq.heappop(self._deadlines)
+            entries = self._codes if kind == "code" else self._requests
+            entry = entries.get(identity)
+            # A newer code or window for the identity has its own deadline
+            if entry is not None and entry[1 if kind == "code" else 0] <= now:
+                del entries[identity]
+
+    # Count a reset request; False once the identity used up its window
+    def allow_request(self, identity: str) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            window = self._requests.get(identity)
+            if window is None:
+                window = self._requests[identity] = [now + OTP_REQUEST_WINDOW_SECONDS, 0]
+                heapq.heappush(self._deadlines, (window[0], identity, "requests"))
+            if window[1] >= OTP_REQUESTS_PER_WINDOW:
+                return False
+            window[1] += 1
+            return True
+
+    # Store a new code for the identity, replacing any earlier one
+    def issue(self, identity: str) -> str:
+        code = generate_code()
+        now = time.monotonic()
+        expires_at = now + OTP_TTL_SECONDS
+        with self._lock:
+            self._expire(now)
+            self._codes[identity] = [code_digest(identity, code), expires_at, 0]
+            heapq.heappush(self._deadlines, (expires_at, identity, "code"))
+        return code
+
+    # True if the code is current; a valid code is consumed
+    def verify(self, identity: str, code: str) -> bool:
+        digest = code_digest(identity, code)
+        with self._lock:
+            self._expire(time.monotonic())
+            entry = self._codes.get(identity)
+            if entry is None:
+                return False
+            if hmac.compare_digest(entry[0], digest):
+                del self._codes[identity]
+                return True
+            entry[2] += 1
+            if entry[2] >= OTP_MAX_ATTEMPTS:
+                del self._codes[identity]
+            return False
+
+    def __len__(self):
+        return len(self._codes)
+
+class DatabaseOTPStore:
+    name = "db"
+
+    def _session(self):
+        return database.SessionLocal()
+
+    def allow_request(self, identity: str) -> bool:
+        now = datetime.utcnow()
+        db = self._session()
+        try:
+            row = db.query(models.OTPCode).filter(models.OTPCode.identity == identity).with_for_update().first()
+            if row is None:
+                try:
+                    with db.begin_nested():
+                        db.add(models.OTPCode(identity=identity, window_ends_at=now, requests=0, attempts=0))
+                except IntegrityError:
+                    pass
+                row = db.query(models.OTPCode).filter(models.OTPCode.identity == identity).with_for_update().first()
+            if row.window_ends_at is None or row.window_ends_at <= now:
+                row.window_ends_at = now + timedelta(seconds=OTP_REQUEST_WINDOW_SECONDS)
+                row.requests = 0
+            allowed = row.requests < OTP_REQUESTS_PER_WINDOW
+            if allowed:
+                row.requests += 1
+            db.flush()
+            # Drop rows whose window and code have both run out
+            db.execute(delete(models.OTPCode).where(
+                models.OTPCode.window_ends_at < now,
+                (models.OTPCode.expires_at == None) | (models.OTPCode.expires_at < now)
+            ))
+            db.commit()
+            return allowed
+        finally:
+            db.close()
+
+    def issue(self, identity: str) -> str:
+        code = generate_code()
+        db = self._session()
+        try:
+            row = db.query(models.OTPCode).filter(models.OTPCode.identity == identity).with_for_update().first()
+            if row is None:
+                row = models.OTPCode(identity=identity, requests=0)
+                db.add(row)
+            row.code_hash = code_digest(identity, code)
+            row.expires_at = datetime.utcnow() + timedelta(seconds=OTP_TTL_SECONDS)
+            row.attempts = 0
+            db.commit()
+        finally:
+            db.close()
+        return code
+
+    def verify(self, identity: str, code: str) -> bool:
+        digest = code_digest(identity, code)
+        db = self._session()
+        try:
+            row = db.query(models.OTPCode).filter(models.OTPCode.identity == identity).with_for_update().first()
+            if row is None or row.code_hash is None or row.expires_at is None or row.expires_at <= datetime.utcnow():
+                return False
+            valid = hmac.compare_digest(row.code_hash, digest)
+            row.attempts += 1
+            if valid or row.attempts >= OTP_MAX_ATTEMPTS:
+                row.code_hash = None
+                row.expires_at = None
+            db.commit()
+            return valid
+        finally:
+            db.close()
+
+    def __len__(self):
+        return 0
+
+def make_store():
+    if OTP_BACKEND == "db":
+        return DatabaseOTPStore()
+    return MemoryOTPStore()
+
+otp_store = make_store()
@@ -0,0 +1,252 @@
+import asyncio
+import cProfile
+import functools
+import glob
+import io
+import os
+import pstats
+import re
+import sys
+import tempfile
+import threading
+import time
+from contextvars import ContextVar
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+from . import auth, database
+
+# Production profiling, admin only (see routers/profiling.py).
+#
+# Sampling: POST /profiling/samples?seconds=30 starts a thread in the worker
+# that answers. Every PROFILE_SAMPLE_INTERVAL_MS it reads the current stack
+# of every other thread (sys._current_frames, no tracing hooks, so the
+# request path runs at full speed) and counts identical stacks. The result is
+# "folded" text, one "thread;frame;frame;... count" line per stack, which
+# flamegraph.pl, speedscope and inferno read directly. Threads waiting on a
+# lock, queue or selector are left out unless include_idle is set.
+#
+# Per request: a request to a route of a router built with
+# route_class=ProfiledRoute that carries "X-Profile: 1" and an admin bearer
+# token runs its endpoint under cProfile; the response carries
+# X-Profile-Id. Sync endpoints are profiled in their worker thread; for async
+# endpoints other tasks that run while the endpoint awaits show up as well.
+# One request per worker is profiled at a time, others answer with
+# "X-Profile: busy".
+#
+# Results are files in PROFILE_DIR, shared by the workers on one host, so
+# any worker can serve a download; only the newest PROFILE_KEEP are kept.
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "app-profiles"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "120"))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "10"))
+PROFILE_HEADER = "x-profile"
+
+PROFILE_ID = re.compile(r"^(sample|request)-\d+-\d+$")
+IDLE_FILES = ("threading.py", "selectors.py", "queue.py")
+EXTENSIONS = {"sample": ".folded", "request": ".prof"}
+
+def new_profile_id(kind: str) -> str:
+    return f"{kind}-{time.time_ns() // 1000}-{os.getpid()}"
+
+def profile_path(profile_id: str, running: bool = False) -> str:
+    kind = profile_id.partition("-")[0]
+    return os.path.join(PROFILE_DIR, profile_id + EXTENSIONS[kind] + (".part" if running else ""))
+
+# Path of a finished profile; None if unknown, "running" if not finished
+def find_profile(profile_id: str):
+    if not PROFILE_ID.match(profile_id):
+        return None
+    if os.path.exists(profile_path(profile_id)):
+        return profile_path(profile_id)
+    if os.path.exists(profile_path(profile_id, running=True)):
+        return "running"
+    return None
+
+def list_profiles() -> list:
+    profiles = []
+    for path in glob.glob(os.path.join(PROFILE_DIR, "*")):
+        name = os.path.basename(path)
+        profile_id, running = name.split(".")[0], name.endswith(".part")
+        if not PROFILE_ID.match(profile_id):
+            continue
+        stat = os.stat(path)
+        profiles.append({
+            "profile_id": profile_id,
+            "kind": profile_id.partition("-")[0],
+            "pid": int(profile_id.rsplit("-", 1)[1]),
+            "status": "running" if running else "done",
+            "size": stat.st_size,
+            "modified_at": stat.st_mtime,
+        })
+    return sorted(profiles, key=lambda profile: profile["modified_at"], reverse=True)
+
+# Remove all but the newest PROFILE_KEEP finished profiles
+def prune_profiles():
+    finished = [profile for profile in list_profiles() if profile["status"] == "done"]
+    for profile in finished[PROFILE_KEEP:]:
+        try:
+            os.remove(profile_path(profile["profile_id"]))
+        except OSError:
+            pass
+
+# Write to a temporary name first so readers never see half a file
+def save_profile(profile_id: str, write):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    partial = profile_path(profile_id, running=True)
+    write(partial)
+    os.replace(partial, profile_path(profile_id))
+    prune_profiles()
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    # ";" separates frames and " " the count in the folded format
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+def is_idle(frame) -> bool:
+    return os.path.basename(frame.f_code.co_filename) in IDLE_FILES
+
+def fold_stack(thread_name: str, frame) -> str:
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    labels.append(thread_name.replace(";", ":").replace(" ", "_"))
+    return ";".join(reversed(labels))
+
+class SamplingProfiler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._running = None
+
+    @property
+    def running(self):
+        return self._running
+
+    # Start sampling in the background; None if this worker is already sampling
+    def start(self, seconds: float, interval_ms: float = PROFILE_SAMPLE_INTERVAL_MS, include_idle: bool = False):
+        with self._lock:
+            if self._running is not None:
+                return None
+            profile_id = new_profile_id("sample")
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            open(profile_path(profile_id, running=True), "w").close()
+            self._running = profile_id
+        thread = threading.Thread(
+            target=self._run,
+            args=(profile_id, seconds, interval_ms / 1000, include_idle),
+            name="sampling-profiler",
+            daemon=True,
+        )
+        thread.start()
+        return profile_id
+
+    def _run(self, profile_id: str, seconds: float, interval: float, include_idle: bool):
+        counts = {}
+        own = threading.get_ident()
+        deadline = time.monotonic() + seconds
+        try:
+            while time.monotonic() < deadline:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                frames = sys._current_frames()
+                for ident, frame in frames.items():
+                    if ident == own or (not include_idle and is_idle(frame)):
+                        continue
+                    stack = fold_stack(names.get(ident, f"thread-{ident}"), frame)
+                    counts[stack] = counts.get(stack, 0) + 1
+                # Don't keep the sampled frames (and their locals) alive while sleeping
+                frames = frame = None
+                time.sleep(interval)
+
+            def write(path):
+                with open(path, "w") as output:
+                    for stack, count in sorted(counts.items()):
+                        output.write(f"{stack} {count}\n")
+            save_profile(profile_id, write)
+        finally:
+            with self._lock:
+                self._running = None
+
+sampling_profiler = SamplingProfiler()
+
+# cProfile.Profile of the current request, when it is being profiled
+request_profile: ContextVar = ContextVar("request_profile", default=None)
+# cProfile can't run two profiles at once on Python 3.12+
+_request_profile_lock = threading.Lock()
+
+def profiled_endpoint(endpoint):
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            profile = request_profile.get()
+            if profile is None:
+                return await endpoint(*args, **kwargs)
+            profile.enable()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                profile.disable()
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            profile = request_profile.get()
+            if profile is None:
+                return endpoint(*args, **kwargs)
+            profile.enable()
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                profile.disable()
+    return wrapper
+
+# Raises 401/403 unless the request carries an admin token
+def authorize_profiling(authorization: str):
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise auth.credentials_exception()
+    db = database.SessionLocal()
+    try:
+        auth.get_user_with_role("admin")(token=token, db=db)
+    finally:
+        db.close()
+
+def save_request_profile(profile: cProfile.Profile) -> str:
+    profile_id = new_profile_id("request")
+    save_profile(profile_id, profile.dump_stats)
+    return profile_id
+
+# pstats report of a request profile, heaviest entries first
+def render_stats(path: str, sort: str = "cumulative", limit: int = 50) -> str:
+    output = io.StringIO()
+    stats = pstats.Stats(path, stream=output)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return output.getvalue()
+
+class ProfiledRoute(APIRoute):
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, profiled_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def profiled_handler(request):
+            if request.headers.get(PROFILE_HEADER, "0") in ("", "0"):
+                return await handler(request)
+            await run_in_threadpool(authorize_profiling, request.headers.get("authorization", ""))
+            if not _request_profile_lock.acquire(blocking=False):
+                response = await handler(request)
+                response.headers["X-Profile"] = "busy"
+                return response
+            try:
+                profile = cProfile.Profile()
+                token = request_profile.set(profile)
+                try:
+                    response = await handler(request)
+                finally:
+                    request_profile.reset(token)
+            finally:
+                _request_profile_lock.release()
+            response.headers["X-Profile-Id"] = await run_in_threadpool(save_request_profile, profile)
+            return response
+
+        return profiled_handler
@@ -0,0 +1,263 @@
+import json
+import math
+import os
+import time
+import zlib
+from threading import Lock
+from typing import Optional
+from jose import JWTError, jwt
+from starlette.datastructures import Headers
+from . import auth
+
+try:
+    import redis
+except ImportError:  # optional dependency, only needed for RATE_LIMIT_REDIS_URL
+    redis = None
+
+# Request rate limiting.
+#
+# Every request takes a token from two buckets: one for its route class,
+# keyed by the signed-in user (or the client IP when there is no valid
+# token), and one per client IP that caps everything an address sends. A
+# request rejected by the second bucket gets its first token back. A
+# bucket holds `capacity` tokens and refills at capacity/period per second,
+# so short bursts pass and sustained overuse gets 429 with Retry-After.
+#
+# Route classes:
+#   login  POST /token, /auth/token and the password reset endpoints, per IP,
+#          so credential stuffing can't keep every worker busy with bcrypt
+#   write  other non-GET requests
+#   read   GET and HEAD
+#
+# Limits are "capacity/period_seconds" strings, e.g. RATE_LIMIT_LOGIN=10/60.
+#
+# Buckets live in a sharded in-process table; a bucket that has been idle
+# long enough to refill completely is equivalent to a new one and is
+# evicted. Each worker process counts on its own, so with N workers a client
+# gets up to N times the limit; set RATE_LIMIT_REDIS_URL (e.g. a Redis on
+# the same host) to share the buckets between workers. A Redis outage lets
+# requests through rather than failing them.
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1").lower() not in ("0", "false", "no", "off")
+RATE_LIMIT_LOGIN = os.getenv("RATE_LIMIT_LOGIN", "10/60")
+RATE_LIMIT_WRITE = os.getenv("RATE_LIMIT_WRITE", "120/60")
+RATE_LIMIT_READ = os.getenv("RATE_LIMIT_READ", "600/60")
+RATE_LIMIT_IP = os.getenv("RATE_LIMIT_IP", "1200/60")
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL")
+# Use the first X-Forwarded-For address as the client IP (behind a proxy)
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "0").lower() in ("1", "true", "yes", "on")
+RATE_LIMIT_SHARDS = 16
+
+LOGIN_PATHS = ("/token", "/auth/token", "/auth/forgot-password", "/auth/reset-password")
+EXEMPT_PATHS = ("/healthcheck", "/health/live", "/health/ready", "/metrics")
+
+def parse_limit(spec: str):
+    capacity, _, period = spec.partition("/")
+    capacity = float(capacity)
+    return capacity, capacity / float(period or 1)
+
+LIMITS = {
+    "login": parse_limit(RATE_LIMIT_LOGIN),
+    "write": parse_limit(RATE_LIMIT_WRITE),
+    "read": parse_limit(RATE_LIMIT_READ),
+    "ip": parse_limit(RATE_LIMIT_IP),
+}
+
+class MemoryBuckets:
+    name = "memory"
+
+    def __init__(self, limits=None, shards: int = RATE_LIMIT_SHARDS):
+        self.limits = limits or LIMITS
+        # key -> (tokens, updated_at); tuples keep each bucket small
+        self._shards = [{} for _ in range(shards)]
+        self._locks = [Lock() for _ in range(shards)]
+        self._swept_at = [time.monotonic()] * shards
+
+    # Take one token; returns seconds to wait, 0.0 when allowed
+    def take(self, key: str, capacity: float, rate: float) -> float:
+        shard = zlib.crc32(key.encode()) % len(self._shards)
+        buckets = self._shards[shard]
+        now = time.monotonic()
+        with self._locks[shard]:
+            tokens, updated_at = buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+            if tokens < 1:
+                buckets[key] = (tokens, now)
+                return (1 - tokens) / rate
+            buckets[key] = (tokens - 1, now)
+            if now - self._swept_at[shard] > 60:
+                self._sweep(shard, now)
+            return 0.0
+
+    # Return a token taken by a request that was rejected by another bucket
+    def refund(self, key: str, capacity: float):
+        shard = zlib.crc32(key.encode()) % len(self._shards)
+        buckets = self._shards[shard]
+        with self._locks[shard]:
+            if key in buckets:
+                tokens, updated_at = buckets[key]
+                buckets[key] = (min(capacity, tokens + 1), updated_at)
+
+    # Evict buckets idle long enough to be full again
+    def _sweep(self, shard: int, now: float):
+        self._swept_at[shard] = now
+        buckets = self._shards[shard]
+        idle = [
+            key for key, (tokens, updated_at) in buckets.items()
+            if now - updated_at > self._refill_seconds(key)
+        ]
+        for key in idle:
+            del buckets[key]
+
+    def _refill_seconds(self, key: str) -> float:
+        capacity, rate = self.limits[key.partition(":")[0]]
+        return capacity / rate
+
+    def __len__(self):
+        return sum(len(buckets) for buckets in self._shards)
+
+# Token bucket as one atomic script; the key expires once it would be full
+TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(bucket[1]) or capacity
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+local wait = 0
+if tokens < 1 then
+    wait = (1 - tokens) / rate
+else
+    tokens = tokens - 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated_at', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+REFUND_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens'))
+if tokens then
+    redis.call('HSET', KEYS[1], 'tokens', math.min(capacity, tokens + 1))
+end
+"""
+
+class RedisBuckets:
+    name = "redis"
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        self.client = redis.Redis.from_url(url, socket_timeout=0.2)
+        self.prefix = prefix
+        self._take = self.client.register_script(TAKE_SCRIPT)
+        self._refund = self.client.register_script(REFUND_SCRIPT)
+
+    def take(self, key: str, capacity: float, rate: float) -> float:
+        try:
+            return float(self._take(keys=[self.prefix + key], args=[capacity, rate, time.time()]))
+        except redis.RedisError:
+            return 0.0
+
+    def refund(self, key: str, capacity: float):
+        try:
+            self._refund(keys=[self.prefix + key], args=[capacity])
+        except redis.RedisError:
+            pass
+
+    def __len__(self):
+        return 0
+
+def make_buckets(limits=None):
+    if RATE_LIMIT_REDIS_URL and redis is not None:
+        return RedisBuckets(RATE_LIMIT_REDIS_URL)
+    return MemoryBuckets(limits)
+
+def route_class(method: str, path: str) -> str:
+    if method == "POST" and path in LOGIN_PATHS:
+        return "login"
+    if method in ("GET", "HEAD"):
+        return "read"
+    return "write"
+
+# Username of a validly signed bearer token, without touching the database
+def token_subject(headers: Headers) -> Optional[str]:
+    authorization = headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM]).get("sub")
+    except JWTError:
+        return None
+
+def client_ip(scope, headers: Headers) -> str:
+    if RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+class RateLimitStats:
+    def __init__(self):
+        self._rejected = {}
+        self._lock = Lock()
+
+    def reject(self, bucket_class: str):
+        with self._lock:
+            self._rejected[bucket_class] = self._rejected.get(bucket_class, 0) + 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"rejected": dict(self._rejected)}
+
+rate_limit_stats = RateLimitStats()
+
+class RateLimitMiddleware:
+    def __init__(self, app, buckets=None, limits=None, enabled: bool = RATE_LIMIT_ENABLED, stats: RateLimitStats = rate_limit_stats):
+        self.app = app
+        self.limits = limits or LIMITS
+        self.buckets = buckets if buckets is not None else make_buckets(self.limits)
+        self.enabled = enabled
+        self.stats = stats
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http" or scope["method"] == "OPTIONS" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        ip = client_ip(scope, headers)
+        bucket_class = route_class(scope["method"], scope["path"])
+        subject = None if bucket_class == "login" else token_subject(headers)
+        checks = (
+            (bucket_class, f"user:{subject}" if subject else f"ip:{ip}"),
+            ("ip", ip),
+        )
+        taken = []
+        for name, key in checks:
+            capacity, rate = self.limits[name]
+            wait = self.buckets.take(f"{name}:{key}", capacity, rate)
+            if wait > 0:
+                for taken_key, taken_capacity in taken:
+                    self.buckets.refund(taken_key, taken_capacity)
+                self.stats.reject(name)
+                await self.reject(send, wait)
+                return
+            taken.append((f"{name}:{key}", capacity))
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    async def reject(send, wait: float):
+        body = json.dumps({"detail": "Too many requests"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(wait))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,75 @@
+from datetime import date
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from .. import models, schemas, auth, analytics
+from ..database import get_db
+from ..profiling import ProfiledRoute
+
+router = APIRouter(
+    prefix="/analytics",
+    tags=["analytics"],
+    responses={404: {"description": "Not found"}},
+    route_class=ProfiledRoute,
+)
+
+# Failure rates per part type, part number, product and/or test type, e.g.
+# ?group_by=part_number,test_type&test_type=system&part_type=hdd
+@router.get("/test-failures", response_model=schemas.FailureRateResponse)
+def get_test_failure_rates(
+    group_by: str = "part_type,part_number,test_type",
+    window: str = "all",
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    part_type: Optional[str] = None,
+    part_number: Optional[str] = None,
+    name_product: Optional[str] = None,
+    test_type: Optional[str] = None,
+    min_results: int = Query(1, ge=1),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_user_with_role("engineer"))
+):
+    dimensions = [name.strip() for name in group_by.split(",") if name.strip()]
+    unknown = [name for name in dimensions if name not in analytics.DIMENSIONS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cannot group by {', '.join(unknown)}; use {', '.join(analytics.DIMENSIONS)}"
+        )
+    if window not in analytics.WINDOWS:
+        raise HTTPException(status_code=400, detail=f"Window must be one of {', '.join(analytics.WINDOWS)}")
+
+    analytics.refresh_if_stale(db)
+    filters = {
+        name: value
+        for name, value in (
+            ("part_type", part_type),
+            ("part_number", part_number),
+            ("name_product", name_product),
+            ("test_type", test_type),
+        )
+        if value is not None
+    }
+    rates = analytics.failure_rates(
+        db, list(dict.fromkeys(dimensions)), window=window, since=since, until=until,
+        filters=filters, min_results=min_results, limit=limit
+    )
+    state = analytics.watermark_state(db)
+    return schemas.FailureRateResponse(
+        group_by=dimensions,
+        window=window,
+        refreshed_at=state.refreshed_at if state else None,
+        rates=rates
+    )
+
+# Fold all new results into the rollup now; rebuild=true recounts everything
+@router.post("/test-failures/refresh", response_model=schemas.RollupRefreshResponse)
+def refresh_test_failure_rollup(
+    rebuild: bool = False,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_user_with_role("admin"))
+):
+    results = analytics.rebuild_rollup(db) if rebuild else analytics.refresh_all(db)
+    state = analytics.watermark_state(db)
+    return schemas.RollupRefreshResponse(results=results, last_result_id=state.last_id)
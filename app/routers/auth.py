@@ -1,29 +1,40 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from datetime import timedelta
 from datetime import timedelta, datetime
-import random
-import string
-from .. import models, schemas, auth
+import logging
+from .. import models, schemas, auth, jobs
+from ..otp import otp_store, normalize_identity
 from ..database import get_db
 
+logger = logging.getLogger("app.auth")
+
 router = APIRouter(
     prefix="/auth",
     tags=["authentication"],
     responses={404: {"description": "Not found"}},
 )
 
-# Generate OTP
-def generate_otp():
-    return ''.join(random.choices(string.digits, k=6))
+# Find an active user by email or phone (both columns are indexed)
+def find_user_by_contact(db: Session, email_or_phone: str):
+    column = models.User.email if "@" in email_or_phone else models.User.phone
+    return db.query(models.User).filter(
+        column == email_or_phone,
+        models.User.is_deleted == False
+    ).first()
 
 # Function to send OTP (simulated)
-def send_otp(email_or_phone: str, otp: str):
-    # In a real app, this would send an email or SMS
-    print(f"Sending OTP {otp} to {email_or_phone}")
-    # Store OTP in database temporarily
-    # This is a simple simulation - in production use Redis or another storage
+def deliver_otp(email_or_phone: str, otp: str):
+    # In a real app, this would send an email or SMS. The code itself is
+    # never logged: log files are read by more people than the user.
+    logger.info("Sending OTP to %s", email_or_phone)
+
+# Runs on the job worker. The code is issued here rather than carried in the
+# job payload, so it is never stored in clear; a retried job sends a new one.
+@jobs.handler("send_otp", priority=10)
+def send_otp(db: Session, email_or_phone: str):
+    deliver_otp(email_or_phone, otp_store.issue(normalize_identity(email_or_phone)))
 
 # Login endpoint
 @router.post("/token", response_model=schemas.Token)
@@ -39,53 +50,61 @@ async def login_for_access_token(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    user.last_login = datetime.utcnow()
-    db.commit()
-
-    access_token_expires = timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = auth.create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
-    )
+    tokens = auth.create_user_tokens(db, user)
     
     # Update last login
     user.last_login = datetime.utcnow()
     db.commit()
     
-    return {"access_token": access_token, "token_type": "bearer"}
+    return tokens
+
+# Trade a refresh token for a new access and refresh token
+@router.post("/refresh", response_model=schemas.Token)
+def refresh_access_token(
+    refresh: schemas.TokenRefresh,
+    db: Session = Depends(get_db)
+):
+    payload = auth.decode_token(refresh.refresh_token, token_type="refresh")
+    user = db.query(models.User).filter(
+        models.User.user_id == payload.get("uid"),
+        models.User.is_deleted == False
+    ).first()
+    if not user:
+        raise auth.credentials_exception()
+    
+    # Role changes since the last refresh are picked up here
+    return auth.create_user_tokens(db, user)
 
 # Request password reset (forgot password)
 @router.post("/forgot-password", status_code=status.HTTP_200_OK)
 def forgot_password(
     reset_request: schemas.PasswordReset,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
+    # Limited per email/phone before touching the database, whether or not
+    # it is registered
+    identity = normalize_identity(reset_request.email_or_phone)
+    if not otp_store.allow_request(identity):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many reset requests, try again later"
+        )
+    
     # Find user by email or phone
-    user = None
-    if "@" in reset_request.email_or_phone:  # Email
-        user = db.query(models.User).filter(
-            models.User.email == reset_request.email_or_phone,
-            models.User.is_deleted == False
-        ).first()
-    else:  # Phone
-        user = db.query(models.User).filter(
-            models.User.phone == reset_request.email_or_phone,
-            models.User.is_deleted == False
-        ).first()
+    user = find_user_by_contact(db, reset_request.email_or_phone)
     
     if not user:
         # For security reasons, don't reveal whether the email/phone exists
         return {"message": "If the email or phone is registered, you will receive an OTP"}
     
-    # Generate OTP
-    otp = generate_otp()
-    
-    # Send OTP (in background)
-    background_tasks.add_task(send_otp, reset_request.email_or_phone, otp)
+    # Codes held in this process's memory can't be issued by the job worker
+    if otp_store.name == "memory":
+        deliver_otp(reset_request.email_or_phone, otp_store.issue(identity))
+        return {"message": "If the email or phone is registered, you will receive an OTP"}
     
-    # In a real application, store OTP with expiration time in Redis or similar
-    # For this demo, we'll create a temporary entry in the user table or a separate table
-    # Here, you would typically store the OTP and set an expiration time
+    # Generate, store and send OTP (queued for the job worker)
+    jobs.enqueue(db, "send_otp", {"email_or_phone": reset_request.email_or_phone})
+    db.commit()
     
     return {"message": "If the email or phone is registered, you will receive an OTP"}
 
@@ -95,31 +114,22 @@ def reset_password(
     reset_data: schemas.PasswordReset,
     db: Session = Depends(get_db)
 ):
-    # Validate OTP (in a real app, check against stored OTP)
     if not reset_data.otp or not reset_data.new_password:
         raise HTTPException(status_code=400, detail="OTP and new password are required")
     
+    # Validate OTP; wrong guesses count against the code's attempt limit
+    if not otp_store.verify(normalize_identity(reset_data.email_or_phone), reset_data.otp):
+        raise HTTPException(status_code=400, detail="Invalid or expired OTP")
+    
     # Find user by email or phone
-    user = None
-    if "@" in reset_data.email_or_phone:  # Email
-        user = db.query(models.User).filter(
-            models.User.email == reset_data.email_or_phone,
-            models.User.is_deleted == False
-        ).first()
-    else:  # Phone
-        user = db.query(models.User).filter(
-            models.User.phone == reset_data.email_or_phone,
-            models.User.is_deleted == False
-        ).first()
+    user = find_user_by_contact(db, reset_data.email_or_phone)
     
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # In a real app, verify OTP against stored value
-    # For demo, we'll assume OTP is valid
-    
-    # Update password
+    # Update password and sign out every session of the user
     user.password_hash = auth.get_password_hash(reset_data.new_password)
+    auth.revoke_tokens(db, user.user_id)
     db.commit()
     
     # Log activity
@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Depends
+from .. import models, auth
+from ..cache import response_cache
+
+router = APIRouter(
+    prefix="/cache",
+    tags=["cache"],
+    responses={404: {"description": "Not found"}},
+)
+
+# Hit/miss counters per cached endpoint (this worker only)
+@router.get("/stats")
+def get_cache_stats(
+    current_user: models.User = Depends(auth.get_user_with_role("admin"))
+):
+    return response_cache.stats()
+
+# Drop every cached response
+@router.post("/clear")
+def clear_cache(
+    current_user: models.User = Depends(auth.get_user_with_role("admin"))
+):
+    response_cache.clear()
+    return {"message": "Response cache cleared"}
@@ -0,0 +1,82 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session, selectinload
+from .. import models, schemas, auth, changes
+from ..database import get_db
+
+router = APIRouter(
+    prefix="/changes",
+    tags=["changes"],
+    responses={404: {"description": "Not found"}},
+)
+
+RESPONSE_SCHEMAS = {
+    "ticket": schemas.TicketResponse,
+    "comment": schemas.CommentResponse,
+    "inventory": schemas.PartResponse,
+    "test": schemas.TestResponse,
+    "notification": schemas.NotificationResponse,
+}
+
+LOAD_OPTIONS = {
+    "ticket": [selectinload(models.Ticket.attachments), selectinload(models.Ticket.comments)],
+    "test": [selectinload(models.Test.attachments), selectinload(models.Test.results)],
+}
+
+# Get rows created, updated or deleted since the cursor
+@router.get("/", response_model=schemas.ChangeFeedResponse)
+def get_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    # Notifications are private; regular users only see their own tickets and tests
+    shared = models.ChangeLog.entity != "notification"
+    if current_user.role == "user":
+        shared = and_(shared, or_(
+            models.ChangeLog.entity == "inventory",
+            models.ChangeLog.owner_id == current_user.user_id
+        ))
+    visible = or_(
+        shared,
+        and_(models.ChangeLog.entity == "notification", models.ChangeLog.owner_id == current_user.user_id)
+    )
+
+    rows = db.query(models.ChangeLog).filter(
+        models.ChangeLog.change_id > since,
+        models.ChangeLog.created_at <= changes.settled_before(db),
+        visible
+    ).order_by(models.ChangeLog.change_id).limit(limit + 1).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not rows:
+        return schemas.ChangeFeedResponse(cursor=since)
+
+    # Only the latest change per row matters to the client
+    latest = {}
+    for row in rows:
+        latest[(row.entity, row.entity_id)] = row
+
+    # Load the current state of every changed row, one query per entity
+    data = {}
+    for entity, (model, key) in changes.ENTITIES.items():
+        ids = [entity_id for (name, entity_id), row in latest.items() if name == entity and row.operation != "delete"]
+        if not ids:
+            continue
+        query = db.query(model).options(*LOAD_OPTIONS.get(entity, []))
+        for obj in query.filter(getattr(model, key).in_(ids)):
+            data[(entity, getattr(obj, key))] = RESPONSE_SCHEMAS[entity].model_validate(obj).model_dump(mode="json")
+
+    entries = [
+        schemas.ChangeEntry(
+            change_id=row.change_id,
+            entity=row.entity,
+            entity_id=row.entity_id,
+            operation=row.operation,
+            data=data.get((row.entity, row.entity_id))
+        )
+        for row in sorted(latest.values(), key=lambda row: row.change_id)
+    ]
+    return schemas.ChangeFeedResponse(cursor=rows[-1].change_id, has_more=has_more, changes=entries)
@@ -0,0 +1,16 @@
+from fastapi import APIRouter, Depends
+from .. import models, auth
+from ..compression import compression_stats
+
+router = APIRouter(
+    prefix="/compression",
+    tags=["compression"],
+    responses={404: {"description": "Not found"}},
+)
+
+# Bytes saved and time spent per encoding (this worker only)
+@router.get("/stats")
+def get_compression_stats(
+    current_user: models.User = Depends(auth.get_user_with_role("admin"))
+):
+    return compression_stats.snapshot()
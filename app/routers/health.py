@@ -0,0 +1,23 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from ..health import readiness
+
+router = APIRouter(
+    prefix="/health",
+    tags=["health"],
+    responses={404: {"description": "Not found"}},
+)
+
+# Liveness: the process is up and its event loop answers
+@router.get("/live")
+async def live():
+    return {"status": "ok"}
+
+# Readiness: startup finished and the database, connection pool, uploads
+# volume, job queue and event loop are within their thresholds (see
+# app/health.py). Answers 503 otherwise, with the failing checks.
+@router.get("/ready")
+async def ready():
+    report = await run_in_threadpool(readiness.report)
+    return JSONResponse(status_code=200 if report["status"] == "ready" else 503, content=report)
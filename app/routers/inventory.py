@@ -1,21 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query, Request, Response
+from sqlalchemy import func, insert, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from .. import models, schemas, auth
+from .. import models, schemas, auth, fuzzy, changes, conditional, jobs
+from ..cache import response_cache
+from ..serialization import render, json_response, schema_columns
 from ..database import get_db
+from ..profiling import ProfiledRoute
+from ..serial_index import serial_index
 import os
+import json
 import shutil
-from datetime import datetime
+from pydantic import ValidationError
+from datetime import datetime, timedelta
 
 router = APIRouter(
     prefix="/inventory",
     tags=["inventory"],
     responses={404: {"description": "Not found"}},
+    route_class=ProfiledRoute,
 )
 
 # Get all inventory items with filtering
-@router.get("/", response_model=List[schemas.InventoryResponse])
+@router.get("/", response_model=List[schemas.PartResponse])
 def get_inventory(
+    request: Request,
     location: Optional[str] = None,
     type: Optional[str] = None,
     name: Optional[str] = None,
@@ -26,7 +36,12 @@ def get_inventory(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
-    query = db.query(models.Inventory)
+    etag, last_modified = conditional.collection_validators(db, "inventory", request, current_user)
+    if conditional.is_fresh(request, etag, last_modified):
+        return conditional.not_modified(etag, last_modified)
+    
+    # Plain column rows, rendered without building ORM objects
+    query = db.query(*schema_columns(schemas.PartResponse, models.Inventory))
     
     # Apply filters if provided
     if location:
@@ -40,8 +55,11 @@ def get_inventory(
     if serial_number:
         query = query.filter(models.Inventory.serial_number.like(f"%{serial_number}%"))
     
-    items = query.offset(skip).limit(limit).all()
-    return items
+    rows = query.offset(skip).limit(limit).all()
+    return json_response(
+        render(List[schemas.PartResponse], rows),
+        conditional.validator_headers(etag, last_modified)
+    )
 
 # Search inventory
 @router.get("/search/", response_model=List[schemas.InventoryResponse])
@@ -62,26 +80,140 @@ def search_inventory(
     
     return items
 
+# Typo-tolerant search over part numbers and product names
+@router.get("/search/fuzzy", response_model=List[schemas.FuzzyMatch])
+def fuzzy_search_inventory(
+    query: str,
+    limit: int = Query(10, ge=1, le=100),
+    min_score: float = Query(0.3, gt=0, le=1),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    matches = fuzzy.search(db, query, limit=limit, min_score=min_score)
+    return [
+        schemas.FuzzyMatch(
+            part_id=part.part_id,
+            type=part.type,
+            name_product=part.name_product,
+            part_number=part.part_number,
+            serial_number=part.serial_number,
+            location=part.location,
+            sub_location=part.sub_location,
+            status=part.status,
+            score=round(score, 3)
+        )
+        for score, part in matches
+    ]
+
+# Rebuild the fuzzy search index (admin only)
+@router.post("/search/fuzzy/rebuild")
+def rebuild_fuzzy_index(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_user_with_role("admin"))
+):
+    indexed = fuzzy.rebuild_index(db)
+
+    # Log activity
+    activity_log = models.ActivityLog(
+        user_id=current_user.user_id,
+        action="REBUILD_FUZZY_INDEX",
+        details=f"Rebuilt fuzzy search index for {indexed} parts"
+    )
+    db.add(activity_log)
+    db.commit()
+
+    return {"message": "Fuzzy search index rebuilt", "indexed": indexed}
+
+# Resolve a batch of scanned serial numbers (barcode receiving desk)
+@router.post("/scan", response_model=schemas.ScanResponse)
+def scan_serial_numbers(
+    scan: schemas.ScanRequest,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    seen = set()
+    serials = []
+    duplicates = []
+    for serial_number in scan.serial_numbers:
+        key = serial_index.normalize(serial_number)
+        if not key:
+            continue
+        if key in seen:
+            duplicates.append(serial_number)
+            continue
+        seen.add(key)
+        serials.append(serial_number)
+
+    resolved = serial_index.resolve(db, serials)
+    found = [schemas.ScanMatch(**entry) for entry in resolved.values() if entry]
+    unknown = [serial_number for serial_number, entry in resolved.items() if entry is None]
+
+    return schemas.ScanResponse(
+        session_id=scan.session_id,
+        found=found,
+        unknown=unknown,
+        duplicates=duplicates
+    )
+
 # Get inventory by location
-@router.get("/location/{location}", response_model=List[schemas.InventoryResponse])
+@router.get("/location/{location}", response_model=List[schemas.PartResponse])
 def get_inventory_by_location(
     location: str,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
+    etag, last_modified = conditional.collection_validators(db, "inventory", request, current_user)
+    if conditional.is_fresh(request, etag, last_modified):
+        return conditional.not_modified(etag, last_modified)
+    headers = conditional.validator_headers(etag, last_modified)
+    
+    # Keyed by the ETag too, so a body is never served under the validators
+    # of a newer version (writes through other workers don't reach this cache)
+    cached = response_cache.get(
+        "inventory.location",
+        response_cache.key("inventory.location", current_user, location, etag),
+        ["inventory"]
+    )
+    if cached.body is not None:
+        return json_response(cached.body, headers)
+    
     items = db.query(models.Inventory).filter(models.Inventory.location == location).all()
-    return items
+    return json_response(cached.store(render(List[schemas.PartResponse], items)), headers)
+
+# Get all inventory items (registered before /{part_id}, which would match "items")
+@router.get("/items", response_model=List[schemas.InventoryResponse])
+def get_inventory_items(
+    skip: int = 0,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    # Plain column rows, rendered without building ORM objects
+    rows = db.query(*schema_columns(schemas.InventoryResponse, models.InventoryItem)).filter(
+        models.InventoryItem.is_deleted == False
+    ).offset(skip).limit(limit).all()
+    return json_response(render(List[schemas.InventoryResponse], rows))
 
 # Get inventory by ID
 @router.get("/{part_id}", response_model=schemas.InventoryResponse)
 def get_inventory_item(
     part_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
+    etag, last_modified = conditional.detail_validators(db, "inventory", part_id)
+    if conditional.is_fresh(request, etag, last_modified):
+        exists = db.query(models.Inventory.part_id).filter(models.Inventory.part_id == part_id).first()
+        if exists:
+            return conditional.not_modified(etag, last_modified)
+    
     item = db.query(models.Inventory).filter(models.Inventory.part_id == part_id).first()
     if not item:
         raise HTTPException(status_code=404, detail="Inventory item not found")
+    conditional.set_validators(response, etag, last_modified)
     return item
 
 # Add new inventory item (logistic or admin)
@@ -112,6 +244,11 @@ def create_inventory_item(
     db.add(db_item)
     db.commit()
     db.refresh(db_item)
+    serial_index.upsert(db_item)
+    response_cache.invalidate("inventory")
+    
+    # Index for fuzzy search
+    fuzzy.index_part(db, db_item)
     
     # Log activity
     activity_log = models.ActivityLog(
@@ -137,19 +274,16 @@ def send_for_engineering_test(
         raise HTTPException(status_code=404, detail="Part not found")
     
     # Find engineers to notify
-    engineers = db.query(models.User).filter(models.User.role == "engineer", models.User.is_deleted == False).all()
+    engineer = db.query(models.User.user_id).filter(models.User.role == "engineer", models.User.is_deleted == False).first()
     
-    if not engineers:
+    if not engineer:
         raise HTTPException(status_code=404, detail="No engineers found to notify")
     
-    # Create notification for each engineer
-    for engineer in engineers:
-        notification = models.Notification(
-            user_id=engineer.user_id,
-            message=f"You have a {part.type} to test click here"
-        )
-        db.add(notification)
-    
+    # Notify every engineer (queued for the job worker)
+    jobs.enqueue(db, "notify_users", {
+        "roles": ["engineer"],
+        "message": f"You have a {part.type} to test click here"
+    })
     db.commit()
     
     # Log activity
@@ -220,19 +354,14 @@ def update_inventory_status(
     part.health = health
     db.commit()
     db.refresh(part)
+    serial_index.update(part_id, status=status)
+    response_cache.invalidate("inventory")
     
-    # Notify logistics
-    logistics = db.query(models.User).filter(models.User.role == "logistic", models.User.is_deleted == False).all()
-    
-    if logistics:
-        for logistic in logistics:
-            notification = models.Notification(
-                user_id=logistic.user_id,
-                message=f"{part.type} test completed click here"
-            )
-            db.add(notification)
-        
-        db.commit()
+    # Notify logistics (queued for the job worker)
+    jobs.enqueue(db, "notify_users", {
+        "roles": ["logistic"],
+        "message": f"{part.type} test completed click here"
+    })
     
     # Log activity
     activity_log = models.ActivityLog(
@@ -245,6 +374,117 @@ def update_inventory_status(
     
     return part
 
+# Update status of many parts at once (engineer or admin)
+@router.put("/status/bulk")
+def bulk_update_inventory_status(
+    updates: str = Form(...),
+    file: Optional[UploadFile] = File(None),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_user_with_role("engineer"))
+):
+    # `updates` is a JSON array of {"part_id", "status", "health"}
+    try:
+        bulk = schemas.BulkStatusUpdate(items=json.loads(updates))
+    except (ValueError, ValidationError) as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+
+    part_ids = [item.part_id for item in bulk.items]
+    if len(set(part_ids)) != len(part_ids):
+        raise HTTPException(status_code=400, detail="Duplicate part_id in bulk update")
+
+    # Look up every part in one query
+    parts = {
+        part.part_id: part
+        for part in db.query(
+            models.Inventory.part_id,
+            models.Inventory.type,
+            models.Inventory.name_product,
+            models.Inventory.status
+        ).filter(models.Inventory.part_id.in_(part_ids)).all()
+    }
+    missing = [part_id for part_id in part_ids if part_id not in parts]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Parts not found: {missing}")
+
+    # Save the shared report file once
+    file_path = None
+    if file:
+        upload_dir = "uploads/test_files"
+        os.makedirs(upload_dir, exist_ok=True)
+
+        file_extension = file.filename.split(".")[-1]
+        filename = f"bulk_{current_user.user_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}.{file_extension}"
+        file_path = os.path.join(upload_dir, filename)
+
+        with open(file_path, "wb") as buffer:
+            shutil.copyfileobj(file.file, buffer)
+
+    tester = f"{current_user.first_name} {current_user.last_name}"
+    report = f" (report: {file_path})" if file_path else ""
+
+    # Test records, status logs and part updates as set-based statements;
+    # they bypass the change feed hook, so the changes are recorded explicitly
+    test_ids = changes.insert_rows(db, models.Test, [
+        {
+            "part_id": item.part_id,
+            "title": f"Test for {parts[item.part_id].name_product}",
+            "description": f"Test performed by {tester}{report}",
+            "test_type": models.TestType.FUNCTIONAL,
+            "status": models.TestStatus.COMPLETED,
+            "created_by": current_user.user_id
+        }
+        for item in bulk.items
+    ])
+    changes.record_changes(db, "test", test_ids, "create", owner_id=current_user.user_id)
+    db.execute(insert(models.StatusLog), [
+        {
+            "part_id": item.part_id,
+            "status_before": parts[item.part_id].status,
+            "status_after": item.status,
+            "updated_by": current_user.user_id
+        }
+        for item in bulk.items
+    ])
+    db.execute(update(models.Inventory), [
+        {"part_id": item.part_id, "status": item.status, "health": item.health}
+        for item in bulk.items
+    ])
+    changes.record_changes(db, "inventory", part_ids, "update")
+
+    # One aggregated notification per logistic user
+    status_counts = {}
+    for item in bulk.items:
+        status_counts[item.status] = status_counts.get(item.status, 0) + 1
+    summary = ", ".join(f"{count} {status}" for status, count in sorted(status_counts.items()))
+
+    jobs.enqueue(db, "notify_users", {
+        "roles": ["logistic"],
+        "title": "Bulk Test Completed",
+        "message": f"{len(bulk.items)} parts tested: {summary} click here",
+        "notification_type": models.NotificationType.INFO.value,
+        "created_by": current_user.user_id
+    })
+
+    # Log activity
+    activity_log = models.ActivityLog(
+        user_id=current_user.user_id,
+        action="BULK_UPDATE_STATUS",
+        details=f"Updated status of {len(bulk.items)} parts: {summary}"[:255]
+    )
+    db.add(activity_log)
+    db.commit()
+
+    for item in bulk.items:
+        serial_index.update(item.part_id, status=item.status)
+    response_cache.invalidate("inventory")
+
+    return {
+        "message": "Part statuses updated successfully",
+        "updated": len(bulk.items),
+        "statuses": status_counts,
+        "report_path": file_path
+    }
+
 # Delete inventory item (admin only)
 @router.delete("/{part_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_inventory_item(
@@ -267,21 +507,213 @@ def delete_inventory_item(
     # Delete the item
     db.delete(part)
     db.commit()
+    serial_index.discard(part_id)
+    response_cache.invalidate("inventory")
     
     return {"message": "Part deleted successfully"}
 
-# Get all inventory items
-@router.get("/items", response_model=List[schemas.InventoryResponse])
-def get_inventory_items(
-    skip: int = 0,
-    limit: int = 100,
+# Stock value contributed by a single inventory item
+def item_value(item):
+    return (item.quantity or 0) * (item.unit_price or 0)
+
+# Apply a delta to the running per-category aggregates
+def apply_item_stats(db: Session, category: str, count: int = 0, quantity: int = 0, value: float = 0.0):
+    updated = db.query(models.InventoryItemStats).filter(
+        models.InventoryItemStats.category == category
+    ).update(
+        {
+            "item_count": models.InventoryItemStats.item_count + count,
+            "total_quantity": models.InventoryItemStats.total_quantity + quantity,
+            "total_value": models.InventoryItemStats.total_value + value
+        },
+        synchronize_session=False
+    )
+    if updated:
+        return
+
+    try:
+        with db.begin_nested():
+            db.add(models.InventoryItemStats(
+                category=category,
+                item_count=count,
+                total_quantity=quantity,
+                total_value=value
+            ))
+    except IntegrityError:
+        # Another request created the category row first
+        apply_item_stats(db, category, count, quantity, value)
+
+# Notify logistics about items that fell below their category threshold.
+# `quantity_changes` is a list of (name, category, old_quantity, new_quantity);
+# all alerts of one request go out as one notification per recipient.
+def notify_low_stock(db: Session, quantity_changes, actor_id: int):
+    categories = {category for _, category, _, _ in quantity_changes}
+    if not categories:
+        return 0
+
+    thresholds = dict(db.query(
+        models.LowStockThreshold.category,
+        models.LowStockThreshold.threshold
+    ).filter(models.LowStockThreshold.category.in_(categories)).all())
+
+    crossed = [
+        f"{name} ({category}): {new_quantity} left, threshold {thresholds[category]}"
+        for name, category, old_quantity, new_quantity in quantity_changes
+        if category in thresholds
+        and new_quantity < thresholds[category]
+        and (old_quantity is None or old_quantity >= thresholds[category])
+    ]
+    if not crossed:
+        return 0
+
+    # Recipients are looked up by the job worker
+    jobs.enqueue(db, "notify_users", {
+        "roles": ["logistic", "admin"],
+        "title": "Low Stock Alert",
+        "message": "; ".join(crossed)[:1000],
+        "notification_type": models.NotificationType.WARNING.value,
+        "created_by": actor_id
+    })
+    return len(crossed)
+
+# Keep aggregates and low-stock alerts in step with an atomic quantity change
+def track_quantity_change(db: Session, item_id: int, delta: int, actor_id: int):
+    item = db.query(
+        models.InventoryItem.name,
+        models.InventoryItem.category,
+        models.InventoryItem.quantity,
+        models.InventoryItem.unit_price
+    ).filter(models.InventoryItem.item_id == item_id).first()
+    if not item:
+        return None
+
+    apply_item_stats(db, item.category, quantity=delta, value=delta * (item.unit_price or 0))
+    if delta < 0:
+        notify_low_stock(db, [(item.name, item.category, item.quantity - delta, item.quantity)], actor_id)
+    return item.quantity
+
+# Get stock valuation per category (served from running aggregates)
+@router.get("/items/stats", response_model=schemas.InventoryStatsResponse)
+def get_inventory_item_stats(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
-    items = db.query(models.InventoryItem).filter(
+    rows = db.query(models.InventoryItemStats).filter(
+        models.InventoryItemStats.item_count > 0
+    ).order_by(models.InventoryItemStats.category).all()
+    thresholds = dict(db.query(
+        models.LowStockThreshold.category,
+        models.LowStockThreshold.threshold
+    ).all())
+
+    categories = [
+        schemas.CategoryStats(
+            category=row.category,
+            item_count=row.item_count,
+            total_quantity=row.total_quantity,
+            total_value=round(row.total_value, 2),
+            low_stock_threshold=thresholds.get(row.category)
+        )
+        for row in rows
+    ]
+    return schemas.InventoryStatsResponse(
+        item_count=sum(c.item_count for c in categories),
+        total_quantity=sum(c.total_quantity for c in categories),
+        total_value=round(sum(c.total_value for c in categories), 2),
+        categories=categories
+    )
+
+# Recompute the running aggregates from scratch (admin only)
+@router.post("/items/stats/rebuild", response_model=schemas.InventoryStatsResponse)
+def rebuild_inventory_item_stats(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_user_with_role("admin"))
+):
+    rows = db.query(
+        models.InventoryItem.category,
+        func.count(models.InventoryItem.item_id),
+        func.coalesce(func.sum(models.InventoryItem.quantity), 0),
+        func.coalesce(func.sum(models.InventoryItem.quantity * models.InventoryItem.unit_price), 0)
+    ).filter(
         models.InventoryItem.is_deleted == False
-    ).offset(skip).limit(limit).all()
-    return items
+    ).group_by(models.InventoryItem.category).all()
+
+    db.query(models.InventoryItemStats).delete(synchronize_session=False)
+    if rows:
+        db.execute(insert(models.InventoryItemStats), [
+            {
+                "category": category,
+                "item_count": item_count,
+                "total_quantity": total_quantity,
+                "total_value": total_value
+            }
+            for category, item_count, total_quantity, total_value in rows
+        ])
+
+    # Log activity
+    activity_log = models.ActivityLog(
+        user_id=current_user.user_id,
+        action="REBUILD_INVENTORY_STATS",
+        details=f"Rebuilt inventory stats for {len(rows)} categories"
+    )
+    db.add(activity_log)
+    db.commit()
+
+    return get_inventory_item_stats(db=db, current_user=current_user)
+
+# Get low-stock thresholds
+@router.get("/items/thresholds", response_model=List[schemas.LowStockThresholdResponse])
+def get_low_stock_thresholds(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    return db.query(models.LowStockThreshold).order_by(models.LowStockThreshold.category).all()
+
+# Set low-stock threshold for a category (admin only)
+@router.put("/items/thresholds/{category}", response_model=schemas.LowStockThresholdResponse)
+def set_low_stock_threshold(
+    category: str,
+    threshold_update: schemas.LowStockThresholdUpdate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_user_with_role("admin"))
+):
+    threshold = db.query(models.LowStockThreshold).filter(
+        models.LowStockThreshold.category == category
+    ).first()
+    if not threshold:
+        threshold = models.LowStockThreshold(category=category)
+        db.add(threshold)
+
+    threshold.threshold = threshold_update.threshold
+    threshold.updated_by = current_user.user_id
+
+    # Log activity
+    activity_log = models.ActivityLog(
+        user_id=current_user.user_id,
+        action="SET_LOW_STOCK_THRESHOLD",
+        details=f"Set low-stock threshold for {category} to {threshold_update.threshold}"
+    )
+    db.add(activity_log)
+    db.commit()
+    db.refresh(threshold)
+
+    return threshold
+
+# Remove low-stock threshold for a category (admin only)
+@router.delete("/items/thresholds/{category}")
+def delete_low_stock_threshold(
+    category: str,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_user_with_role("admin"))
+):
+    deleted = db.query(models.LowStockThreshold).filter(
+        models.LowStockThreshold.category == category
+    ).delete(synchronize_session=False)
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Threshold not found")
+
+    db.commit()
+    return {"message": "Threshold deleted successfully"}
 
 # Get inventory item by ID
 @router.get("/items/{item_id}", response_model=schemas.InventoryResponse)
@@ -314,6 +746,8 @@ def create_inventory_item(
         created_by=current_user.user_id
     )
     db.add(db_item)
+    apply_item_stats(db, db_item.category, count=1, quantity=db_item.quantity, value=item_value(db_item))
+    notify_low_stock(db, [(db_item.name, db_item.category, None, db_item.quantity)], current_user.user_id)
     db.commit()
     db.refresh(db_item)
     
@@ -343,10 +777,23 @@ def update_inventory_item(
     if not db_item:
         raise HTTPException(status_code=404, detail="Item not found")
     
+    old_category = db_item.category
+    old_quantity = db_item.quantity
+    old_value = item_value(db_item)
+    
     # Update item
     for key, value in item_update.dict(exclude_unset=True).items():
         setattr(db_item, key, value)
     
+    # Move the item's contribution in the running aggregates
+    apply_item_stats(db, old_category, count=-1, quantity=-old_quantity, value=-old_value)
+    apply_item_stats(db, db_item.category, count=1, quantity=db_item.quantity, value=item_value(db_item))
+    notify_low_stock(
+        db,
+        [(db_item.name, db_item.category, old_quantity if db_item.category == old_category else None, db_item.quantity)],
+        current_user.user_id
+    )
+    
     db_item.last_modified_by = current_user.user_id
     db.commit()
     db.refresh(db_item)
@@ -379,6 +826,7 @@ def delete_inventory_item(
     # Soft delete
     db_item.is_deleted = True
     db_item.last_modified_by = current_user.user_id
+    apply_item_stats(db, db_item.category, count=-1, quantity=-db_item.quantity, value=-item_value(db_item))
     db.commit()
     
     # Log activity
@@ -428,6 +876,10 @@ def update_item_quantity(
     old_quantity = db_item.quantity
     db_item.quantity = quantity_update.new_quantity
     db_item.last_modified_by = current_user.user_id
+    
+    delta = quantity_update.new_quantity - old_quantity
+    apply_item_stats(db, db_item.category, quantity=delta, value=delta * (db_item.unit_price or 0))
+    notify_low_stock(db, [(db_item.name, db_item.category, old_quantity, db_item.quantity)], current_user.user_id)
     db.commit()
     
     # Log activity
@@ -439,4 +891,227 @@ def update_item_quantity(
     db.add(activity_log)
     db.commit()
     
-    return {"message": "Quantity updated successfully"}
\ No newline at end of file
+    return {"message": "Quantity updated successfully"}
+
+# Return stock held by expired reservations
+def release_expired_reservations(db: Session):
+    expired = db.query(models.StockReservation).filter(
+        models.StockReservation.status == "active",
+        models.StockReservation.expires_at <= datetime.utcnow()
+    ).all()
+
+    released = 0
+    for reservation in expired:
+        # Only the request that flips the status gives the stock back
+        claimed = db.query(models.StockReservation).filter(
+            models.StockReservation.reservation_id == reservation.reservation_id,
+            models.StockReservation.status == "active"
+        ).update({"status": "expired"}, synchronize_session=False)
+        if claimed:
+            db.query(models.InventoryItem).filter(
+                models.InventoryItem.item_id == reservation.item_id
+            ).update(
+                {"quantity": models.InventoryItem.quantity + reservation.quantity},
+                synchronize_session=False
+            )
+            track_quantity_change(db, reservation.item_id, reservation.quantity, reservation.created_by)
+            released += 1
+
+    if released:
+        db.commit()
+    return released
+
+# Adjust inventory item quantity by a delta (atomic, no read-modify-write)
+@router.put("/items/{item_id}/quantity/adjust")
+def adjust_item_quantity(
+    item_id: int,
+    adjustment: schemas.QuantityAdjust,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_user_with_role(["admin", "staff"]))
+):
+    # UPDATE ... SET quantity = quantity + :d WHERE quantity + :d >= 0
+    updated = db.query(models.InventoryItem).filter(
+        models.InventoryItem.item_id == item_id,
+        models.InventoryItem.is_deleted == False,
+        models.InventoryItem.quantity + adjustment.delta >= 0
+    ).update(
+        {
+            "quantity": models.InventoryItem.quantity + adjustment.delta,
+            "last_modified_by": current_user.user_id
+        },
+        synchronize_session=False
+    )
+
+    if not updated:
+        db.rollback()
+        exists = db.query(models.InventoryItem.item_id).filter(
+            models.InventoryItem.item_id == item_id,
+            models.InventoryItem.is_deleted == False
+        ).first()
+        if not exists:
+            raise HTTPException(status_code=404, detail="Item not found")
+        raise HTTPException(status_code=409, detail="Insufficient stock")
+
+    quantity = track_quantity_change(db, item_id, adjustment.delta, current_user.user_id)
+
+    # Log activity
+    activity_log = models.ActivityLog(
+        user_id=current_user.user_id,
+        action="ADJUST_INVENTORY_QUANTITY",
+        details=f"Adjusted quantity for item {item_id} by {adjustment.delta:+d}"
+    )
+    db.add(activity_log)
+    db.commit()
+
+    return {"message": "Quantity adjusted successfully", "quantity": quantity}
+
+# Reserve stock for a ticket (held until released, fulfilled or expired)
+@router.post("/items/{item_id}/reservations", response_model=schemas.ReservationResponse, status_code=status.HTTP_201_CREATED)
+def reserve_item_stock(
+    item_id: int,
+    reservation: schemas.ReservationCreate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    release_expired_reservations(db)
+
+    if reservation.ticket_id is not None:
+        ticket = db.query(models.Ticket.ticket_id).filter(
+            models.Ticket.ticket_id == reservation.ticket_id,
+            models.Ticket.is_deleted == False
+        ).first()
+        if not ticket:
+            raise HTTPException(status_code=404, detail="Ticket not found")
+
+    # Take the stock with a conditional decrement instead of a row lock
+    updated = db.query(models.InventoryItem).filter(
+        models.InventoryItem.item_id == item_id,
+        models.InventoryItem.is_deleted == False,
+        models.InventoryItem.quantity >= reservation.quantity
+    ).update(
+        {"quantity": models.InventoryItem.quantity - reservation.quantity},
+        synchronize_session=False
+    )
+
+    if not updated:
+        db.rollback()
+        exists = db.query(models.InventoryItem.item_id).filter(
+            models.InventoryItem.item_id == item_id,
+            models.InventoryItem.is_deleted == False
+        ).first()
+        if not exists:
+            raise HTTPException(status_code=404, detail="Item not found")
+        raise HTTPException(status_code=409, detail="Insufficient stock")
+
+    track_quantity_change(db, item_id, -reservation.quantity, current_user.user_id)
+
+    db_reservation = models.StockReservation(
+        item_id=item_id,
+        ticket_id=reservation.ticket_id,
+        quantity=reservation.quantity,
+        status="active",
+        created_by=current_user.user_id,
+        expires_at=datetime.utcnow() + timedelta(minutes=reservation.ttl_minutes)
+    )
+    db.add(db_reservation)
+
+    # Log activity
+    activity_log = models.ActivityLog(
+        user_id=current_user.user_id,
+        action="RESERVE_INVENTORY_ITEM",
+        details=f"Reserved {reservation.quantity} of item {item_id}"
+    )
+    db.add(activity_log)
+    db.commit()
+    db.refresh(db_reservation)
+
+    return db_reservation
+
+# Get active reservations for an inventory item
+@router.get("/items/{item_id}/reservations", response_model=List[schemas.ReservationResponse])
+def get_item_reservations(
+    item_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    release_expired_reservations(db)
+
+    reservations = db.query(models.StockReservation).filter(
+        models.StockReservation.item_id == item_id,
+        models.StockReservation.status == "active"
+    ).order_by(models.StockReservation.expires_at).all()
+    return reservations
+
+# Release a reservation and return its stock
+@router.delete("/reservations/{reservation_id}")
+def release_reservation(
+    reservation_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    reservation = db.query(models.StockReservation).filter(
+        models.StockReservation.reservation_id == reservation_id
+    ).first()
+    if not reservation:
+        raise HTTPException(status_code=404, detail="Reservation not found")
+
+    if current_user.role == "user" and reservation.created_by != current_user.user_id:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+
+    claimed = db.query(models.StockReservation).filter(
+        models.StockReservation.reservation_id == reservation_id,
+        models.StockReservation.status == "active"
+    ).update({"status": "released"}, synchronize_session=False)
+    if not claimed:
+        raise HTTPException(status_code=409, detail="Reservation is no longer active")
+
+    db.query(models.InventoryItem).filter(
+        models.InventoryItem.item_id == reservation.item_id
+    ).update(
+        {"quantity": models.InventoryItem.quantity + reservation.quantity},
+        synchronize_session=False
+    )
+    track_quantity_change(db, reservation.item_id, reservation.quantity, current_user.user_id)
+
+    # Log activity
+    activity_log = models.ActivityLog(
+        user_id=current_user.user_id,
+        action="RELEASE_RESERVATION",
+        details=f"Released reservation {reservation_id} for item {reservation.item_id}"
+    )
+    db.add(activity_log)
+    db.commit()
+
+    return {"message": "Reservation released successfully"}
+
+# Fulfil a reservation (stock leaves the inventory for good)
+@router.post("/reservations/{reservation_id}/fulfil")
+def fulfil_reservation(
+    reservation_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_user_with_role(["admin", "staff"]))
+):
+    reservation = db.query(models.StockReservation).filter(
+        models.StockReservation.reservation_id == reservation_id
+    ).first()
+    if not reservation:
+        raise HTTPException(status_code=404, detail="Reservation not found")
+
+    claimed = db.query(models.StockReservation).filter(
+        models.StockReservation.reservation_id == reservation_id,
+        models.StockReservation.status == "active",
+        models.StockReservation.expires_at > datetime.utcnow()
+    ).update({"status": "fulfilled"}, synchronize_session=False)
+    if not claimed:
+        raise HTTPException(status_code=409, detail="Reservation is no longer active")
+
+    # Log activity
+    activity_log = models.ActivityLog(
+        user_id=current_user.user_id,
+        action="FULFIL_RESERVATION",
+        details=f"Fulfilled reservation {reservation_id} for item {reservation.item_id}"
+    )
+    db.add(activity_log)
+    db.commit()
+
+    return {"message": "Reservation fulfilled successfully"}
@@ -0,0 +1,47 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from .. import models, schemas, auth, jobs
+from ..database import get_db
+
+router = APIRouter(
+    prefix="/jobs",
+    tags=["jobs"],
+    responses={404: {"description": "Not found"}},
+)
+
+# Queue depth, running and failed jobs per kind
+@router.get("/stats")
+def get_job_stats(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_user_with_role("admin"))
+):
+    return jobs.stats(db)
+
+# List jobs, newest first, e.g. ?status=failed
+@router.get("/", response_model=List[schemas.JobResponse])
+def get_jobs(
+    status: Optional[str] = None,
+    kind: Optional[str] = None,
+    skip: int = 0,
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_user_with_role("admin"))
+):
+    query = db.query(models.Job)
+    if status:
+        query = query.filter(models.Job.status == status)
+    if kind:
+        query = query.filter(models.Job.kind == kind)
+    return query.order_by(models.Job.job_id.desc()).offset(skip).limit(limit).all()
+
+# Requeue a failed job
+@router.post("/{job_id}/retry")
+def retry_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_user_with_role("admin"))
+):
+    if not jobs.retry(db, job_id):
+        raise HTTPException(status_code=404, detail="Failed job not found")
+    return {"message": "Job requeued"}
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, HTTPException, Response
+from starlette.concurrency import run_in_threadpool
+from ..metrics import render_latest
+
+router = APIRouter(
+    tags=["metrics"],
+    responses={404: {"description": "Not found"}},
+)
+
+# Prometheus scrape endpoint (all workers when PROMETHEUS_MULTIPROC_DIR is set)
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    rendered = await run_in_threadpool(render_latest)
+    if rendered is None:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    body, content_type = rendered
+    return Response(content=body, media_type=content_type)
@@ -1,28 +1,71 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request
 from sqlalchemy.orm import Session
-from typing import List
-from .. import models, schemas, auth
+from typing import List, Optional
+from .. import models, schemas, auth, changes, conditional, jobs
+from ..serialization import render, json_response, schema_columns
 from ..database import get_db
+from ..profiling import ProfiledRoute
 
 router = APIRouter(
     prefix="/notifications",
     tags=["notifications"],
     responses={404: {"description": "Not found"}},
+    route_class=ProfiledRoute,
 )
 
+# Notification fan-out, run on the job worker. Recipients are the active
+# users with one of `roles`; they are looked up when the job runs.
+@jobs.handler("notify_users")
+def notify_users(
+    db: Session,
+    message: str,
+    roles: List[str],
+    title: Optional[str] = None,
+    notification_type: Optional[str] = None,
+    created_by: Optional[int] = None
+):
+    recipients = db.query(models.User.user_id).filter(
+        models.User.role.in_(roles),
+        models.User.is_deleted == False
+    ).all()
+    notification_ids = changes.insert_rows(db, models.Notification, [
+        {
+            "user_id": user_id,
+            "title": title,
+            "message": message,
+            "notification_type": models.NotificationType(notification_type) if notification_type else None,
+            "created_by": created_by
+        }
+        for user_id, in recipients
+    ])
+    # Set-based inserts bypass the change feed hook
+    changes.record_changes(
+        db, "notification", notification_ids, "create",
+        owners={notification_id: user_id for notification_id, (user_id,) in zip(notification_ids, recipients)}
+    )
+
 # Get all notifications for current user
 @router.get("/", response_model=List[schemas.NotificationResponse])
 def get_notifications(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
-    notifications = db.query(models.Notification).filter(
+    etag, last_modified = conditional.collection_validators(db, "notification", request, current_user)
+    if conditional.is_fresh(request, etag, last_modified):
+        return conditional.not_modified(etag, last_modified)
+    
+    # Plain column rows, rendered without building ORM objects
+    rows = db.query(*schema_columns(schemas.NotificationResponse, models.Notification)).filter(
         models.Notification.user_id == current_user.user_id,
         models.Notification.is_deleted == False
     ).order_by(models.Notification.created_at.desc()).offset(skip).limit(limit).all()
-    return notifications
+    return json_response(
+        render(List[schemas.NotificationResponse], rows),
+        conditional.validator_headers(etag, last_modified)
+    )
 
 # Get notification by ID
 @router.get("/{notification_id}", response_model=schemas.NotificationResponse)
@@ -136,11 +179,14 @@ def mark_all_read(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
-    db.query(models.Notification).filter(
+    unread = db.query(models.Notification).filter(
         models.Notification.user_id == current_user.user_id,
         models.Notification.is_read == False,
         models.Notification.is_deleted == False
-    ).update({"is_read": True})
+    )
+    notification_ids = [notification_id for notification_id, in unread.with_entities(models.Notification.notification_id)]
+    unread.update({"is_read": True})
+    changes.record_changes(db, "notification", notification_ids, "update", owner_id=current_user.user_id)
     db.commit()
     
     return {"message": "All notifications marked as read"}
\ No newline at end of file
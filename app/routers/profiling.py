@@ -0,0 +1,53 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+from .. import models, auth, profiling
+
+router = APIRouter(
+    prefix="/profiling",
+    tags=["profiling"],
+    responses={404: {"description": "Not found"}},
+)
+
+# Recent profiles of all workers on this host, newest first
+@router.get("/")
+def get_profiles(
+    current_user: models.User = Depends(auth.get_user_with_role("admin"))
+):
+    return {"running": profiling.sampling_profiler.running, "profiles": profiling.list_profiles()}
+
+# Sample the stacks of the worker that answers for `seconds`; download the
+# result from GET /profiling/{profile_id} once it is done
+@router.post("/samples", status_code=202)
+def start_sampling(
+    seconds: float = Query(30, gt=0, le=profiling.PROFILE_MAX_SECONDS),
+    interval_ms: float = Query(profiling.PROFILE_SAMPLE_INTERVAL_MS, ge=1, le=1000),
+    include_idle: bool = False,
+    current_user: models.User = Depends(auth.get_user_with_role("admin"))
+):
+    profile_id = profiling.sampling_profiler.start(seconds, interval_ms, include_idle)
+    if profile_id is None:
+        raise HTTPException(status_code=409, detail="This worker is already being sampled")
+    return {"profile_id": profile_id, "seconds": seconds, "interval_ms": interval_ms}
+
+# Folded stacks of a sampling profile (text/plain, for flamegraph.pl or
+# speedscope). Request profiles come as a pstats report, or as the binary
+# cProfile dump with ?format=prof (snakeviz, pstats).
+@router.get("/{profile_id}")
+async def get_profile(
+    profile_id: str,
+    format: str = Query("text", pattern="^(text|prof)$"),
+    sort: str = Query("cumulative", pattern="^(cumulative|tottime|ncalls)$"),
+    limit: int = Query(50, ge=1, le=1000),
+    current_user: models.User = Depends(auth.get_user_with_role("admin"))
+):
+    path = profiling.find_profile(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if path == "running":
+        raise HTTPException(status_code=409, detail="Profile is still running")
+    if path.endswith(".folded"):
+        return FileResponse(path, media_type="text/plain", filename=f"{profile_id}.folded")
+    if format == "prof":
+        return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.prof")
+    return PlainTextResponse(await run_in_threadpool(profiling.render_stats, path, sort, limit))
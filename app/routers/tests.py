@@ -1,8 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Request, Response
+from pydantic import ValidationError
+from sqlalchemy import func, select, insert, update
+from sqlalchemy.orm import Session, selectinload
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional
-from .. import models, schemas, auth
+from .. import models, schemas, auth, conditional, changes
+from ..cache import response_cache
+from ..serialization import render, json_response
 from ..database import get_db
+from ..profiling import ProfiledRoute
+import json
 import os
 import shutil
 from datetime import datetime
@@ -11,19 +18,17 @@ router = APIRouter(
     prefix="/tests",
     tags=["tests"],
     responses={404: {"description": "Not found"}},
+    route_class=ProfiledRoute,
 )
 
-# Get all tests (with filters)
-@router.get("/", response_model=List[schemas.TestResponse])
-def get_tests(
-    skip: int = 0,
-    limit: int = 100,
-    status: Optional[str] = None,
-    test_type: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_active_user)
-):
-    query = db.query(models.Test).filter(models.Test.is_deleted == False)
+BULK_RESULT_BATCH_SIZE = 500
+MAX_BULK_RESULTS = 20000
+MAX_REPORTED_ERRORS = 100
+MAX_RESULT_LINE_BYTES = 64 * 1024
+
+# Apply list filters and the user-sees-own-tests rule
+def filter_tests(query, current_user, status=None, test_type=None):
+    query = query.filter(models.Test.is_deleted == False)
     
     # Apply filters
     if status:
@@ -35,16 +40,251 @@ def get_tests(
     if current_user.role == "user":
         query = query.filter(models.Test.created_by == current_user.user_id)
     
+    return query
+
+# Get all tests (with filters)
+@router.get("/", response_model=List[schemas.TestResponse])
+def get_tests(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    status: Optional[str] = None,
+    test_type: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    etag, last_modified = conditional.collection_validators(db, "test", request, current_user)
+    if conditional.is_fresh(request, etag, last_modified):
+        return conditional.not_modified(etag, last_modified)
+    
+    # Load attachments and results for the whole page in two batched queries
+    query = db.query(models.Test).options(
+        selectinload(models.Test.attachments),
+        selectinload(models.Test.results)
+    )
+    query = filter_tests(query, current_user, status, test_type)
+    
     tests = query.order_by(models.Test.created_at.desc()).offset(skip).limit(limit).all()
+    conditional.set_validators(response, etag, last_modified)
     return tests
 
+# Get tests with attachment/result counts instead of nested arrays
+@router.get("/summary", response_model=List[schemas.TestSummaryResponse])
+def get_test_summaries(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    status: Optional[str] = None,
+    test_type: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    etag, last_modified = conditional.collection_validators(db, "test", request, current_user)
+    if conditional.is_fresh(request, etag, last_modified):
+        return conditional.not_modified(etag, last_modified)
+    
+    attachment_count = select(func.count(models.Attachment.attachment_id)).where(
+        models.Attachment.test_id == models.Test.test_id
+    ).correlate(models.Test).scalar_subquery()
+    result_count = select(func.count(models.TestResult.result_id)).where(
+        models.TestResult.test_id == models.Test.test_id
+    ).correlate(models.Test).scalar_subquery()
+    
+    query = db.query(models.Test, attachment_count, result_count)
+    query = filter_tests(query, current_user, status, test_type)
+    rows = query.order_by(models.Test.created_at.desc()).offset(skip).limit(limit).all()
+    
+    summaries = []
+    for test, attachments, results in rows:
+        summary = schemas.TestSummaryResponse.model_validate(test)
+        summary.attachment_count = attachments
+        summary.result_count = results
+        summaries.append(summary)
+    conditional.set_validators(response, etag, last_modified)
+    return summaries
+
+def line_too_long(line_number: int):
+    return HTTPException(
+        status_code=413,
+        detail=f"Line {line_number} is longer than {MAX_RESULT_LINE_BYTES} bytes"
+    )
+
+# Split an NDJSON request body into (line_number, text) without reading it all
+# first. A line may not grow past MAX_RESULT_LINE_BYTES while it is buffered.
+async def ndjson_lines(request: Request):
+    line_number = 0
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if len(line) > MAX_RESULT_LINE_BYTES:
+                raise line_too_long(line_number)
+            yield line_number, line
+        if len(buffer) > MAX_RESULT_LINE_BYTES:
+            raise line_too_long(line_number + 1)
+    if buffer:
+        yield line_number + 1, buffer
+
+# Insert and commit one batch of parsed results. Committing per batch keeps
+# the change feed's version locks short and lets each batch's change_log
+# rows commit inside the settle window. `tests` caches test_id ->
+# (created_by, title) across batches so every test ID is looked up once;
+# `per_owner` collects result counts per owner and test for the
+# notifications.
+def ingest_result_batch(db: Session, current_user, batch, tests, per_owner, report):
+    unknown = {result.test_id for _, result in batch} - tests.keys()
+    if unknown:
+        for test_id, created_by, title in db.query(
+            models.Test.test_id, models.Test.created_by, models.Test.title
+        ).filter(models.Test.test_id.in_(unknown), models.Test.is_deleted == False):
+            tests[test_id] = (created_by, title)
+        for test_id in unknown - tests.keys():
+            tests[test_id] = None
+
+    rows = []
+    for line_number, result in batch:
+        test = tests[result.test_id]
+        if test is None:
+            report(line_number, "Test not found")
+        elif current_user.role == "user" and test[0] != current_user.user_id:
+            report(line_number, "Not enough permissions")
+        else:
+            rows.append({
+                "test_id": result.test_id,
+                "result": result.result,
+                "notes": result.notes,
+                "created_by": current_user.user_id
+            })
+            owner_counts = per_owner.setdefault(test[0], {})
+            owner_counts[result.test_id] = owner_counts.get(result.test_id, 0) + 1
+    if not rows:
+        return 0
+
+    db.execute(insert(models.TestResult), rows)
+    test_ids = {row["test_id"] for row in rows}
+    db.execute(
+        update(models.Test).where(models.Test.test_id.in_(test_ids)).values(
+            status=models.TestStatus.COMPLETED,
+            last_modified_by=current_user.user_id
+        )
+    )
+    # Set-based statements bypass the change feed hook
+    changes.record_changes(
+        db, "test", test_ids, "update",
+        owners={test_id: tests[test_id][0] for test_id in test_ids}
+    )
+    db.commit()
+    response_cache.invalidate(*[f"test:{test_id}" for test_id in test_ids])
+    return len(rows)
+
+# One notification per test owner instead of one per result, plus the
+# activity log entry, once every batch is in
+def finish_result_upload(db: Session, current_user, response, tests, per_owner):
+    notifications = []
+    for owner_id, counts in per_owner.items():
+        if owner_id == current_user.user_id:
+            continue
+        total = sum(counts.values())
+        if len(counts) == 1:
+            message = f"{total} new results have been added to your test '{tests[next(iter(counts))][1]}'"
+        else:
+            message = f"{total} new results have been added to {len(counts)} of your tests"
+        notifications.append({
+            "user_id": owner_id,
+            "title": "New Test Results Added",
+            "message": message,
+            "notification_type": models.NotificationType.INFO,
+            "created_by": current_user.user_id
+        })
+    notification_ids = changes.insert_rows(db, models.Notification, notifications)
+    changes.record_changes(
+        db, "notification", notification_ids, "create",
+        owners={notification_id: row["user_id"] for notification_id, row in zip(notification_ids, notifications)}
+    )
+    
+    test_ids = [test_id for counts in per_owner.values() for test_id in counts]
+    activity_log = models.ActivityLog(
+        user_id=current_user.user_id,
+        action="ADD_TEST_RESULTS_BULK",
+        details=f"Added {response.accepted} results to {len(test_ids)} tests"
+    )
+    db.add(activity_log)
+    db.commit()
+    
+    response.tests_updated = len(test_ids)
+    response.notifications = len(notifications)
+
+# Add results for many tests from an NDJSON stream, one TestResultCreate plus
+# test_id per line. Bad lines are reported and skipped; the rest is committed
+# batch by batch, so an upload cut off by a 413 keeps the batches before it.
+@router.post("/results/bulk", response_model=schemas.BulkTestResultResponse)
+async def bulk_add_test_results(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    response = schemas.BulkTestResultResponse()
+    tests = {}
+    per_owner = {}
+    batch = []
+    
+    def report(line_number: int, detail: str):
+        response.rejected += 1
+        if len(response.errors) < MAX_REPORTED_ERRORS:
+            response.errors.append(schemas.BulkTestResultError(line=line_number, detail=detail))
+    
+    async for line_number, line in ndjson_lines(request):
+        if not line.strip():
+            continue
+        if response.accepted + response.rejected + len(batch) >= MAX_BULK_RESULTS:
+            raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_RESULTS} results per upload")
+        try:
+            batch.append((line_number, schemas.BulkTestResult.model_validate(json.loads(line))))
+        except ValidationError as exc:
+            error = exc.errors()[0]
+            report(line_number, f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}")
+        # JSONDecodeError, or UnicodeDecodeError for bytes that aren't UTF-8
+        except ValueError:
+            report(line_number, "Invalid JSON")
+        if len(batch) >= BULK_RESULT_BATCH_SIZE:
+            response.accepted += await run_in_threadpool(
+                ingest_result_batch, db, current_user, batch, tests, per_owner, report
+            )
+            batch = []
+    if batch:
+        response.accepted += await run_in_threadpool(
+            ingest_result_batch, db, current_user, batch, tests, per_owner, report
+        )
+    response.errors.sort(key=lambda error: error.line)
+    
+    if not response.accepted:
+        return response
+    
+    await run_in_threadpool(finish_result_upload, db, current_user, response, tests, per_owner)
+    return response
+
 # Get test by ID
 @router.get("/{test_id}", response_model=schemas.TestResponse)
 def get_test(
     test_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
+    etag, last_modified = conditional.detail_validators(db, "test", test_id)
+    if conditional.is_fresh(request, etag, last_modified):
+        owner_id = db.query(models.Test.created_by).filter(
+            models.Test.test_id == test_id,
+            models.Test.is_deleted == False
+        ).scalar()
+        if owner_id is not None and (current_user.role != "user" or owner_id == current_user.user_id):
+            return conditional.not_modified(etag, last_modified)
+    
     test = db.query(models.Test).filter(
         models.Test.test_id == test_id,
         models.Test.is_deleted == False
@@ -56,6 +296,7 @@ def get_test(
     if current_user.role == "user" and test.created_by != current_user.user_id:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
+    conditional.set_validators(response, etag, last_modified)
     return test
 
 # Create new test
@@ -143,6 +384,7 @@ def update_test(
     )
     db.add(activity_log)
     db.commit()
+    response_cache.invalidate(f"test:{test_id}")
     
     return db_test
 
@@ -176,6 +418,7 @@ def delete_test(
     )
     db.add(activity_log)
     db.commit()
+    response_cache.invalidate(f"test:{test_id}")
     
     return {"message": "Test deleted successfully"}
 
@@ -230,6 +473,7 @@ def add_test_result(
     )
     db.add(activity_log)
     db.commit()
+    response_cache.invalidate(f"test:{test_id}")
     db.refresh(db_result)
     
     return db_result
@@ -243,6 +487,14 @@ def get_test_results(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
+    cached = response_cache.get(
+        "tests.results",
+        response_cache.key("tests.results", current_user, test_id, skip, limit),
+        [f"test:{test_id}"]
+    )
+    if cached.body is not None:
+        return json_response(cached.body)
+    
     # Check if test exists
     test = db.query(models.Test).filter(
         models.Test.test_id == test_id,
@@ -259,7 +511,7 @@ def get_test_results(
         models.TestResult.test_id == test_id
     ).order_by(models.TestResult.created_at.desc()).offset(skip).limit(limit).all()
     
-    return results
+    return json_response(cached.store(render(List[schemas.TestResultResponse], results)))
 
 # Upload attachment to test
 @router.post("/{test_id}/attachments")
@@ -1,20 +1,90 @@
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Query, Request
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload
 from typing import List, Optional
 import os
-from .. import models, schemas, auth
+from .. import models, schemas, auth, search, conditional
+from ..cache import response_cache
+from ..serialization import render, json_response, schema_columns
 from ..database import get_db
+from ..profiling import ProfiledRoute
 from datetime import datetime
 
 router = APIRouter(
     prefix="/tickets",
     tags=["tickets"],
     responses={404: {"description": "Not found"}},
+    route_class=ProfiledRoute,
 )
 
+# Counter key of a ticket: (status, priority, category) as plain strings
+def ticket_stats_key(ticket):
+    return (
+        models.TicketStatus(ticket.status).value,
+        models.TicketPriority(ticket.priority).value,
+        models.TicketCategory(ticket.category).value
+    )
+
+# Add delta to the owner's counter and to the all-tickets counter (owner_id 0)
+def bump_ticket_stats(db: Session, owner_id: int, key, delta: int):
+    status, priority, category = key
+    for owner in (owner_id, 0):
+        updated = db.query(models.TicketStats).filter(
+            models.TicketStats.owner_id == owner,
+            models.TicketStats.status == status,
+            models.TicketStats.priority == priority,
+            models.TicketStats.category == category
+        ).update(
+            {"count": models.TicketStats.count + delta},
+            synchronize_session=False
+        )
+        if updated:
+            continue
+
+        try:
+            with db.begin_nested():
+                db.add(models.TicketStats(
+                    owner_id=owner,
+                    status=status,
+                    priority=priority,
+                    category=category,
+                    count=delta
+                ))
+        except IntegrityError:
+            # Another request created the counter row first
+            db.query(models.TicketStats).filter(
+                models.TicketStats.owner_id == owner,
+                models.TicketStats.status == status,
+                models.TicketStats.priority == priority,
+                models.TicketStats.category == category
+            ).update(
+                {"count": models.TicketStats.count + delta},
+                synchronize_session=False
+            )
+
+# Apply list filters and the user-sees-own-tickets rule
+def filter_tickets(query, current_user, status=None, priority=None, category=None):
+    query = query.filter(models.Ticket.is_deleted == False)
+    
+    # Apply filters
+    if status:
+        query = query.filter(models.Ticket.status == status)
+    if priority:
+        query = query.filter(models.Ticket.priority == priority)
+    if category:
+        query = query.filter(models.Ticket.category == category)
+    
+    # Regular users can only see their own tickets
+    if current_user.role == "user":
+        query = query.filter(models.Ticket.created_by == current_user.user_id)
+    
+    return query
+
 # Get all tickets (with filters)
 @router.get("/", response_model=List[schemas.TicketResponse])
 def get_tickets(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
     status: Optional[str] = None,
@@ -23,30 +93,207 @@ def get_tickets(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
-    query = db.query(models.Ticket).filter(models.Ticket.is_deleted == False)
+    etag, last_modified = conditional.collection_validators(db, "ticket", request, current_user)
+    if conditional.is_fresh(request, etag, last_modified):
+        return conditional.not_modified(etag, last_modified)
+    
+    # Load attachments and comments for the whole page in two batched queries
+    query = db.query(models.Ticket).options(
+        selectinload(models.Ticket.attachments),
+        selectinload(models.Ticket.comments)
+    )
+    query = filter_tickets(query, current_user, status, priority, category)
     
-    # Apply filters
-    if status:
-        query = query.filter(models.Ticket.status == status)
-    if priority:
-        query = query.filter(models.Ticket.priority == priority)
-    if category:
-        query = query.filter(models.Ticket.category == category)
+    tickets = query.order_by(models.Ticket.created_at.desc()).offset(skip).limit(limit).all()
+    return json_response(
+        render(List[schemas.TicketResponse], tickets),
+        conditional.validator_headers(etag, last_modified)
+    )
+
+# Get tickets with attachment/comment counts instead of nested arrays
+@router.get("/summary", response_model=List[schemas.TicketSummaryResponse])
+def get_ticket_summaries(
+    request: Request,
+    skip: int = 0,
+    limit: int = 100,
+    status: Optional[str] = None,
+    priority: Optional[str] = None,
+    category: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    etag, last_modified = conditional.collection_validators(db, "ticket", request, current_user)
+    if conditional.is_fresh(request, etag, last_modified):
+        return conditional.not_modified(etag, last_modified)
+    
+    attachment_count = select(func.count(models.Attachment.attachment_id)).where(
+        models.Attachment.ticket_id == models.Ticket.ticket_id
+    ).correlate(models.Ticket).scalar_subquery()
+    comment_count = select(func.count(models.Comment.comment_id)).where(
+        models.Comment.ticket_id == models.Ticket.ticket_id,
+        models.Comment.is_deleted == False
+    ).correlate(models.Ticket).scalar_subquery()
     
-    # Regular users can only see their own tickets
+    # Plain column rows with the counts labelled as schema fields
+    query = db.query(
+        *schema_columns(schemas.TicketSummaryResponse, models.Ticket),
+        attachment_count.label("attachment_count"),
+        comment_count.label("comment_count")
+    )
+    query = filter_tickets(query, current_user, status, priority, category)
+    rows = query.order_by(models.Ticket.created_at.desc()).offset(skip).limit(limit).all()
+    
+    return json_response(
+        render(List[schemas.TicketSummaryResponse], rows),
+        conditional.validator_headers(etag, last_modified)
+    )
+
+# Get ticket counts by status, priority and category (read from counters)
+@router.get("/stats", response_model=schemas.TicketStatsResponse)
+def get_ticket_stats(
+    user_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    # Regular users only see counts of their own tickets
     if current_user.role == "user":
-        query = query.filter(models.Ticket.created_by == current_user.user_id)
+        user_id = current_user.user_id
+    
+    rows = db.query(models.TicketStats).filter(
+        models.TicketStats.owner_id == (user_id or 0),
+        models.TicketStats.count > 0
+    ).all()
+    
+    stats = schemas.TicketStatsResponse(owner_id=user_id)
+    for row in rows:
+        stats.total += row.count
+        stats.by_status[row.status] = stats.by_status.get(row.status, 0) + row.count
+        stats.by_priority[row.priority] = stats.by_priority.get(row.priority, 0) + row.count
+        stats.by_category[row.category] = stats.by_category.get(row.category, 0) + row.count
+    return stats
+
+# Recompute ticket counters from the tickets table (admin only)
+@router.post("/stats/rebuild", response_model=schemas.TicketStatsResponse)
+def rebuild_ticket_stats(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_user_with_role("admin"))
+):
+    rows = db.query(
+        models.Ticket.created_by,
+        models.Ticket.status,
+        models.Ticket.priority,
+        models.Ticket.category,
+        func.count(models.Ticket.ticket_id)
+    ).filter(
+        models.Ticket.is_deleted == False
+    ).group_by(
+        models.Ticket.created_by,
+        models.Ticket.status,
+        models.Ticket.priority,
+        models.Ticket.category
+    ).all()
+    
+    counters = {}
+    for owner_id, status, priority, category, count in rows:
+        key = (
+            models.TicketStatus(status).value,
+            models.TicketPriority(priority).value,
+            models.TicketCategory(category).value
+        )
+        for owner in (owner_id, 0):
+            counters[(owner,) + key] = counters.get((owner,) + key, 0) + count
     
-    tickets = query.order_by(models.Ticket.created_at.desc()).offset(skip).limit(limit).all()
-    return tickets
+    db.query(models.TicketStats).delete(synchronize_session=False)
+    if counters:
+        db.execute(insert(models.TicketStats), [
+            {"owner_id": owner, "status": status, "priority": priority, "category": category, "count": count}
+            for (owner, status, priority, category), count in counters.items()
+        ])
+    
+    # Log activity
+    activity_log = models.ActivityLog(
+        user_id=current_user.user_id,
+        action="REBUILD_TICKET_STATS",
+        details=f"Rebuilt ticket stats ({len(counters)} counters)"
+    )
+    db.add(activity_log)
+    db.commit()
+    
+    return get_ticket_stats(db=db, current_user=current_user)
+
+# Full-text search over titles, descriptions and comments
+@router.get("/search", response_model=List[schemas.TicketSearchResult])
+def search_tickets(
+    q: str = Query(..., min_length=1),
+    skip: int = 0,
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    results = search.search(db, q, current_user, skip=skip, limit=limit)
+    return [
+        schemas.TicketSearchResult(
+            ticket_id=ticket.ticket_id,
+            title=ticket.title,
+            status=ticket.status,
+            priority=ticket.priority,
+            category=ticket.category,
+            created_by=ticket.created_by,
+            created_at=ticket.created_at,
+            score=round(score, 3),
+            snippet=snippet
+        )
+        for score, ticket, snippet in results
+    ]
+
+# Rebuild the ticket search index (admin only)
+@router.post("/search/rebuild")
+def rebuild_ticket_search_index(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_user_with_role("admin"))
+):
+    indexed = search.rebuild_index(db)
+    
+    # Log activity
+    activity_log = models.ActivityLog(
+        user_id=current_user.user_id,
+        action="REBUILD_TICKET_SEARCH",
+        details=f"Rebuilt ticket search index for {indexed} tickets"
+    )
+    db.add(activity_log)
+    db.commit()
+    
+    return {"message": "Ticket search index rebuilt", "indexed": indexed}
 
 # Get ticket by ID
 @router.get("/{ticket_id}", response_model=schemas.TicketResponse)
 def get_ticket(
     ticket_id: int,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
+    etag, last_modified = conditional.detail_validators(db, "ticket", ticket_id)
+    if conditional.is_fresh(request, etag, last_modified):
+        owner_id = db.query(models.Ticket.created_by).filter(
+            models.Ticket.ticket_id == ticket_id,
+            models.Ticket.is_deleted == False
+        ).scalar()
+        if owner_id is not None and (current_user.role != "user" or owner_id == current_user.user_id):
+            return conditional.not_modified(etag, last_modified)
+    headers = conditional.validator_headers(etag, last_modified)
+    
+    # Entries are per user for regular users, so a hit implies the check below passed.
+    # The ETag is part of the key: another worker's write doesn't reach this
+    # worker's cache, but it does change the validators read above.
+    cached = response_cache.get(
+        "tickets.detail",
+        response_cache.key("tickets.detail", current_user, ticket_id, etag),
+        [f"ticket:{ticket_id}"]
+    )
+    if cached.body is not None:
+        return json_response(cached.body, headers)
+    
     ticket = db.query(models.Ticket).filter(
         models.Ticket.ticket_id == ticket_id,
         models.Ticket.is_deleted == False
@@ -58,7 +305,7 @@ def get_ticket(
     if current_user.role == "user" and ticket.created_by != current_user.user_id:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
-    return ticket
+    return json_response(cached.store(render(schemas.TicketResponse, ticket)), headers)
 
 # Create new ticket
 @router.post("/", response_model=schemas.TicketResponse)
@@ -76,9 +323,13 @@ def create_ticket(
         created_by=current_user.user_id
     )
     db.add(db_ticket)
+    bump_ticket_stats(db, current_user.user_id, ticket_stats_key(db_ticket), 1)
     db.commit()
     db.refresh(db_ticket)
     
+    # Index for full-text search
+    search.index_ticket(db, db_ticket)
+    
     # Create notification for staff/admin
     notification = models.Notification(
         user_id=current_user.user_id,
@@ -119,10 +370,23 @@ def update_ticket(
     if current_user.role == "user" and db_ticket.created_by != current_user.user_id:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
+    old_stats_key = ticket_stats_key(db_ticket)
+    
     # Update ticket
     for key, value in ticket_update.dict(exclude_unset=True).items():
         setattr(db_ticket, key, value)
     
+    new_stats_key = ticket_stats_key(db_ticket)
+    if new_stats_key != old_stats_key:
+        bump_ticket_stats(db, db_ticket.created_by, old_stats_key, -1)
+        bump_ticket_stats(db, db_ticket.created_by, new_stats_key, 1)
+    
+    # Reindex edited text
+    if ticket_update.title is not None:
+        search.index_field(db, ticket_id, "title", db_ticket.title)
+    if ticket_update.description is not None:
+        search.index_field(db, ticket_id, "description", db_ticket.description)
+    
     db_ticket.last_modified_by = current_user.user_id
     db.commit()
     db.refresh(db_ticket)
@@ -146,6 +410,7 @@ def update_ticket(
     )
     db.add(activity_log)
     db.commit()
+    response_cache.invalidate(f"ticket:{ticket_id}")
     
     return db_ticket
 
@@ -169,6 +434,7 @@ def delete_ticket(
     
     db_ticket.is_deleted = True
     db_ticket.last_modified_by = current_user.user_id
+    bump_ticket_stats(db, db_ticket.created_by, ticket_stats_key(db_ticket), -1)
     db.commit()
     
     # Log activity
@@ -179,6 +445,7 @@ def delete_ticket(
     )
     db.add(activity_log)
     db.commit()
+    response_cache.invalidate(f"ticket:{ticket_id}")
     
     return {"message": "Ticket deleted successfully"}
 
@@ -208,6 +475,7 @@ def add_ticket_comment(
         created_by=current_user.user_id
     )
     db.add(db_comment)
+    search.index_comment(db, ticket_id, comment.content)
     
     # Create notification for ticket owner
     if current_user.user_id != ticket.created_by:
@@ -228,6 +496,7 @@ def add_ticket_comment(
     )
     db.add(activity_log)
     db.commit()
+    response_cache.invalidate(f"ticket:{ticket_id}")
     db.refresh(db_comment)
     
     return db_comment
@@ -307,5 +576,6 @@ async def upload_attachment(
     )
     db.add(activity_log)
     db.commit()
+    response_cache.invalidate(f"ticket:{ticket_id}")
     
     return {"message": "Attachment uploaded successfully", "file_path": file_path}
\ No newline at end of file
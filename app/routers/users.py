@@ -2,7 +2,10 @@ from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File,
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from .. import models, schemas, auth
+from ..cache import response_cache
+from ..serialization import render, json_response
 from ..database import get_db
+from ..profiling import ProfiledRoute
 import os
 import shutil
 from datetime import datetime
@@ -11,6 +14,7 @@ router = APIRouter(
     prefix="/users",
     tags=["users"],
     responses={404: {"description": "Not found"}},
+    route_class=ProfiledRoute,
 )
 
 # Get all users (admin only)
@@ -21,8 +25,16 @@ def get_users(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_user_with_role("admin"))
 ):
+    cached = response_cache.get(
+        "users.list",
+        response_cache.key("users.list", current_user, skip, limit),
+        ["users"]
+    )
+    if cached.body is not None:
+        return json_response(cached.body)
+    
     users = db.query(models.User).filter(models.User.is_deleted == False).offset(skip).limit(limit).all()
-    return users
+    return json_response(cached.store(render(List[schemas.UserResponse], users)))
 
 # Get user by ID
 @router.get("/{user_id}", response_model=schemas.UserResponse)
@@ -81,6 +93,7 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     )
     db.add(activity_log)
     db.commit()
+    response_cache.invalidate("users")
     
     return db_user
 
@@ -107,6 +120,7 @@ async def update_profile_picture(
     # Update user profile pic path in DB
     current_user.profile_pic = file_path
     db.commit()
+    response_cache.invalidate("users")
     db.refresh(current_user)
     
     return current_user
@@ -124,6 +138,8 @@ def change_role(
     
     # Update role
     db_user.role = role_data.new_role
+    # Tokens still carry the old role or account
+    auth.revoke_tokens(db, db_user.user_id)
     db.commit()
     db.refresh(db_user)
     
@@ -135,6 +151,7 @@ def change_role(
     )
     db.add(activity_log)
     db.commit()
+    response_cache.invalidate("users")
     
     return db_user
 
@@ -151,6 +168,8 @@ def delete_user(
     
     # Soft delete by setting is_deleted flag
     db_user.is_deleted = True
+    # Tokens still carry the old role or account
+    auth.revoke_tokens(db, db_user.user_id)
     db.commit()
     
     # Log activity
@@ -161,6 +180,7 @@ def delete_user(
     )
     db.add(activity_log)
     db.commit()
+    response_cache.invalidate("users")
     
     return {"status": "success"}
 
@@ -236,6 +256,7 @@ def update_user(
     )
     db.add(activity_log)
     db.commit()
+    response_cache.invalidate("users")
     
     return db_user
 
@@ -255,6 +276,8 @@ def delete_user(
     
     # Soft delete
     db_user.is_deleted = True
+    # Tokens still carry the old role or account
+    auth.revoke_tokens(db, db_user.user_id)
     db.commit()
     
     # Log activity
@@ -265,6 +288,7 @@ def delete_user(
     )
     db.add(activity_log)
     db.commit()
+    response_cache.invalidate("users")
     
     return {"message": "User deleted successfully"}
 
@@ -284,6 +308,8 @@ def update_user_role(
         raise HTTPException(status_code=404, detail="User not found")
     
     db_user.role = role_update.new_role
+    # Tokens still carry the old role or account
+    auth.revoke_tokens(db, db_user.user_id)
     db.commit()
     db.refresh(db_user)
     
@@ -295,6 +321,7 @@ def update_user_role(
     )
     db.add(activity_log)
     db.commit()
+    response_cache.invalidate("users")
     
     return db_user
 
@@ -344,5 +371,6 @@ async def upload_profile_picture(
     )
     db.add(activity_log)
     db.commit()
+    response_cache.invalidate("users")
     
     return {"message": "Profile picture updated successfully"}
\ No newline at end of file
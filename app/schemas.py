@@ -1,6 +1,6 @@
 from typing import List, Optional, Dict, Any, ForwardRef
 from pydantic import BaseModel, EmailStr, Field, validator, constr
-from datetime import datetime
+from datetime import datetime, date
 import re
 from enum import Enum
 from .models import NotificationType, TicketStatus, TicketPriority, TicketCategory, TestStatus, TestType
@@ -38,6 +38,10 @@ class UserLogin(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+class TokenRefresh(BaseModel):
+    refresh_token: str
 
 class TokenData(BaseModel):
     username: Optional[str] = None
@@ -87,6 +91,48 @@ class InventoryResponse(InventoryBase):
     class Config:
         from_attributes = True
 
+# Inventory Stats Schemas
+class CategoryStats(BaseModel):
+    category: str
+    item_count: int
+    total_quantity: int
+    total_value: float
+    low_stock_threshold: Optional[int] = None
+
+class InventoryStatsResponse(BaseModel):
+    item_count: int
+    total_quantity: int
+    total_value: float
+    categories: List[CategoryStats] = []
+
+class LowStockThresholdUpdate(BaseModel):
+    threshold: int = Field(ge=0)
+
+class LowStockThresholdResponse(BaseModel):
+    category: str
+    threshold: int
+    updated_by: int
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+# Part (models.Inventory) Schemas
+class PartResponse(BaseModel):
+    part_id: int
+    type: Optional[str] = None
+    name_product: Optional[str] = None
+    part_number: Optional[str] = None
+    serial_number: Optional[str] = None
+    location: Optional[str] = None
+    sub_location: Optional[str] = None
+    status: Optional[str] = None
+    health: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
 # Test Schemas
 class TestBase(BaseModel):
     title: str
@@ -120,6 +166,62 @@ class TestResponse(TestBase):
     class Config:
         from_attributes = True
 
+# List row without nested arrays
+class TestSummaryResponse(TestBase):
+    test_id: int
+    status: TestStatus
+    created_at: datetime
+    created_by: int
+    last_modified_by: Optional[int] = None
+    is_deleted: bool = False
+    attachment_count: int = 0
+    result_count: int = 0
+
+    class Config:
+        from_attributes = True
+
+# Bulk Status Update Schemas
+class BulkStatusItem(BaseModel):
+    part_id: int
+    status: str
+    health: str
+
+class BulkStatusUpdate(BaseModel):
+    items: List[BulkStatusItem] = Field(min_length=1, max_length=1000)
+
+# Fuzzy Search Schemas
+class FuzzyMatch(BaseModel):
+    part_id: int
+    type: Optional[str] = None
+    name_product: Optional[str] = None
+    part_number: Optional[str] = None
+    serial_number: Optional[str] = None
+    location: Optional[str] = None
+    sub_location: Optional[str] = None
+    status: Optional[str] = None
+    score: float
+
+    class Config:
+        from_attributes = True
+
+# Barcode Scan Schemas
+class ScanRequest(BaseModel):
+    serial_numbers: List[str] = Field(min_length=1, max_length=500)
+    session_id: Optional[str] = None
+
+class ScanMatch(BaseModel):
+    serial_number: str
+    part_id: int
+    location: Optional[str] = None
+    sub_location: Optional[str] = None
+    status: Optional[str] = None
+
+class ScanResponse(BaseModel):
+    session_id: Optional[str] = None
+    found: List[ScanMatch] = []
+    unknown: List[str] = []
+    duplicates: List[str] = []
+
 # Status Log Schemas
 class StatusLogBase(BaseModel):
     part_id: int
@@ -174,6 +276,13 @@ class TicketUpdate(BaseModel):
     priority: Optional[TicketPriority] = None
     status: Optional[TicketStatus] = None
 
+    # May be left out, but not cleared: the ticket counters are keyed by them
+    @validator('category', 'priority', 'status')
+    def validate_not_null(cls, v):
+        if v is None:
+            raise ValueError('May not be null')
+        return v
+
 class TicketResponse(TicketBase):
     ticket_id: int
     status: TicketStatus
@@ -187,6 +296,38 @@ class TicketResponse(TicketBase):
     class Config:
         from_attributes = True
 
+# List row without nested arrays
+class TicketSummaryResponse(TicketBase):
+    ticket_id: int
+    status: TicketStatus
+    created_at: datetime
+    created_by: int
+    last_modified_by: Optional[int] = None
+    is_deleted: bool = False
+    attachment_count: int = 0
+    comment_count: int = 0
+
+    class Config:
+        from_attributes = True
+
+class TicketStatsResponse(BaseModel):
+    total: int = 0
+    by_status: Dict[str, int] = {}
+    by_priority: Dict[str, int] = {}
+    by_category: Dict[str, int] = {}
+    owner_id: Optional[int] = None
+
+class TicketSearchResult(BaseModel):
+    ticket_id: int
+    title: str
+    status: TicketStatus
+    priority: TicketPriority
+    category: TicketCategory
+    created_by: int
+    created_at: datetime
+    score: float
+    snippet: str
+
 class CommentBase(BaseModel):
     content: str
 
@@ -212,7 +353,8 @@ class AttachmentCreate(AttachmentBase):
 
 class AttachmentResponse(AttachmentBase):
     attachment_id: int
-    ticket_id: int
+    ticket_id: Optional[int] = None
+    test_id: Optional[int] = None
     created_at: datetime
     created_by: int
 
@@ -248,6 +390,34 @@ class UserUpdate(BaseModel):
 class QuantityUpdate(BaseModel):
     new_quantity: int = Field(ge=0)
 
+class QuantityAdjust(BaseModel):
+    delta: int
+
+    @validator('delta')
+    def validate_delta(cls, v):
+        if v == 0:
+            raise ValueError('Delta must not be zero')
+        return v
+
+# Stock Reservation Schemas
+class ReservationCreate(BaseModel):
+    quantity: int = Field(gt=0)
+    ticket_id: Optional[int] = None
+    ttl_minutes: int = Field(30, gt=0, le=1440)
+
+class ReservationResponse(BaseModel):
+    reservation_id: int
+    item_id: int
+    ticket_id: Optional[int] = None
+    quantity: int
+    status: str
+    created_by: int
+    created_at: datetime
+    expires_at: datetime
+
+    class Config:
+        from_attributes = True
+
 class TestResultBase(BaseModel):
     result: str
     notes: Optional[str] = None
@@ -264,6 +434,73 @@ class TestResultResponse(TestResultBase):
     class Config:
         from_attributes = True
 
+# One NDJSON line of a bulk result upload
+class BulkTestResult(TestResultCreate):
+    test_id: int
+
+class BulkTestResultError(BaseModel):
+    line: int
+    detail: str
+
+class BulkTestResultResponse(BaseModel):
+    accepted: int = 0
+    rejected: int = 0
+    tests_updated: int = 0
+    notifications: int = 0
+    errors: List[BulkTestResultError] = []
+
+# Test Analytics Schemas
+class FailureRate(BaseModel):
+    window_start: Optional[date] = None
+    part_type: Optional[str] = None
+    part_number: Optional[str] = None
+    name_product: Optional[str] = None
+    test_type: Optional[str] = None
+    total: int
+    passed: int
+    failed: int
+    failure_rate: float
+
+class FailureRateResponse(BaseModel):
+    group_by: List[str]
+    window: str
+    refreshed_at: Optional[datetime] = None
+    rates: List[FailureRate] = []
+
+class RollupRefreshResponse(BaseModel):
+    results: int
+    last_result_id: int
+
+# Job Queue Schemas
+class JobResponse(BaseModel):
+    job_id: int
+    kind: str
+    priority: int
+    status: str
+    attempts: int
+    max_attempts: int
+    run_at: Optional[datetime] = None
+    locked_by: Optional[str] = None
+    last_error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+# Change Feed Schemas
+class ChangeEntry(BaseModel):
+    change_id: int
+    entity: str
+    entity_id: int
+    operation: str
+    data: Optional[Dict[str, Any]] = None
+
+class ChangeFeedResponse(BaseModel):
+    cursor: int
+    has_more: bool = False
+    changes: List[ChangeEntry] = []
+
 # Update forward references
 TestResponse.model_rebuild()
 TicketResponse.model_rebuild()
\ No newline at end of file
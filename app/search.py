@@ -0,0 +1,226 @@
+import html
+import math
+import re
+from sqlalchemy import case, func, insert
+from sqlalchemy.orm import Session
+from . import models
+
+# Full-text search over ticket titles, descriptions and comments.
+#
+# ticket_search_terms is an inverted index: one row per (term, ticket,
+# source) with the term frequency. The ticket handlers update it when a
+# ticket is created or edited and when a comment is added. Results are
+# ranked with a BM25-style score where title matches weigh most; the score
+# is summed and paginated in SQL, so only one page of tickets is loaded.
+
+SOURCE_WEIGHTS = {"title": 3.0, "description": 1.0, "comment": 0.5}
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "in",
+    "is", "it", "of", "on", "or", "that", "the", "this", "to", "was", "with",
+}
+TOKEN = re.compile(r"\w+", re.UNICODE)
+MAX_TERM_LENGTH = 50
+SNIPPET_RADIUS = 60
+
+def tokenize(text: str):
+    if not text:
+        return []
+    return [
+        token[:MAX_TERM_LENGTH]
+        for token in TOKEN.findall(text.lower())
+        if len(token) > 1 and token not in STOPWORDS
+    ]
+
+def term_frequencies(text: str):
+    frequencies = {}
+    for term in tokenize(text):
+        frequencies[term] = frequencies.get(term, 0) + 1
+    return frequencies
+
+# Replace the index rows of one source (title or description) of a ticket
+def index_field(db: Session, ticket_id: int, source: str, text: str):
+    db.query(models.TicketSearchTerm).filter(
+        models.TicketSearchTerm.ticket_id == ticket_id,
+        models.TicketSearchTerm.source == source
+    ).delete(synchronize_session=False)
+
+    frequencies = term_frequencies(text)
+    if frequencies:
+        db.execute(insert(models.TicketSearchTerm), [
+            {"term": term, "ticket_id": ticket_id, "source": source, "frequency": frequency}
+            for term, frequency in frequencies.items()
+        ])
+
+def index_ticket(db: Session, ticket):
+    index_field(db, ticket.ticket_id, "title", ticket.title)
+    index_field(db, ticket.ticket_id, "description", ticket.description)
+
+# Comments of a ticket share one "comment" source, so frequencies add up
+def index_comment(db: Session, ticket_id: int, content: str):
+    frequencies = term_frequencies(content)
+    if not frequencies:
+        return
+
+    existing = dict(db.query(
+        models.TicketSearchTerm.term,
+        models.TicketSearchTerm.frequency
+    ).filter(
+        models.TicketSearchTerm.ticket_id == ticket_id,
+        models.TicketSearchTerm.source == "comment",
+        models.TicketSearchTerm.term.in_(frequencies)
+    ).all())
+
+    for term in existing:
+        db.query(models.TicketSearchTerm).filter(
+            models.TicketSearchTerm.ticket_id == ticket_id,
+            models.TicketSearchTerm.source == "comment",
+            models.TicketSearchTerm.term == term
+        ).update(
+            {"frequency": models.TicketSearchTerm.frequency + frequencies[term]},
+            synchronize_session=False
+        )
+
+    new_terms = [term for term in frequencies if term not in existing]
+    if new_terms:
+        db.execute(insert(models.TicketSearchTerm), [
+            {"term": term, "ticket_id": ticket_id, "source": "comment", "frequency": frequencies[term]}
+            for term in new_terms
+        ])
+
+# Recreate the whole index; commits once per batch of tickets
+def rebuild_index(db: Session, batch_size: int = 500) -> int:
+    db.query(models.TicketSearchTerm).delete(synchronize_session=False)
+    db.commit()
+
+    indexed = 0
+    last_id = 0
+    while True:
+        tickets = db.query(models.Ticket).filter(
+            models.Ticket.ticket_id > last_id
+        ).order_by(models.Ticket.ticket_id).limit(batch_size).all()
+        if not tickets:
+            break
+
+        ticket_ids = [ticket.ticket_id for ticket in tickets]
+        comments = {}
+        for ticket_id, content in db.query(models.Comment.ticket_id, models.Comment.content).filter(
+            models.Comment.ticket_id.in_(ticket_ids),
+            models.Comment.is_deleted == False
+        ):
+            comments.setdefault(ticket_id, []).append(content or "")
+
+        rows = []
+        for ticket in tickets:
+            for source, text in (
+                ("title", ticket.title),
+                ("description", ticket.description),
+                ("comment", "\n".join(comments.get(ticket.ticket_id, [])))
+            ):
+                rows.extend(
+                    {"term": term, "ticket_id": ticket.ticket_id, "source": source, "frequency": frequency}
+                    for term, frequency in term_frequencies(text).items()
+                )
+        if rows:
+            db.execute(insert(models.TicketSearchTerm), rows)
+        db.commit()
+
+        indexed += len(tickets)
+        last_id = ticket_ids[-1]
+    return indexed
+
+# Short excerpt around the first match with the matched terms wrapped in <mark>.
+# Matches are found on the raw text and each piece is escaped on its own, so
+# a term can never match inside an entity such as &amp;.
+def snippet(text: str, terms) -> str:
+    if not text:
+        return ""
+    pattern = re.compile(r"\b(" + "|".join(re.escape(term) for term in terms) + r")\b", re.IGNORECASE | re.UNICODE)
+    match = pattern.search(text)
+    start = max(0, match.start() - SNIPPET_RADIUS) if match else 0
+    end = min(len(text), (match.end() if match else 0) + SNIPPET_RADIUS)
+    excerpt = text[start:end]
+    pieces = []
+    position = 0
+    for found in pattern.finditer(excerpt):
+        pieces.append(html.escape(excerpt[position:found.start()]))
+        pieces.append(f"<mark>{html.escape(found.group(0))}</mark>")
+        position = found.end()
+    pieces.append(html.escape(excerpt[position:]))
+    return ("…" if start > 0 else "") + "".join(pieces) + ("…" if end < len(text) else "")
+
+def search(db: Session, query: str, current_user, skip: int = 0, limit: int = 20):
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return []
+    term_column = models.TicketSearchTerm.term
+
+    # Tickets per term, read from the (term, ...) primary key
+    document_frequency = dict(db.query(
+        term_column, func.count(func.distinct(models.TicketSearchTerm.ticket_id))
+    ).filter(term_column.in_(terms)).group_by(term_column).all())
+    if not document_frequency:
+        return []
+    # Ticket total from the ticket counters instead of counting the table
+    total = db.query(func.sum(models.TicketStats.count)).filter(models.TicketStats.owner_id == 0).scalar() or 1
+
+    # BM25-style score summed per ticket in SQL, so only one page comes back
+    idf = case(
+        {term: math.log(1 + total / count) for term, count in document_frequency.items()},
+        value=term_column, else_=0.0
+    )
+    weight = case(SOURCE_WEIGHTS, value=models.TicketSearchTerm.source, else_=1.0)
+    frequency = models.TicketSearchTerm.frequency * 1.0
+    score = func.sum(weight * idf * frequency / (frequency + 1.2)).label("score")
+
+    ranked = db.query(models.TicketSearchTerm.ticket_id, score).join(
+        models.Ticket, models.Ticket.ticket_id == models.TicketSearchTerm.ticket_id
+    ).filter(
+        term_column.in_(list(document_frequency)),
+        models.Ticket.is_deleted == False
+    )
+    # Same visibility as the ticket list: regular users see their own tickets
+    if current_user.role == "user":
+        ranked = ranked.filter(models.Ticket.created_by == current_user.user_id)
+    ranked = ranked.group_by(models.TicketSearchTerm.ticket_id).order_by(
+        score.desc(), models.TicketSearchTerm.ticket_id.desc()
+    ).offset(skip).limit(limit).all()
+    if not ranked:
+        return []
+
+    ticket_ids = [ticket_id for ticket_id, _ in ranked]
+    tickets = {
+        ticket.ticket_id: ticket
+        for ticket in db.query(models.Ticket).filter(models.Ticket.ticket_id.in_(ticket_ids))
+    }
+    sources = {}
+    for ticket_id, source in db.query(models.TicketSearchTerm.ticket_id, models.TicketSearchTerm.source).filter(
+        models.TicketSearchTerm.ticket_id.in_(ticket_ids),
+        term_column.in_(terms)
+    ).distinct():
+        sources.setdefault(ticket_id, set()).add(source)
+
+    # Comment text is only needed for hits that matched nowhere else
+    comment_only = [
+        ticket_id for ticket_id in ticket_ids
+        if sources[ticket_id] == {"comment"}
+    ]
+    comment_text = {}
+    if comment_only:
+        for ticket_id, content in db.query(models.Comment.ticket_id, models.Comment.content).filter(
+            models.Comment.ticket_id.in_(comment_only),
+            models.Comment.is_deleted == False
+        ).order_by(models.Comment.created_at):
+            if ticket_id not in comment_text and any(term in tokenize(content) for term in terms):
+                comment_text[ticket_id] = content
+
+    results = []
+    for ticket_id, value in ranked:
+        ticket = tickets[ticket_id]
+        if "title" in sources[ticket_id] and "description" not in sources[ticket_id]:
+            text = ticket.title
+        elif ticket_id in comment_text:
+            text = comment_text[ticket_id]
+        else:
+            text = ticket.description
+        results.append((value, ticket, snippet(text, terms)))
+    return results
@@ -0,0 +1,170 @@
+import os
+import time
+from threading import Lock
+from typing import Dict, Iterable, Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from . import models, changes
+
+# At most this often a scan first applies inventory changes from change_log
+SERIAL_INDEX_REFRESH_SECONDS = float(os.getenv("SERIAL_INDEX_REFRESH_SECONDS", "1"))
+
+# In-memory serial_number -> part lookup used by the receiving desk scanners.
+# Every worker process holds its own copy: it is built at startup and the
+# inventory handlers update it after they commit. Before resolving a scan it
+# reloads the parts that appear in change_log past its cursor, so writes
+# handled by other workers show up within SERIAL_INDEX_REFRESH_SECONDS.
+# Misses fall back to the unique serial_number index.
+class SerialIndex:
+    def __init__(self, refresh_seconds: float = SERIAL_INDEX_REFRESH_SECONDS):
+        self._by_serial: Dict[str, dict] = {}
+        self._by_part: Dict[int, str] = {}
+        self._lock = Lock()
+        self._refresh_lock = Lock()
+        self.refresh_seconds = refresh_seconds
+        self.cursor = 0
+        self._refreshed_at = 0.0
+        self.ready = False
+
+    @staticmethod
+    def normalize(serial_number: str) -> str:
+        return serial_number.strip().upper()
+
+    @staticmethod
+    def _entry(part_id, serial_number, location, sub_location, status):
+        return {
+            "part_id": part_id,
+            "serial_number": serial_number,
+            "location": location,
+            "sub_location": sub_location,
+            "status": status,
+        }
+
+    # Highest inventory change_id that no transaction can still commit below
+    @staticmethod
+    def settled_cursor(db: Session) -> int:
+        return db.query(func.max(models.ChangeLog.change_id)).filter(
+            models.ChangeLog.entity == "inventory",
+            models.ChangeLog.created_at < changes.settled_before(db)
+        ).scalar() or 0
+
+    def build(self, db: Session, batch_size: int = 10000):
+        # Taken before reading, so changes made during the build are replayed
+        cursor = self.settled_cursor(db)
+        by_serial = {}
+        by_part = {}
+        rows = db.query(
+            models.Inventory.part_id,
+            models.Inventory.serial_number,
+            models.Inventory.location,
+            models.Inventory.sub_location,
+            models.Inventory.status
+        ).yield_per(batch_size)
+        for row in rows:
+            if not row.serial_number:
+                continue
+            key = self.normalize(row.serial_number)
+            by_serial[key] = self._entry(*row)
+            by_part[row.part_id] = key
+
+        # Swap in the new maps in one step so lookups never see a partial build
+        with self._lock:
+            self._by_serial = by_serial
+            self._by_part = by_part
+            self.ready = True
+        self.cursor = cursor
+        self._refreshed_at = time.monotonic()
+        return len(by_serial)
+
+    # Reload the parts changed since the cursor. Changes still inside the
+    # settle window are applied but the cursor stops before them, so they are
+    # read again once every earlier transaction has committed.
+    def refresh(self, db: Session, force: bool = False) -> int:
+        if not force and time.monotonic() - self._refreshed_at < self.refresh_seconds:
+            return 0
+        if not self._refresh_lock.acquire(blocking=False):
+            return 0
+        try:
+            settled = changes.settled_before(db)
+            rows = db.query(
+                models.ChangeLog.change_id, models.ChangeLog.entity_id, models.ChangeLog.created_at
+            ).filter(
+                models.ChangeLog.entity == "inventory",
+                models.ChangeLog.change_id > self.cursor
+            ).order_by(models.ChangeLog.change_id).all()
+            part_ids = {row.entity_id for row in rows}
+            if part_ids:
+                parts = {
+                    part.part_id: part
+                    for part in db.query(models.Inventory).filter(models.Inventory.part_id.in_(part_ids))
+                }
+                for part_id in part_ids:
+                    if part_id in parts:
+                        self.upsert(parts[part_id])
+                    else:
+                        self.discard(part_id)
+            for row in rows:
+                if row.created_at is None or row.created_at.replace(tzinfo=None) >= settled:
+                    break
+                self.cursor = row.change_id
+            self._refreshed_at = time.monotonic()
+            return len(part_ids)
+        finally:
+            self._refresh_lock.release()
+
+    def upsert(self, part):
+        if not part.serial_number:
+            return
+        key = self.normalize(part.serial_number)
+        entry = self._entry(part.part_id, part.serial_number, part.location, part.sub_location, part.status)
+        with self._lock:
+            old_key = self._by_part.get(part.part_id)
+            if old_key is not None and old_key != key:
+                self._by_serial.pop(old_key, None)
+            self._by_serial[key] = entry
+            self._by_part[part.part_id] = key
+
+    def update(self, part_id: int, **fields):
+        with self._lock:
+            key = self._by_part.get(part_id)
+            if key is None:
+                return
+            entry = dict(self._by_serial[key])
+            entry.update(fields)
+            self._by_serial[key] = entry
+
+    def discard(self, part_id: int):
+        with self._lock:
+            key = self._by_part.pop(part_id, None)
+            if key is not None:
+                self._by_serial.pop(key, None)
+
+    def lookup(self, serial_number: str) -> Optional[dict]:
+        return self._by_serial.get(self.normalize(serial_number))
+
+    def resolve(self, db: Session, serial_numbers: Iterable[str]) -> Dict[str, Optional[dict]]:
+        self.refresh(db)
+        results = {}
+        misses = []
+        for serial_number in serial_numbers:
+            entry = self.lookup(serial_number)
+            results[serial_number] = entry
+            if entry is None:
+                misses.append(serial_number)
+
+        # One indexed query for everything this worker hasn't seen yet
+        if misses:
+            candidates = {s.strip() for s in misses} | {self.normalize(s) for s in misses}
+            rows = db.query(models.Inventory).filter(
+                models.Inventory.serial_number.in_(candidates)
+            ).all()
+            for part in rows:
+                self.upsert(part)
+            for serial_number in misses:
+                results[serial_number] = self.lookup(serial_number)
+        return results
+
+    def __len__(self):
+        return len(self._by_serial)
+
+serial_index = SerialIndex()
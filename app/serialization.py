@@ -0,0 +1,54 @@
+from typing import Optional
+from fastapi import Response
+from fastapi.datastructures import Default
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import TypeAdapter
+
+try:
+    import orjson
+except ImportError:  # optional dependency, stdlib json is used without it
+    orjson = None
+
+# JSON rendering for large list responses.
+#
+# Returning ORM objects from a route makes FastAPI validate every row into
+# the response_model, dump it to dicts and hand those to the JSON encoder.
+# Hot list endpoints instead select only the columns the schema needs and
+# call render(): pydantic reads the fields straight off the SQLAlchemy Row
+# tuples (from_attributes) and its Rust serializer writes the bytes, with no
+# ORM instances, intermediate dicts or second encoding pass.
+#
+# Other routes go through DEFAULT_RESPONSE_CLASS. FastAPI releases that
+# deprecate ORJSONResponse already write response_model output to bytes with
+# pydantic, and only while the response class is left at its default, so
+# orjson is only switched in for older releases.
+
+FASTAPI_DUMPS_JSON = hasattr(ORJSONResponse, "__deprecated__")
+
+if orjson is not None and not FASTAPI_DUMPS_JSON:
+    DEFAULT_RESPONSE_CLASS = ORJSONResponse
+else:
+    DEFAULT_RESPONSE_CLASS = Default(JSONResponse)
+
+_adapters = {}
+
+def adapter_for(schema) -> TypeAdapter:
+    adapter = _adapters.get(schema)
+    if adapter is None:
+        adapter = _adapters[schema] = TypeAdapter(schema)
+    return adapter
+
+# Serialize ORM objects or Row tuples the way the route's response_model would
+def render(schema, data) -> bytes:
+    adapter = adapter_for(schema)
+    return adapter.dump_json(adapter.validate_python(data, from_attributes=True))
+
+def json_response(body: bytes, headers: Optional[dict] = None) -> Response:
+    return Response(content=body, media_type="application/json", headers=headers)
+
+# The model's columns that the schema has a field for, in field order. Fields
+# the table doesn't have (counts and the like) are added by the caller as
+# labelled expressions.
+def schema_columns(schema, model):
+    columns = model.__table__.columns
+    return [getattr(model, name) for name in schema.model_fields if name in columns]
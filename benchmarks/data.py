@@ -0,0 +1,185 @@
+import random
+from datetime import datetime, timedelta
+from app.models import (
+    LocationEnum, SubLocationEnum, StatusEnum, TicketCategory, TicketPriority, TicketStatus, NotificationType
+)
+
+# Deterministic synthetic inventory data shared by the benchmark scripts.
+# The same seed always produces the same rows, so results stay comparable
+# between runs and machines.
+
+PRODUCTS = {
+    "Hdd": [
+        ("Seagate", ["Exos 7E8 4TB", "Exos X16 14TB", "Barracuda 2TB", "IronWolf Pro 8TB"]),
+        ("HGST", ["Ultrastar 7K4000 4TB", "Ultrastar He10 10TB", "Travelstar 1TB"]),
+        ("WD", ["Gold 6TB", "Red Plus 4TB", "Ultrastar DC HC550 16TB"]),
+        ("Dell", ["600GB 10K SAS 2.5", "1.2TB 10K SAS", "4TB 7.2K NL-SAS"]),
+    ],
+    "Ram": [
+        ("Samsung", ["16GB DDR4-2666 RDIMM", "32GB DDR4-3200 RDIMM", "64GB DDR4-2933 LRDIMM"]),
+        ("Hynix", ["16GB DDR4-2400 ECC", "32GB DDR4-2933 RDIMM"]),
+        ("Micron", ["8GB DDR3-1600 ECC", "32GB DDR4-3200 RDIMM"]),
+    ],
+    "Switch": [
+        ("Cisco", ["Catalyst 9300 48P", "Nexus 3048", "Catalyst 2960X 24TS"]),
+        ("Juniper", ["EX3400 48T", "QFX5100 48S"]),
+    ],
+    "Server": [
+        ("Dell", ["PowerEdge R640", "PowerEdge R740xd", "PowerEdge R650"]),
+        ("HPE", ["ProLiant DL380 Gen10", "ProLiant DL360 Gen9"]),
+        ("Lenovo", ["ThinkSystem SR650", "System x3650 M5"]),
+    ],
+    "Storage": [("NetApp", ["FAS2750", "AFF A250"]), ("Dell", ["PowerVault ME4024", "Unity XT 380"])],
+    "Blade server": [("HPE", ["BL460c Gen10", "BL460c Gen9"]), ("Dell", ["PowerEdge M640"])],
+    "Firewall": [("Fortinet", ["FortiGate 100F", "FortiGate 60E"]), ("Palo Alto", ["PA-3220", "PA-850"])],
+    "Router": [("Cisco", ["ISR 4331", "ASR 1001-X"]), ("Juniper", ["MX204"])],
+    "Mainboard": [("Supermicro", ["X11DPi-NT", "X10DRi"]), ("Dell", ["R640 Motherboard 0W23H8"])],
+    "Other Module": [("Intel", ["X710-DA2 NIC", "XXV710 25GbE"]), ("Broadcom", ["BCM57416 NIC"])],
+}
+
+SUB_LOCATIONS = {
+    LocationEnum.FIRST_FLOOR.value: [s.value for s in SubLocationEnum if s.value.startswith("1st(")],
+    LocationEnum.THIRD_FLOOR.value: [s.value for s in SubLocationEnum if s.value.startswith("3rd(")],
+    LocationEnum.FAULTY.value: [SubLocationEnum.FAULTY.value],
+}
+
+LETTERS = "ABCDEFGHJKMNPRSTUVWXYZ"
+DIGITS = "0123456789"
+
+def random_part_number(rng: random.Random) -> str:
+    style = rng.randrange(5)
+    if style == 0:  # 0B35950
+        return rng.choice(DIGITS) + rng.choice(LETTERS) + "".join(rng.choices(DIGITS, k=5))
+    if style == 1:  # ST4000NM0035
+        return "ST" + "".join(rng.choices(DIGITS, k=4)) + "".join(rng.choices(LETTERS, k=2)) + "".join(rng.choices(DIGITS, k=4))
+    if style == 2:  # M393A2K40BB1-CRC
+        return "M393A" + rng.choice(DIGITS) + rng.choice(LETTERS) + "".join(rng.choices(DIGITS, k=2)) + "".join(rng.choices(LETTERS, k=2)) + rng.choice(DIGITS) + "-" + "".join(rng.choices(LETTERS, k=3))
+    if style == 3:  # HUS726T4TALA6L4
+        return "HUS" + "".join(rng.choices(DIGITS, k=3)) + rng.choice(LETTERS) + rng.choice(DIGITS) + "".join(rng.choices(LETTERS, k=4)) + rng.choice(DIGITS) + rng.choice(LETTERS) + rng.choice(DIGITS)
+    return "".join(rng.choices(DIGITS, k=2)) + "".join(rng.choices(LETTERS, k=2)) + "".join(rng.choices(DIGITS, k=3))
+
+def make_parts(count: int, seed: int = 42):
+    rng = random.Random(seed)
+    statuses = [s.value for s in StatusEnum]
+    locations = list(SUB_LOCATIONS)
+    # A pool of part numbers shared by many serials, like real stock
+    part_numbers = {
+        part_type: [random_part_number(rng) for _ in range(max(10, count // 200))]
+        for part_type in PRODUCTS
+    }
+
+    for index in range(count):
+        part_type = rng.choice(list(PRODUCTS))
+        vendor, models_ = rng.choice(PRODUCTS[part_type])
+        location = rng.choices(locations, weights=[70, 20, 10])[0]
+        yield {
+            "type": part_type,
+            "name_product": f"{vendor} {rng.choice(models_)}",
+            "part_number": rng.choice(part_numbers[part_type]),
+            "serial_number": f"SN{index:09d}",
+            "location": location,
+            "sub_location": rng.choice(SUB_LOCATIONS[location]),
+            "status": rng.choice(statuses),
+            "health": f"{rng.randint(0, 100)}%",
+        }
+
+# Typical data-entry mistakes: look-alike characters, spacing and case
+def typo(text: str, rng: random.Random) -> str:
+    swaps = {"0": "O", "O": "0", "1": "I", "I": "1"}
+    kind = rng.randrange(4)
+    if kind == 0:
+        positions = [i for i, ch in enumerate(text) if ch in swaps]
+        if positions:
+            i = rng.choice(positions)
+            return text[:i] + swaps[text[i]] + text[i + 1:]
+    if kind == 1:
+        return text.replace(" ", "", 1) if " " in text else text[:2] + " " + text[2:]
+    if kind == 2 and len(text) > 4:
+        i = rng.randrange(1, len(text) - 1)
+        return text[:i] + text[i + 1:]
+    return text.lower()
+
+# Users per role, in the proportions of a real deployment
+ROLE_SHARES = {"admin": 0.025, "engineer": 0.3, "logistic": 0.175, "user": 0.5}
+
+TICKET_PROBLEMS = [
+    "Drive bay LED blinks amber after reseat",
+    "Switch port flapping on uplink",
+    "Server does not POST after RAM upgrade",
+    "Firewall drops VPN tunnel every night",
+    "Storage array reports degraded RAID group",
+    "Cannot log in to inventory portal",
+    "Replacement PSU shows wrong part number",
+    "Blade chassis fan running at full speed",
+]
+COMMENTS = [
+    "Checked cabling, issue persists",
+    "Swapped the part with a tested spare",
+    "Waiting for vendor RMA",
+    "Firmware updated, monitoring",
+    "Confirmed fixed on site",
+]
+
+def make_users(count: int, password_hash: str):
+    users = []
+    for role, share in ROLE_SHARES.items():
+        for i in range(max(1, round(count * share))):
+            users.append({"role": role, "username": f"{role}{i:03d}"})
+    for user_id, user in enumerate(users[:count], 1):
+        yield {
+            "user_id": user_id,
+            "username": user["username"],
+            "email": f"{user['username']}@example.com",
+            "first_name": user["role"].title(),
+            "last_name": f"User {user_id}",
+            "phone": f"+1555{user_id:07d}",
+            "password_hash": password_hash,
+            "role": user["role"],
+            "is_active": True,
+            "is_deleted": False,
+        }
+
+def make_tickets(count: int, owners, seed: int = 42):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    for ticket_id in range(1, count + 1):
+        problem = rng.choice(TICKET_PROBLEMS)
+        yield {
+            "ticket_id": ticket_id,
+            "title": f"{problem} #{ticket_id}",
+            "description": f"{problem}. Reported from rack {rng.randint(1, 40)}, unit {rng.randint(1, 42)}.",
+            "category": rng.choice(list(TicketCategory)),
+            "priority": rng.choices(list(TicketPriority), weights=[40, 35, 20, 5])[0],
+            "status": rng.choices(list(TicketStatus), weights=[30, 25, 25, 15, 5])[0],
+            "created_by": rng.choice(owners),
+            "created_at": start + timedelta(minutes=5 * ticket_id),
+            "is_deleted": False,
+        }
+
+def make_comments(tickets: int, per_ticket: int, authors, seed: int = 43):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    for ticket_id in range(1, tickets + 1):
+        for c in range(rng.randint(0, 2 * per_ticket)):
+            yield {
+                "ticket_id": ticket_id,
+                "content": rng.choice(COMMENTS),
+                "created_by": rng.choice(authors),
+                "created_at": start + timedelta(minutes=5 * ticket_id + c + 1),
+                "is_deleted": False,
+            }
+
+def make_notifications(count: int, users: int, seed: int = 44):
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    for i in range(count):
+        yield {
+            "user_id": rng.randint(1, users),
+            "title": rng.choice(["Low Stock Alert", "Ticket Status Updated", "New Comment", "Part Tested"]),
+            "message": f"Synthetic notification {i}",
+            "notification_type": rng.choice(list(NotificationType)),
+            "is_read": rng.random() < 0.8,
+            "is_deleted": False,
+            "created_by": 1,
+            "created_at": start + timedelta(seconds=30 * i),
+        }
@@ -0,0 +1,85 @@
+import argparse
+import random
+import statistics
+import time
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from app import fuzzy, models
+from benchmarks.data import make_parts, typo
+
+# Fuzzy part search benchmark.
+#
+#   python -m benchmarks.fuzzy_search --parts 500000 --queries 200
+#
+# Seeds a throwaway database (SQLite file by default) with synthetic parts,
+# builds the trigram index over distinct terms, then times fuzzy.search for typo'd part numbers
+# and product names. Reports latency percentiles and how often the intended
+# part number comes back in the top-k.
+
+def seed(db, parts: int, batch_size: int = 10000):
+    batch = []
+    for row in make_parts(parts):
+        batch.append(row)
+        if len(batch) == batch_size:
+            db.execute(insert(models.Inventory), batch)
+            batch = []
+    if batch:
+        db.execute(insert(models.Inventory), batch)
+    db.commit()
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fuzzy part search")
+    parser.add_argument("--database-url", default="sqlite:///fuzzy_bench.db")
+    parser.add_argument("--parts", type=int, default=500000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--reuse", action="store_true", help="skip seeding and indexing")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    db = sessionmaker(bind=engine, autoflush=False)()
+
+    if not args.reuse:
+        tables = [models.Inventory.__table__, models.InventoryTerm.__table__, models.InventoryTrigram.__table__]
+        models.Base.metadata.drop_all(bind=engine, tables=tables)
+        models.Base.metadata.create_all(bind=engine, tables=tables)
+
+        started = time.perf_counter()
+        seed(db, args.parts)
+        print(f"seeded {args.parts} parts in {time.perf_counter() - started:.1f}s")
+
+        started = time.perf_counter()
+        indexed = fuzzy.rebuild_index(db)
+        print(f"indexed {indexed} distinct terms in {time.perf_counter() - started:.1f}s")
+
+    rng = random.Random(7)
+    samples = db.query(models.Inventory.part_number, models.Inventory.name_product).order_by(
+        models.Inventory.part_id
+    ).limit(5000).all()
+
+    timings = []
+    found = 0
+    for _ in range(args.queries):
+        part_number, name_product = rng.choice(samples)
+        target = part_number if rng.random() < 0.7 else name_product
+        query = typo(target, rng)
+
+        started = time.perf_counter()
+        matches = fuzzy.search(db, query, limit=args.limit)
+        timings.append((time.perf_counter() - started) * 1000)
+
+        if any(target in (part.part_number, part.name_product) for _, part in matches):
+            found += 1
+
+    print(f"queries: {len(timings)}  top-{args.limit} hit rate: {found / len(timings):.1%}")
+    print(
+        f"latency ms  p50={statistics.median(timings):.1f}  p95={percentile(timings, 95):.1f}  "
+        f"p99={percentile(timings, 99):.1f}  max={max(timings):.1f}"
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,445 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from app import auth, fuzzy, models, search
+from benchmarks.data import (
+    TICKET_PROBLEMS, make_comments, make_notifications, make_parts, make_tickets, make_users, typo
+)
+
+try:
+    import httpx
+except ImportError:  # the load generator needs it, seeding does not
+    httpx = None
+
+# Load test: realistic data volumes, scripted user journeys.
+#
+#   python -m benchmarks.load --scale 0.05 --users 20 --duration 60
+#   python -m benchmarks.load --reuse --save-baseline main
+#   python -m benchmarks.load --reuse --compare main
+#
+# Seeds the database (dropping its tables first; SQLite file by default, any
+# SQLAlchemy URL with --database-url) with 200 users across the roles, 500k
+# inventory parts, 100k tickets with comments and 1M notifications (all but
+# the users multiplied by --scale), then builds the search indexes and the
+# ticket counters. --reuse keeps an earlier seed.
+#
+# Then --users virtual users each sign in as a seeded user and run journeys
+# back to back, picked by role:
+#   dashboard      ticket stats and summaries, unread count, inventory page
+#   search         part number lookup, fuzzy part search, ticket full-text
+#                  search
+#   status_update  ticket status change; engineers also retest a part
+#   notifications  latest notifications, mark one read
+# and sign in again every --session-journeys journeys. By default the app
+# runs in this process (no network, rate limits off); --url drives a running
+# server instead, which must use the seeded database and be restarted after
+# seeding so its startup caches see the data.
+#
+# Requests in the first --warmup seconds are not counted. The report has
+# p50/p95/p99 latency, throughput and SQL statements (X-Query-Count) per
+# endpoint; latency and statements cover successful responses only, so a
+# fast failure can't pass for a speed-up, and errors are counted apart.
+# --save-baseline writes it to benchmarks/baselines/<name>.json; --compare
+# reports the change against a baseline and exits with status 1 when p95
+# latency or throughput of an endpoint is worse by more than --tolerance, or
+# its error rate went up by more than a percentage point.
+
+PASSWORD = "bench-password"
+VOLUMES = {"users": 200, "parts": 500000, "tickets": 100000, "notifications": 1000000}
+COMMENTS_PER_TICKET = 2
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+JOURNEY_WEIGHTS = {
+    "admin": {"dashboard": 4, "search": 2, "status_update": 2, "notifications": 1},
+    "engineer": {"dashboard": 2, "search": 3, "status_update": 4, "notifications": 1},
+    "logistic": {"dashboard": 2, "search": 5, "status_update": 1, "notifications": 2},
+    "user": {"dashboard": 4, "search": 1, "status_update": 1, "notifications": 4},
+}
+TICKET_STATUSES = [status.value for status in models.TicketStatus]
+PART_STATUSES = [status.value for status in models.StatusEnum]
+
+def make_engine(url: str):
+    if url.startswith("sqlite"):
+        return create_engine(url, connect_args={"check_same_thread": False, "timeout": 30})
+    return create_engine(url, pool_size=20, max_overflow=20)
+
+def insert_batches(db, model, rows, batch_size: int = 10000) -> int:
+    batch = []
+    total = 0
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            db.execute(insert(model), batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        db.execute(insert(model), batch)
+        total += len(batch)
+    return total
+
+def seed(db, volumes: dict):
+    # One bcrypt hash for everyone; hashing 200 passwords would dominate seeding
+    users = list(make_users(volumes["users"], auth.get_password_hash(PASSWORD)))
+    owners = [user["user_id"] for user in users if user["role"] == "user"]
+    staff = [user["user_id"] for user in users if user["role"] in ("admin", "engineer")]
+    steps = [
+        ("users", models.User, users),
+        ("parts", models.Inventory, make_parts(volumes["parts"])),
+        ("tickets", models.Ticket, make_tickets(volumes["tickets"], owners)),
+        ("comments", models.Comment, make_comments(volumes["tickets"], COMMENTS_PER_TICKET, staff)),
+        ("notifications", models.Notification, make_notifications(volumes["notifications"], len(users))),
+    ]
+    for name, model, rows in steps:
+        started = time.perf_counter()
+        count = insert_batches(db, model, rows)
+        db.commit()
+        print(f"seeded {count} {name} in {time.perf_counter() - started:.1f}s")
+
+def build_indexes(db):
+    from app.routers import tickets
+
+    admin = db.query(models.User).filter(models.User.role == "admin").first()
+    for name, rebuild in (
+        ("fuzzy part index", fuzzy.rebuild_index),
+        ("ticket search index", search.rebuild_index),
+        ("ticket counters", lambda db: tickets.rebuild_ticket_stats(db=db, current_user=admin)),
+    ):
+        started = time.perf_counter()
+        rebuild(db)
+        db.commit()
+        print(f"built {name} in {time.perf_counter() - started:.1f}s")
+
+# Values the journeys pick from: seeded users and real search terms
+def load_catalog(db) -> dict:
+    users = db.query(models.User.username, models.User.role).filter(models.User.is_deleted == False).all()
+    parts = db.query(models.Inventory.part_number, models.Inventory.name_product).order_by(
+        models.Inventory.part_id
+    ).limit(5000).all()
+    part_ids = db.query(models.Inventory.part_id).order_by(models.Inventory.part_id).limit(5000).all()
+    return {
+        "users": [(username, role) for username, role in users],
+        "parts": [(part_number, name_product) for part_number, name_product in parts],
+        "part_ids": [part_id for part_id, in part_ids],
+        "words": sorted({word.lower() for problem in TICKET_PROBLEMS for word in problem.split() if len(word) > 3}),
+    }
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+class Recorder:
+    def __init__(self):
+        self.timings = {}
+        self.requests = {}
+        self.errors = {}
+        self.queries = {}
+        self.recording = False
+        self.started_at = None
+        self.elapsed = None
+
+    def start(self):
+        self.recording = True
+        self.started_at = time.perf_counter()
+
+    def stop(self):
+        self.recording = False
+        self.elapsed = time.perf_counter() - self.started_at
+
+    def record(self, endpoint: str, seconds: float, ok: bool, queries):
+        if not self.recording:
+            return
+        self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+        if not ok:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+            return
+        self.timings.setdefault(endpoint, []).append(seconds * 1000)
+        if queries is not None:
+            self.queries.setdefault(endpoint, []).append(int(queries))
+
+    def summary(self) -> dict:
+        endpoints = {}
+        for endpoint, requests in sorted(self.requests.items()):
+            timings = self.timings.get(endpoint)
+            queries = self.queries.get(endpoint)
+            endpoints[endpoint] = {
+                "requests": requests,
+                "errors": self.errors.get(endpoint, 0),
+                "p50_ms": round(statistics.median(timings), 2) if timings else None,
+                "p95_ms": round(percentile(timings, 95), 2) if timings else None,
+                "p99_ms": round(percentile(timings, 99), 2) if timings else None,
+                # Successful responses per second
+                "rps": round(len(timings or ()) / self.elapsed, 2),
+                "queries": round(statistics.mean(queries), 1) if queries else None,
+            }
+        return endpoints
+
+class VirtualUser:
+    def __init__(self, client, recorder: Recorder, catalog: dict, rng: random.Random):
+        self.client = client
+        self.recorder = recorder
+        self.catalog = catalog
+        self.rng = rng
+        self.headers = {}
+        self.role = None
+
+    async def call(self, endpoint: str, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=self.headers, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.record(endpoint, time.perf_counter() - started, False, None)
+            return None
+        ok = response.status_code < 400
+        self.recorder.record(endpoint, time.perf_counter() - started, ok, response.headers.get("x-query-count"))
+        return response if ok else None
+
+    async def login(self):
+        username, self.role = self.rng.choice(self.catalog["users"])
+        self.headers = {}
+        response = await self.call("POST /token", "POST", "/token", data={"username": username, "password": PASSWORD})
+        if response is not None:
+            self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def dashboard(self):
+        await self.call("GET /tickets/stats", "GET", "/tickets/stats")
+        await self.call("GET /tickets/summary", "GET", "/tickets/summary", params={"limit": 20})
+        await self.call("GET /notifications/unread/count", "GET", "/notifications/unread/count")
+        await self.call("GET /inventory/", "GET", "/inventory/", params={"limit": 50, "skip": self.rng.randrange(0, 1000)})
+
+    async def search(self):
+        part_number, name_product = self.rng.choice(self.catalog["parts"])
+        await self.call("GET /inventory/?part_number=", "GET", "/inventory/", params={"part_number": part_number, "limit": 20})
+        target = part_number if self.rng.random() < 0.7 else name_product
+        await self.call("GET /inventory/search/fuzzy", "GET", "/inventory/search/fuzzy", params={"query": typo(target, self.rng)})
+        await self.call("GET /tickets/search", "GET", "/tickets/search", params={"q": self.rng.choice(self.catalog["words"])})
+
+    async def status_update(self):
+        # Regular users only see, and may only edit, their own tickets
+        response = await self.call("GET /tickets/summary", "GET", "/tickets/summary", params={"limit": 20})
+        tickets = response.json() if response is not None else []
+        if tickets:
+            ticket = self.rng.choice(tickets)
+            await self.call(
+                "PUT /tickets/{ticket_id}", "PUT", f"/tickets/{ticket['ticket_id']}",
+                json={"status": self.rng.choice(TICKET_STATUSES)}
+            )
+        if self.role in ("admin", "engineer"):
+            part_id = self.rng.choice(self.catalog["part_ids"])
+            update = {"part_id": part_id, "health": f"{self.rng.randint(50, 100)}%", "status": self.rng.choice(PART_STATUSES)}
+            await self.call("PUT /inventory/status/bulk", "PUT", "/inventory/status/bulk", data={"updates": json.dumps([update])})
+
+    async def notifications(self):
+        response = await self.call("GET /notifications/", "GET", "/notifications/", params={"limit": 20})
+        unread = [n for n in (response.json() if response is not None else []) if not n["is_read"]]
+        if unread:
+            await self.call(
+                "PUT /notifications/{notification_id}/read", "PUT",
+                f"/notifications/{unread[0]['notification_id']}/read"
+            )
+
+    async def run(self, stop_at: float, session_journeys: int, think_seconds: float):
+        loop = asyncio.get_running_loop()
+        while loop.time() < stop_at:
+            await self.login()
+            if not self.headers:
+                continue
+            weights = JOURNEY_WEIGHTS[self.role]
+            for _ in range(session_journeys):
+                if loop.time() >= stop_at:
+                    return
+                journey = self.rng.choices(list(weights), weights=list(weights.values()))[0]
+                await getattr(self, journey)()
+                if think_seconds:
+                    await asyncio.sleep(self.rng.uniform(0, 2 * think_seconds))
+
+async def drive(client, catalog: dict, args) -> Recorder:
+    recorder = Recorder()
+    loop = asyncio.get_running_loop()
+    stop_at = loop.time() + args.warmup + args.duration
+
+    async def start_recording():
+        await asyncio.sleep(args.warmup)
+        recorder.start()
+
+    virtual_users = [
+        VirtualUser(client, recorder, catalog, random.Random(index)) for index in range(args.users)
+    ]
+    await asyncio.gather(
+        start_recording(),
+        *(user.run(stop_at, args.session_journeys, args.think_ms / 1000) for user in virtual_users)
+    )
+    recorder.stop()
+    return recorder
+
+# Run the app's startup and shutdown hooks around an in-process load test
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    messages = asyncio.Queue()
+    started = asyncio.get_running_loop().create_future()
+
+    async def receive():
+        return await messages.get()
+
+    async def send(message):
+        if message["type"] == "lifespan.startup.complete":
+            started.set_result(None)
+        elif message["type"] == "lifespan.startup.failed":
+            started.set_exception(RuntimeError(message.get("message", "startup failed")))
+
+    await messages.put({"type": "lifespan.startup"})
+    task = asyncio.create_task(app({"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}}, receive, send))
+    await started
+    try:
+        yield
+    finally:
+        await messages.put({"type": "lifespan.shutdown"})
+        await task
+
+async def run_load(app, catalog: dict, args) -> Recorder:
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=60, limits=limits) as client:
+            return await drive(client, catalog, args)
+    async with lifespan(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            return await drive(client, catalog, args)
+
+def print_report(endpoints: dict, elapsed: float):
+    print(f"{'endpoint':<44}{'reqs':>7}{'err':>6}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>9}{'sql':>6}")
+    for endpoint, stats in endpoints.items():
+        queries = "-" if stats["queries"] is None else f"{stats['queries']:.1f}"
+        latencies = "".join(
+            f"{'-':>9}" if stats[key] is None else f"{stats[key]:>9.1f}" for key in ("p50_ms", "p95_ms", "p99_ms")
+        )
+        print(
+            f"{endpoint:<44}{stats['requests']:>7}{stats['errors']:>6}{latencies}"
+            f"{stats['rps']:>9.1f}{queries:>6}"
+        )
+    total = sum(stats["requests"] for stats in endpoints.values())
+    errors = sum(stats["errors"] for stats in endpoints.values())
+    print(f"total: {total} requests, {errors} errors in {elapsed:.1f}s ({total / elapsed:.1f} req/s)")
+
+def baseline_path(name: str) -> str:
+    return os.path.join(BASELINE_DIR, f"{name}.json")
+
+def error_rate(stats: dict) -> float:
+    return stats["errors"] / stats["requests"] if stats["requests"] else 0.0
+
+# Endpoints whose p95 or throughput got worse than the baseline by more than
+# tolerance, or that fail more often
+def compare(endpoints: dict, baseline: dict, tolerance: float) -> list:
+    print(f"{'endpoint':<44}{'p95 base':>10}{'p95 now':>10}{'change':>9}{'rps base':>10}{'rps now':>10}{'change':>9}")
+    regressions = []
+    for endpoint, stats in endpoints.items():
+        base = baseline["endpoints"].get(endpoint)
+        if base is None:
+            print(f"{endpoint:<44}{'new':>10}")
+            continue
+        if stats["p95_ms"] is None or base["p95_ms"] is None:
+            # No successful response on one side; only the error rate compares
+            p95_change = 0.0
+        else:
+            p95_change = stats["p95_ms"] / base["p95_ms"] - 1 if base["p95_ms"] else 0.0
+        rps_change = stats["rps"] / base["rps"] - 1 if base["rps"] else 0.0
+        regressed = (
+            p95_change > tolerance or rps_change < -tolerance
+            or error_rate(stats) > error_rate(base) + 0.01
+        )
+        if regressed:
+            regressions.append(endpoint)
+        base_p95 = "-" if base["p95_ms"] is None else f"{base['p95_ms']:.1f}"
+        now_p95 = "-" if stats["p95_ms"] is None else f"{stats['p95_ms']:.1f}"
+        print(
+            f"{endpoint:<44}{base_p95:>10}{now_p95:>10}{p95_change:>+9.0%}"
+            f"{base['rps']:>10.1f}{stats['rps']:>10.1f}{rps_change:>+9.0%}{'  REGRESSION' if regressed else ''}"
+        )
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed realistic data and load test user journeys")
+    parser.add_argument("--database-url", default="sqlite:///load_bench.db")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply the seeded row counts")
+    parser.add_argument("--reuse", action="store_true", help="skip seeding and indexing")
+    parser.add_argument("--url", help="drive a running server instead of the app in this process")
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=60, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="seconds before measuring starts")
+    parser.add_argument("--session-journeys", type=int, default=20, help="journeys between sign-ins")
+    parser.add_argument("--think-ms", type=float, default=0, help="mean pause between journeys")
+    parser.add_argument("--save-baseline", metavar="NAME")
+    parser.add_argument("--compare", metavar="NAME")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args()
+
+    if httpx is None:
+        parser.error("the load generator needs httpx (pip install httpx)")
+    baseline = None
+    if args.compare:
+        with open(baseline_path(args.compare)) as source:
+            baseline = json.load(source)
+
+    engine = make_engine(args.database_url)
+    db = sessionmaker(bind=engine, autoflush=False)()
+    if not args.reuse:
+        models.Base.metadata.drop_all(bind=engine)
+        models.Base.metadata.create_all(bind=engine)
+        # Users stay at full count so every role is represented
+        volumes = {name: max(1, int(count * args.scale)) for name, count in VOLUMES.items()}
+        volumes["users"] = VOLUMES["users"]
+        seed(db, volumes)
+        build_indexes(db)
+    catalog = load_catalog(db)
+    db.close()
+
+    app = None
+    if not args.url:
+        # Point the app at the benchmark database before it is imported
+        os.environ["RATE_LIMIT_ENABLED"] = "0"
+        from app import database
+        database.engine = engine
+        database.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        from app.main import app
+        logging.getLogger("app.sql").setLevel(logging.ERROR)
+
+    print(f"running {args.users} virtual users for {args.duration:.0f}s after {args.warmup:.0f}s warmup")
+    recorder = asyncio.run(run_load(app, catalog, args))
+    endpoints = recorder.summary()
+    print_report(endpoints, recorder.elapsed)
+
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(baseline_path(args.save_baseline), "w") as output:
+            json.dump({
+                "meta": {
+                    "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+                    "database": engine.dialect.name,
+                    "target": args.url or "in-process",
+                    "users": args.users,
+                    "duration": args.duration,
+                    "scale": args.scale,
+                    "python": platform.python_version(),
+                },
+                "endpoints": endpoints,
+            }, output, indent=2)
+        print(f"saved baseline {baseline_path(args.save_baseline)}")
+
+    if baseline is not None:
+        regressions = compare(endpoints, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} endpoints regressed by more than {args.tolerance:.0%}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import argparse
+import json
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import List
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker, selectinload
+from app import models, schemas
+from app.serialization import render, schema_columns, orjson
+
+# Response serialization benchmark.
+#
+#   python -m benchmarks.serialization --rows 1000 --repeat 20
+#
+# Seeds an in-memory database with inventory items, tickets (with comments)
+# and notifications, then reports the median rows/sec for each way of turning
+# a page of rows into JSON bytes:
+#
+#   dicts+json    ORM objects -> model -> dicts -> json.dumps (FastAPI's
+#                 classic response_model path)
+#   dicts+orjson  the same with orjson.dumps (ORJSONResponse)
+#   orm+render    ORM objects -> pydantic dump_json
+#   rows+render   column Row tuples -> pydantic dump_json (app.serialization)
+#
+# Timings include the query, since skipping ORM instances is part of the
+# saving. Tickets embed comments and attachments, so they have no rows path.
+
+CATEGORIES = ["hdd", "ram", "switch", "server", "storage", "cable"]
+
+def seed(db, rows: int, comments_per_ticket: int = 2):
+    rng = random.Random(7)
+    now = datetime(2024, 1, 1)
+    db.execute(insert(models.User), [{
+        "user_id": 1, "username": "bench", "email": "bench@example.com", "first_name": "Bench",
+        "last_name": "User", "phone": "+10000000000", "password_hash": "x", "role": "admin",
+    }])
+    db.execute(insert(models.InventoryItem), [
+        {
+            "name": f"Item {i}", "description": f"Synthetic item {i}", "quantity": rng.randint(0, 500),
+            "unit_price": round(rng.uniform(1, 2000), 2), "category": rng.choice(CATEGORIES),
+            "created_by": 1, "created_at": now + timedelta(minutes=i),
+        }
+        for i in range(rows)
+    ])
+    db.execute(insert(models.Ticket), [
+        {
+            "title": f"Ticket {i}", "description": "Drive bay LED blinks amber after reseat " * 3,
+            "category": rng.choice(list(models.TicketCategory)), "priority": rng.choice(list(models.TicketPriority)),
+            "status": rng.choice(list(models.TicketStatus)), "created_by": 1, "created_at": now + timedelta(minutes=i),
+        }
+        for i in range(rows)
+    ])
+    db.execute(insert(models.Comment), [
+        {"ticket_id": i + 1, "content": f"Checked cabling, comment {c}", "created_by": 1, "created_at": now}
+        for i in range(rows)
+        for c in range(comments_per_ticket)
+    ])
+    db.execute(insert(models.Notification), [
+        {
+            "user_id": 1, "title": "Low Stock Alert", "message": f"Item {i} is below its threshold",
+            "notification_type": rng.choice(list(models.NotificationType)), "created_by": 1,
+            "created_at": now + timedelta(minutes=i),
+        }
+        for i in range(rows)
+    ])
+    db.commit()
+
+def dicts_json(schema, objects) -> bytes:
+    return json.dumps([schema.model_validate(obj).model_dump(mode="json") for obj in objects]).encode()
+
+def dicts_orjson(schema, objects) -> bytes:
+    return orjson.dumps([schema.model_validate(obj).model_dump(mode="json") for obj in objects])
+
+def cases(db, rows: int):
+    def orm(model, *options):
+        def load():
+            db.expunge_all()
+            return db.query(model).options(*options).order_by(model.created_at.desc()).limit(rows).all()
+        return load
+
+    def columns(schema, model):
+        def load():
+            return db.query(*schema_columns(schema, model)).order_by(model.created_at.desc()).limit(rows).all()
+        return load
+
+    ticket_options = (selectinload(models.Ticket.attachments), selectinload(models.Ticket.comments))
+    targets = [
+        ("InventoryResponse", schemas.InventoryResponse, orm(models.InventoryItem),
+         columns(schemas.InventoryResponse, models.InventoryItem)),
+        ("TicketResponse", schemas.TicketResponse, orm(models.Ticket, *ticket_options), None),
+        ("NotificationResponse", schemas.NotificationResponse, orm(models.Notification),
+         columns(schemas.NotificationResponse, models.Notification)),
+    ]
+    for name, schema, load_orm, load_rows in targets:
+        yield name, "dicts+json", load_orm, lambda data, schema=schema: dicts_json(schema, data)
+        if orjson is not None:
+            yield name, "dicts+orjson", load_orm, lambda data, schema=schema: dicts_orjson(schema, data)
+        yield name, "orm+render", load_orm, lambda data, schema=schema: render(List[schema], data)
+        if load_rows is not None:
+            yield name, "rows+render", load_rows, lambda data, schema=schema: render(List[schema], data)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark list response serialization")
+    parser.add_argument("--database-url", default="sqlite://")
+    parser.add_argument("--rows", type=int, default=1000, help="rows per page")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine, autoflush=False)()
+    seed(db, args.rows)
+
+    print(f"{'schema':<22}{'path':<14}{'rows/s':>12}{'ms/page':>10}{'KiB':>8}")
+    for name, path, load, dump in cases(db, args.rows):
+        dump(load())  # warm up adapters and statement caches
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            body = dump(load())
+            timings.append(time.perf_counter() - started)
+        elapsed = statistics.median(timings)
+        print(f"{name:<22}{path:<14}{args.rows / elapsed:>12,.0f}{elapsed * 1000:>10.1f}{len(body) / 1024:>8.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import argparse
+import glob
+import inspect
+import logging
+import multiprocessing
+import os
+import tempfile
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:  # optional dependency, uvicorn's own supervisor is used without it
+    BaseApplication = None
+
+# Production server:
+#
+#   python serve.py --workers 8 --bind 0.0.0.0:8000
+#
+# Runs the API in several worker processes (default: WEB_CONCURRENCY or the
+# CPU count). Each worker is recycled after --max-requests requests, plus a
+# random jitter so they don't all restart at once, to bound memory growth.
+# Use run.py for development with auto-reload.
+#
+# With gunicorn installed, the app is imported once in the master and the
+# workers fork from it (preload). Restarts without dropping requests:
+#   kill -HUP <master>    replace the workers one generation at a time;
+#                         with preload they keep the code the master loaded
+#   kill -USR2 <master>   start a new master on the new code next to the
+#                         old one, then kill -TERM the old master once the
+#                         new workers answer /health/ready
+# Without gunicorn, uvicorn's supervisor runs the workers: every worker
+# imports the app itself, and SIGHUP restarts the workers.
+#
+# Load balancers should probe /health/live (the process answers) and
+# /health/ready (startup finished and the database answers).
+#
+# Each worker keeps some state in its own memory. With more than one worker,
+# OTP_BACKEND=memory is refused (a reset could reach another worker than the
+# request for its code), and the response cache and rate limits should be
+# shared through REDIS_URL and RATE_LIMIT_REDIS_URL; without them a worker
+# may serve a cached body another worker already invalidated, for up to
+# CACHE_TTL_SECONDS, and a client gets up to N times its rate limit.
+#
+# With more than one worker, metrics go through PROMETHEUS_MULTIPROC_DIR so
+# /metrics reports all workers; a fresh temporary directory is used unless
+# the variable is already set, in which case its old files are removed.
+
+APP = "app.main:app"
+
+def default_workers() -> int:
+    return int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+
+# Refuse or warn about per-process state that breaks with several workers;
+# reads the environment only, so nothing is imported before the metrics dir
+# is set up
+def check_worker_state(parser, workers: int):
+    if workers <= 1:
+        return
+    if os.getenv("OTP_BACKEND", "db") == "memory":
+        parser.error("OTP_BACKEND=memory only works with --workers 1; use OTP_BACKEND=db")
+    logger = logging.getLogger("serve")
+    if os.getenv("CACHE_ENABLED", "1").lower() not in ("0", "false", "no", "off") and not os.getenv("REDIS_URL"):
+        logger.warning("REDIS_URL is not set: each of the %s workers keeps its own response cache", workers)
+    if os.getenv("RATE_LIMIT_ENABLED", "1").lower() not in ("0", "false", "no", "off") and not os.getenv("RATE_LIMIT_REDIS_URL"):
+        logger.warning("RATE_LIMIT_REDIS_URL is not set: each of the %s workers counts rate limits on its own", workers)
+
+def uvicorn_worker_class() -> str:
+    try:
+        import uvicorn_worker  # noqa: F401 - the maintained home of the worker class
+        return "uvicorn_worker.UvicornWorker"
+    except ImportError:
+        return "uvicorn.workers.UvicornWorker"
+
+# Must run before anything imports prometheus_client
+def prepare_metrics_dir(workers: int):
+    directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        for path in glob.glob(os.path.join(directory, "*.db")):
+            os.remove(path)
+    elif workers > 1:
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="metrics-")
+
+# Lets the livesum gauges drop a worker gunicorn has reaped
+def child_exit(server, worker):
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(worker.pid)
+
+# With preload the master imported the app, and its pool may already hold
+# connections (create_all, startup checks). A forked worker must not share
+# them, so it drops its copies without closing the master's sockets.
+def post_fork(server, worker):
+    from app import database
+    database.engine.dispose(close=False)
+
+class GunicornServer(BaseApplication or object):
+    def __init__(self, options: dict):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from app.main import app
+        return app
+
+def serve_gunicorn(args):
+    GunicornServer({
+        "bind": args.bind,
+        "workers": args.workers,
+        "worker_class": uvicorn_worker_class(),
+        "preload_app": True,
+        "keepalive": args.keepalive,
+        "backlog": args.backlog,
+        "max_requests": args.max_requests,
+        "max_requests_jitter": args.max_requests_jitter,
+        "graceful_timeout": args.graceful_timeout,
+        "timeout": args.timeout,
+        "accesslog": "-" if args.access_log else None,
+        "post_fork": post_fork,
+        "child_exit": child_exit,
+    }).run()
+
+def serve_uvicorn(args):
+    import uvicorn
+
+    host, _, port = args.bind.rpartition(":")
+    options = {
+        "host": host or "0.0.0.0",
+        "port": int(port),
+        "workers": args.workers,
+        "timeout_keep_alive": args.keepalive,
+        "backlog": args.backlog,
+        "limit_max_requests": args.max_requests or None,
+        "limit_max_requests_jitter": args.max_requests_jitter,
+        "timeout_graceful_shutdown": args.graceful_timeout,
+        "access_log": args.access_log,
+        "proxy_headers": True,
+    }
+    # Older uvicorn releases lack some of these settings
+    supported = inspect.signature(uvicorn.run).parameters
+    uvicorn.run(APP, **{key: value for key, value in options.items() if key in supported})
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API with several worker processes")
+    parser.add_argument("--bind", default=os.getenv("BIND", "0.0.0.0:8000"), help="host:port")
+    parser.add_argument("--workers", type=int, default=default_workers())
+    parser.add_argument("--keepalive", type=int, default=int(os.getenv("KEEPALIVE_SECONDS", "5")),
+                        help="seconds an idle keep-alive connection stays open")
+    parser.add_argument("--backlog", type=int, default=int(os.getenv("BACKLOG", "2048")),
+                        help="pending connections the socket queues")
+    parser.add_argument("--max-requests", type=int, default=int(os.getenv("MAX_REQUESTS", "10000")),
+                        help="recycle a worker after this many requests (0 disables)")
+    parser.add_argument("--max-requests-jitter", type=int, default=int(os.getenv("MAX_REQUESTS_JITTER", "1000")))
+    parser.add_argument("--graceful-timeout", type=int, default=int(os.getenv("GRACEFUL_TIMEOUT", "30")),
+                        help="seconds in-flight requests get to finish on restart or shutdown")
+    parser.add_argument("--timeout", type=int, default=int(os.getenv("WORKER_TIMEOUT", "60")),
+                        help="gunicorn only: restart a worker that is silent this long")
+    parser.add_argument("--access-log", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    check_worker_state(parser, args.workers)
+    prepare_metrics_dir(args.workers)
+    if BaseApplication is not None:
+        serve_gunicorn(args)
+    else:
+        serve_uvicorn(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import os
+import sys
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+os.environ["RATE_LIMIT_ENABLED"] = "0"
+
+# Point the app at an in-memory SQLite database before it is imported
+from app import database
+
+database.engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+database.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=database.engine)
+
+from fastapi.testclient import TestClient
+from app import auth, models
+from app.cache import response_cache
+from app.main import app
+
+@pytest.fixture
+def db():
+    models.Base.metadata.drop_all(bind=database.engine)
+    models.Base.metadata.create_all(bind=database.engine)
+    session = database.SessionLocal()
+    session.add(models.User(
+        user_id=1, username="admin", email="admin@example.com", first_name="Admin", last_name="User",
+        password_hash=auth.get_password_hash("password"), role="admin", is_active=True, is_deleted=False
+    ))
+    session.commit()
+    # Cached bodies of an earlier test's rows must not answer for this one
+    response_cache.clear()
+    yield session
+    session.close()
+
+@pytest.fixture
+def client(db):
+    with TestClient(app) as client:
+        yield client
+
+@pytest.fixture
+def admin_headers(db):
+    return {"Authorization": "Bearer " + auth.create_access_token({"sub": "admin"})}
+
+# Add a user with the given role and return auth headers for it, e.g.
+# user_headers("staff") or user_headers("user", username="bob")
+@pytest.fixture
+def user_headers(db):
+    def make(role: str, username: str = None):
+        username = username or role
+        db.add(models.User(
+            username=username, email=f"{username}@example.com", first_name=username.title(), last_name="User",
+            password_hash=auth.get_password_hash("password"), role=role, is_active=True, is_deleted=False
+        ))
+        db.commit()
+        return {"Authorization": "Bearer " + auth.create_access_token({"sub": username})}
+    return make
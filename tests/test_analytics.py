@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+
+from app import models
+
+# The failure rate rollup folds in settled results only, counts each result
+# once across refreshes and agrees with a rebuild
+
+def add_results(client, headers, test_id, *outcomes):
+    for outcome in outcomes:
+        response = client.post(f"/tests/{test_id}/results", json={"result": outcome}, headers=headers)
+        assert response.status_code == 200, response.text
+
+def settle(db):
+    db.query(models.TestResult).update({models.TestResult.created_at: datetime.utcnow() - timedelta(minutes=1)})
+    db.commit()
+
+def refresh(client, headers, **params):
+    response = client.post("/analytics/test-failures/refresh", params=params, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def rates(client, headers):
+    response = client.get("/analytics/test-failures", params={"group_by": "test_type"}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["rates"]
+
+def test_refresh_folds_in_settled_results(client, db, admin_headers):
+    test_id = client.post("/tests/", json={"title": "Boot", "description": "Boots", "test_type": "system"}, headers=admin_headers).json()["test_id"]
+    add_results(client, admin_headers, test_id, "pass", "FAIL", "error", "skipped")
+
+    # Just added, so still inside the settle window
+    assert refresh(client, admin_headers)["results"] == 0
+    settle(db)
+    assert refresh(client, admin_headers) == {"results": 4, "last_result_id": 4}
+    assert refresh(client, admin_headers)["results"] == 0
+
+    add_results(client, admin_headers, test_id, "pass")
+    settle(db)
+    assert refresh(client, admin_headers)["results"] == 1
+    expected = [{
+        "window_start": None, "part_type": None, "part_number": None, "name_product": None,
+        "test_type": "system", "total": 5, "passed": 2, "failed": 2, "failure_rate": 0.5
+    }]
+    assert rates(client, admin_headers) == expected
+
+    assert refresh(client, admin_headers, rebuild=True) == {"results": 5, "last_result_id": 5}
+    assert rates(client, admin_headers) == expected
+
+def test_unknown_dimension_is_rejected(client, db, admin_headers):
+    response = client.get("/analytics/test-failures", params={"group_by": "vendor"}, headers=admin_headers)
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Cannot group by vendor")
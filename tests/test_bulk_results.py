@@ -0,0 +1,86 @@
+import json
+
+from app import models
+from app.routers import tests as tests_router
+
+# NDJSON result uploads: bad lines are reported and skipped, limits answer
+# 413, and batches before a 413 stay committed
+
+def create_test(client, headers, title="Boot test"):
+    response = client.post("/tests/", json={"title": title, "description": "Boots", "test_type": "system"}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["test_id"]
+
+def upload(client, headers, body):
+    if isinstance(body, list):
+        body = "\n".join(line if isinstance(line, str) else json.dumps(line) for line in body).encode()
+    return client.post(
+        "/tests/results/bulk", content=body,
+        headers={**headers, "Content-Type": "application/x-ndjson"}
+    )
+
+def test_bad_lines_are_reported_and_skipped(client, db, admin_headers):
+    test_id = create_test(client, admin_headers)
+    body = b"\n".join([
+        json.dumps({"test_id": test_id, "result": "pass"}).encode(),
+        b"{not json",
+        b"\xff\xfe",
+        b"",
+        json.dumps({"test_id": test_id}).encode(),
+        json.dumps({"test_id": 999, "result": "pass"}).encode(),
+        json.dumps({"test_id": test_id, "result": "fail", "notes": "Timed out"}).encode(),
+    ])
+    response = upload(client, admin_headers, body)
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert result["accepted"] == 2
+    assert result["rejected"] == 4
+    assert result["tests_updated"] == 1
+    assert [(error["line"], error["detail"]) for error in result["errors"]] == [
+        (2, "Invalid JSON"),
+        (3, "Invalid JSON"),
+        (5, "result: Field required"),
+        (6, "Test not found"),
+    ]
+    assert db.query(models.TestResult).filter(models.TestResult.test_id == test_id).count() == 2
+    assert db.query(models.Test.status).filter(models.Test.test_id == test_id).scalar() == models.TestStatus.COMPLETED
+
+def test_users_may_not_add_results_to_other_tests(client, db, admin_headers, user_headers):
+    test_id = create_test(client, admin_headers)
+    bob = user_headers("user", username="bob")
+    result = upload(client, bob, [{"test_id": test_id, "result": "pass"}]).json()
+    assert result["accepted"] == 0
+    assert result["errors"] == [{"line": 1, "detail": "Not enough permissions"}]
+
+def test_owner_gets_one_notification(client, db, admin_headers, user_headers):
+    bob = user_headers("user", username="bob")
+    first = create_test(client, bob, title="First")
+    second = create_test(client, bob, title="Second")
+    result = upload(client, admin_headers, [
+        {"test_id": first, "result": "pass"},
+        {"test_id": first, "result": "pass"},
+        {"test_id": second, "result": "fail"},
+    ]).json()
+    assert result["notifications"] == 1
+
+    owner_id = db.query(models.User.user_id).filter(models.User.username == "bob").scalar()
+    notifications = db.query(models.Notification).filter(
+        models.Notification.user_id == owner_id,
+        models.Notification.title == "New Test Results Added"
+    ).all()
+    assert [notification.message for notification in notifications] == ["3 new results have been added to 2 of your tests"]
+
+def test_oversized_line_is_rejected(client, db, admin_headers):
+    test_id = create_test(client, admin_headers)
+    line = json.dumps({"test_id": test_id, "result": "pass", "notes": "x" * tests_router.MAX_RESULT_LINE_BYTES})
+    response = upload(client, admin_headers, [{"test_id": test_id, "result": "pass"}, line])
+    assert response.status_code == 413
+    assert response.json()["detail"] == f"Line 2 is longer than {tests_router.MAX_RESULT_LINE_BYTES} bytes"
+
+def test_batches_before_the_limit_stay_committed(client, db, admin_headers, monkeypatch):
+    monkeypatch.setattr(tests_router, "BULK_RESULT_BATCH_SIZE", 2)
+    monkeypatch.setattr(tests_router, "MAX_BULK_RESULTS", 3)
+    test_id = create_test(client, admin_headers)
+    response = upload(client, admin_headers, [{"test_id": test_id, "result": "pass"}] * 5)
+    assert response.status_code == 413
+    assert db.query(models.TestResult).filter(models.TestResult.test_id == test_id).count() == 2
@@ -0,0 +1,52 @@
+from app import models
+from app.cache import MemoryBackend, ResponseCache, response_cache
+
+# Cached ticket bodies must follow writes made through the API, writes that
+# skipped this worker's cache, and tag counters dropped from the LRU
+
+def create_ticket(client, headers):
+    response = client.post("/tickets/", json={
+        "title": "Fan noise", "description": "Loud fan", "category": "hardware", "priority": "low"
+    }, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["ticket_id"]
+
+def hits():
+    return response_cache.stats()["namespaces"].get("tickets.detail", {}).get("hits", 0)
+
+def test_comment_invalidates_cached_ticket(client, db, admin_headers):
+    ticket_id = create_ticket(client, admin_headers)
+    assert client.get(f"/tickets/{ticket_id}", headers=admin_headers).json()["comments"] == []
+    before = hits()
+    assert client.get(f"/tickets/{ticket_id}", headers=admin_headers).json()["comments"] == []
+    assert hits() == before + 1
+
+    response = client.post(f"/tickets/{ticket_id}/comments", json={"content": "Replaced the fan"}, headers=admin_headers)
+    assert response.status_code == 200
+    comments = client.get(f"/tickets/{ticket_id}", headers=admin_headers).json()["comments"]
+    assert [comment["content"] for comment in comments] == ["Replaced the fan"]
+
+def test_write_from_another_worker_is_not_served_stale(client, db, admin_headers):
+    ticket_id = create_ticket(client, admin_headers)
+    assert client.get(f"/tickets/{ticket_id}", headers=admin_headers).json()["status"] == "open"
+
+    # Committed without touching this worker's cache, like a write handled elsewhere
+    db.query(models.Ticket).filter(models.Ticket.ticket_id == ticket_id).one().status = "closed"
+    db.commit()
+    assert client.get(f"/tickets/{ticket_id}", headers=admin_headers).json()["status"] == "closed"
+
+def test_invalidate_bumps_tag_version():
+    cache = ResponseCache(MemoryBackend(10))
+    cache.get("tickets.detail", "key", ["ticket:1"]).store(b"old")
+    assert cache.get("tickets.detail", "key", ["ticket:1"]).body == b"old"
+    cache.invalidate("ticket:1")
+    assert cache.get("tickets.detail", "key", ["ticket:1"]).body is None
+
+def test_evicted_tag_does_not_resurrect_old_entries():
+    backend = MemoryBackend(10, max_tags=2)
+    cache = ResponseCache(backend)
+    cache.get("tickets.detail", "key", ["ticket:1"]).store(b"v0")
+    cache.invalidate("ticket:1")
+    cache.invalidate("ticket:2", "ticket:3")
+    assert "ticket:1" not in backend._tags
+    assert cache.get("tickets.detail", "key", ["ticket:1"]).body is None
@@ -0,0 +1,59 @@
+from app import changes
+
+# The change feed pages through change_log by cursor, hides rows that are
+# still inside the settle window and filters by role
+
+def create_ticket(client, headers, title="Fan noise"):
+    response = client.post("/tickets/", json={
+        "title": title, "description": "Loud fan", "category": "hardware", "priority": "low"
+    }, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["ticket_id"]
+
+def feed(client, headers, **params):
+    response = client.get("/changes/", params=params, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def test_cursor_pages_through_changes(client, db, admin_headers, monkeypatch):
+    monkeypatch.setattr(changes, "SETTLE_SECONDS", 0)
+    ids = [create_ticket(client, admin_headers, title=f"Ticket {n}") for n in range(3)]
+
+    seen, cursor, pages = [], 0, 0
+    while True:
+        page = feed(client, admin_headers, since=cursor, limit=2)
+        assert len(page["changes"]) <= 2
+        assert page["cursor"] > cursor
+        seen += [(entry["entity"], entry["entity_id"]) for entry in page["changes"]]
+        cursor, pages = page["cursor"], pages + 1
+        if not page["has_more"]:
+            break
+    assert pages > 1
+    assert [entity_id for entity, entity_id in seen if entity == "ticket"] == ids
+
+    done = feed(client, admin_headers, since=cursor)
+    assert done == {"cursor": cursor, "has_more": False, "changes": []}
+
+def test_latest_change_per_row_wins(client, db, admin_headers, monkeypatch):
+    monkeypatch.setattr(changes, "SETTLE_SECONDS", 0)
+    ticket_id = create_ticket(client, admin_headers)
+    client.put(f"/tickets/{ticket_id}", json={"status": "resolved"}, headers=admin_headers)
+    client.delete(f"/tickets/{ticket_id}", headers=admin_headers)
+
+    tickets = [entry for entry in feed(client, admin_headers)["changes"] if entry["entity"] == "ticket"]
+    assert len(tickets) == 1
+    assert tickets[0]["operation"] == "delete"
+    assert tickets[0]["data"] is None
+
+def test_unsettled_changes_are_held_back(client, db, admin_headers):
+    create_ticket(client, admin_headers)
+    assert feed(client, admin_headers) == {"cursor": 0, "has_more": False, "changes": []}
+
+def test_users_only_see_their_own_tickets(client, db, admin_headers, user_headers, monkeypatch):
+    monkeypatch.setattr(changes, "SETTLE_SECONDS", 0)
+    create_ticket(client, admin_headers)
+    bob = user_headers("user", username="bob")
+    own = create_ticket(client, bob)
+
+    tickets = [entry["entity_id"] for entry in feed(client, bob)["changes"] if entry["entity"] == "ticket"]
+    assert tickets == [own]
@@ -0,0 +1,55 @@
+# Conditional GET: a client holding the current ETag gets 304, and any
+# write to the row or collection changes the ETag
+
+def create_ticket(client, headers, title="Fan noise"):
+    response = client.post("/tickets/", json={
+        "title": title, "description": "Loud fan", "category": "hardware", "priority": "low"
+    }, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["ticket_id"]
+
+def revalidate(client, url, headers, etag):
+    return client.get(url, headers={**headers, "If-None-Match": etag})
+
+def test_detail_is_not_modified_until_written(client, db, admin_headers):
+    ticket_id = create_ticket(client, admin_headers)
+    url = f"/tickets/{ticket_id}"
+    first = client.get(url, headers=admin_headers)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "private, no-cache"
+
+    unchanged = revalidate(client, url, admin_headers, etag)
+    assert unchanged.status_code == 304
+    assert unchanged.headers["etag"] == etag
+    assert revalidate(client, url, admin_headers, f"W/{etag}").status_code == 304
+
+    assert client.put(url, json={"status": "resolved"}, headers=admin_headers).status_code == 200
+    changed = revalidate(client, url, admin_headers, etag)
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert changed.json()["status"] == "resolved"
+
+def test_list_is_not_modified_until_written(client, db, admin_headers):
+    create_ticket(client, admin_headers)
+    first = client.get("/tickets/", headers=admin_headers)
+    etag = first.headers["etag"]
+    assert revalidate(client, "/tickets/", admin_headers, etag).status_code == 304
+
+    create_ticket(client, admin_headers, title="Second")
+    changed = revalidate(client, "/tickets/", admin_headers, etag)
+    assert changed.status_code == 200
+    assert len(changed.json()) == 2
+
+def test_list_etag_depends_on_query_and_user(client, db, admin_headers, user_headers):
+    create_ticket(client, admin_headers)
+    etag = client.get("/tickets/", headers=admin_headers).headers["etag"]
+    assert client.get("/tickets/", params={"status": "open"}, headers=admin_headers).headers["etag"] != etag
+    bob = user_headers("user", username="bob")
+    assert revalidate(client, "/tickets/", bob, etag).status_code == 200
+
+def test_other_users_ticket_is_not_revalidated(client, db, admin_headers, user_headers):
+    ticket_id = create_ticket(client, admin_headers)
+    etag = client.get(f"/tickets/{ticket_id}", headers=admin_headers).headers["etag"]
+    bob = user_headers("user", username="bob")
+    assert revalidate(client, f"/tickets/{ticket_id}", bob, etag).status_code == 403
@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+from app import models
+
+# Quantity changes and reservations take stock with conditional UPDATEs, so
+# stock can never go below zero and a reservation is returned exactly once
+
+def add_item(db, quantity=10):
+    item = models.InventoryItem(name="Bolt", category="hardware", quantity=quantity, unit_price=2.0, created_by=1)
+    db.add(item)
+    db.commit()
+    return item.item_id
+
+def quantity(db, item_id):
+    db.expire_all()
+    return db.get(models.InventoryItem, item_id).quantity
+
+def test_adjust_rejects_going_below_zero(client, db, admin_headers):
+    item_id = add_item(db, quantity=3)
+    response = client.put(f"/inventory/items/{item_id}/quantity/adjust", json={"delta": -2}, headers=admin_headers)
+    assert response.status_code == 200
+    assert response.json()["quantity"] == 1
+    response = client.put(f"/inventory/items/{item_id}/quantity/adjust", json={"delta": -2}, headers=admin_headers)
+    assert response.status_code == 409
+    assert quantity(db, item_id) == 1
+
+def test_adjust_rejects_zero_delta_and_unknown_item(client, db, admin_headers):
+    item_id = add_item(db)
+    assert client.put(f"/inventory/items/{item_id}/quantity/adjust", json={"delta": 0}, headers=admin_headers).status_code == 422
+    assert client.put("/inventory/items/999/quantity/adjust", json={"delta": 1}, headers=admin_headers).status_code == 404
+
+def test_reservation_takes_and_release_returns_stock(client, db, admin_headers):
+    item_id = add_item(db, quantity=5)
+    response = client.post(f"/inventory/items/{item_id}/reservations", json={"quantity": 4}, headers=admin_headers)
+    assert response.status_code == 201
+    reservation_id = response.json()["reservation_id"]
+    assert quantity(db, item_id) == 1
+
+    assert client.post(f"/inventory/items/{item_id}/reservations", json={"quantity": 2}, headers=admin_headers).status_code == 409
+
+    assert client.delete(f"/inventory/reservations/{reservation_id}", headers=admin_headers).status_code == 200
+    assert quantity(db, item_id) == 5
+    # Releasing twice must not return the stock twice
+    assert client.delete(f"/inventory/reservations/{reservation_id}", headers=admin_headers).status_code == 409
+    assert quantity(db, item_id) == 5
+
+def test_fulfilled_reservation_keeps_stock_out(client, db, admin_headers):
+    item_id = add_item(db, quantity=5)
+    reservation_id = client.post(
+        f"/inventory/items/{item_id}/reservations", json={"quantity": 2}, headers=admin_headers
+    ).json()["reservation_id"]
+    assert client.post(f"/inventory/reservations/{reservation_id}/fulfil", headers=admin_headers).status_code == 200
+    assert client.delete(f"/inventory/reservations/{reservation_id}", headers=admin_headers).status_code == 409
+    assert quantity(db, item_id) == 3
+
+def test_expired_reservation_returns_stock_once(client, db, admin_headers):
+    item_id = add_item(db, quantity=5)
+    reservation_id = client.post(
+        f"/inventory/items/{item_id}/reservations", json={"quantity": 5}, headers=admin_headers
+    ).json()["reservation_id"]
+    db.query(models.StockReservation).filter(
+        models.StockReservation.reservation_id == reservation_id
+    ).update({"expires_at": datetime.utcnow() - timedelta(minutes=1)})
+    db.commit()
+
+    assert client.get(f"/inventory/items/{item_id}/reservations", headers=admin_headers).json() == []
+    assert client.get(f"/inventory/items/{item_id}/reservations", headers=admin_headers).json() == []
+    assert quantity(db, item_id) == 5
+    assert client.post(f"/inventory/reservations/{reservation_id}/fulfil", headers=admin_headers).status_code == 409
+
+def test_users_release_only_their_own_reservations(client, db, admin_headers, user_headers):
+    item_id = add_item(db)
+    reservation_id = client.post(
+        f"/inventory/items/{item_id}/reservations", json={"quantity": 1}, headers=admin_headers
+    ).json()["reservation_id"]
+    assert client.delete(f"/inventory/reservations/{reservation_id}", headers=user_headers("user")).status_code == 403
@@ -0,0 +1,52 @@
+import json
+from app import models
+
+# Per-category aggregates are maintained incrementally; a rebuild from the
+# items must agree with them. Low-stock alerts fire when a quantity crosses
+# below its category threshold, not on every change below it.
+
+def create_item(client, headers, name, quantity, unit_price=2.0, category="hardware"):
+    response = client.post("/inventory/items", json={
+        "name": name, "quantity": quantity, "unit_price": unit_price, "category": category
+    }, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["item_id"]
+
+def low_stock_jobs(db):
+    return [
+        json.loads(job.payload) for job in db.query(models.Job).filter(models.Job.kind == "notify_users")
+        if json.loads(job.payload).get("title") == "Low Stock Alert"
+    ]
+
+def test_running_stats_match_rebuild(client, db, admin_headers):
+    bolt = create_item(client, admin_headers, "Bolt", 10)
+    create_item(client, admin_headers, "Cable", 4, unit_price=5.0, category="cables")
+    client.put(f"/inventory/items/{bolt}/quantity/adjust", json={"delta": -3}, headers=admin_headers)
+    client.post(f"/inventory/items/{bolt}/reservations", json={"quantity": 2}, headers=admin_headers)
+
+    running = client.get("/inventory/items/stats", headers=admin_headers).json()
+    assert running["item_count"] == 2
+    assert running["total_quantity"] == 9
+    assert running["total_value"] == 5 * 2.0 + 4 * 5.0
+
+    rebuilt = client.post("/inventory/items/stats/rebuild", headers=admin_headers).json()
+    assert rebuilt == running
+
+def test_low_stock_alert_fires_once_per_crossing(client, db, admin_headers):
+    assert client.put("/inventory/items/thresholds/hardware", json={"threshold": 5}, headers=admin_headers).status_code == 200
+    bolt = create_item(client, admin_headers, "Bolt", 10)
+    assert low_stock_jobs(db) == []
+
+    client.put(f"/inventory/items/{bolt}/quantity/adjust", json={"delta": -6}, headers=admin_headers)
+    alerts = low_stock_jobs(db)
+    assert len(alerts) == 1
+    assert "Bolt (hardware): 4 left, threshold 5" in alerts[0]["message"]
+
+    # Still below the threshold: no new alert
+    client.put(f"/inventory/items/{bolt}/quantity/adjust", json={"delta": -1}, headers=admin_headers)
+    assert len(low_stock_jobs(db)) == 1
+
+def test_new_item_below_threshold_alerts(client, db, admin_headers):
+    client.put("/inventory/items/thresholds/hardware", json={"threshold": 5}, headers=admin_headers)
+    create_item(client, admin_headers, "Nut", 2)
+    assert len(low_stock_jobs(db)) == 1
@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta
+
+from app import jobs, models
+
+# Failing jobs are retried with backoff until max_attempts; jobs whose
+# worker stopped heartbeating are requeued, or failed when out of attempts
+
+def register(monkeypatch, kind, func, max_attempts=2):
+    monkeypatch.setitem(jobs.HANDLERS, kind, jobs.JobHandler(kind, func, 0, None, max_attempts))
+
+def load(db, job_id):
+    db.expire_all()
+    return db.get(models.Job, job_id)
+
+def make_due(db, job_id):
+    db.query(models.Job).filter(models.Job.job_id == job_id).update({models.Job.run_at: datetime.utcnow() - timedelta(seconds=1)})
+    db.commit()
+
+def test_failing_job_backs_off_then_fails(db, monkeypatch):
+    def explode(db, reason):
+        raise RuntimeError(reason)
+    register(monkeypatch, "explode", explode)
+    job = jobs.enqueue(db, "explode", {"reason": "printer on fire"})
+    db.commit()
+    job_id = job.job_id
+
+    started = datetime.utcnow()
+    assert jobs.drain() == 1
+    job = load(db, job_id)
+    assert (job.status, job.attempts) == ("queued", 1)
+    assert job.run_at >= started + timedelta(seconds=jobs.JOB_RETRY_BASE_SECONDS)
+    assert "printer on fire" in job.last_error
+    # Not due again until the backoff has passed
+    assert jobs.drain() == 0
+
+    make_due(db, job_id)
+    assert jobs.drain() == 1
+    job = load(db, job_id)
+    assert (job.status, job.attempts) == ("failed", 2)
+    assert job.finished_at is not None
+
+    assert jobs.retry(db, job_id)
+    job = load(db, job_id)
+    assert (job.status, job.attempts) == ("queued", 0)
+
+def test_successful_job_commits_its_writes(db, monkeypatch):
+    def note(db, message):
+        db.add(models.ActivityLog(user_id=1, action="NOTE", details=message))
+    register(monkeypatch, "note", note)
+    job = jobs.enqueue(db, "note", {"message": "hello"})
+    db.commit()
+    job_id = job.job_id
+
+    assert jobs.drain() == 1
+    assert load(db, job_id).status == "done"
+    assert db.query(models.ActivityLog.details).filter(models.ActivityLog.action == "NOTE").scalar() == "hello"
+
+def test_expired_lease_is_requeued_then_failed(db, monkeypatch):
+    register(monkeypatch, "noop", lambda db: None)
+    job = jobs.enqueue(db, "noop", {})
+    db.commit()
+    job_id = job.job_id
+    stale = datetime.utcnow() - timedelta(seconds=jobs.JOB_LEASE_SECONDS + 1)
+
+    assert jobs.claim(db, "dead-worker").job_id == job_id
+    # A lease that is still being renewed is left alone
+    assert jobs.maintain(db)["expired"] == 0
+    db.query(models.Job).filter(models.Job.job_id == job_id).update({models.Job.locked_at: stale})
+    db.commit()
+    assert jobs.maintain(db)["expired"] == 1
+    job = load(db, job_id)
+    assert (job.status, job.locked_by) == ("queued", None)
+
+    # The second claim uses up the last attempt
+    assert jobs.claim(db, "dead-worker").job_id == job_id
+    db.query(models.Job).filter(models.Job.job_id == job_id).update({models.Job.locked_at: stale})
+    db.commit()
+    assert jobs.maintain(db)["expired"] == 1
+    job = load(db, job_id)
+    assert (job.status, job.attempts) == ("failed", 2)
+    assert job.last_error.startswith("Lease expired")
+
+def test_late_result_of_an_expired_lease_is_discarded(db, monkeypatch):
+    register(monkeypatch, "noop", lambda db: None)
+    job = jobs.enqueue(db, "noop", {})
+    db.commit()
+    job_id = job.job_id
+    job = jobs.claim(db, "slow-worker")
+    claimed = (job.job_id, job.kind, job.payload, job.attempts, job.max_attempts)
+    db.query(models.Job).filter(models.Job.job_id == job_id).update({
+        models.Job.locked_at: datetime.utcnow() - timedelta(seconds=jobs.JOB_LEASE_SECONDS + 1)
+    })
+    db.commit()
+    jobs.maintain(db)
+    assert jobs.claim(db, "other-worker").attempts == 2
+
+    assert jobs.execute(*claimed) is False
+    assert load(db, job_id).status == "running"
@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+from app import jobs, models, otp
+from app.routers import auth as auth_router
+
+# Reset codes allow OTP_MAX_ATTEMPTS guesses and OTP_REQUESTS_PER_WINDOW
+# requests per identity, in either store, and the code never sits in the
+# job queue
+
+@pytest.fixture(params=["memory", "db"])
+def store(request, db):
+    return otp.MemoryOTPStore() if request.param == "memory" else otp.DatabaseOTPStore()
+
+def test_code_is_consumed(store):
+    code = store.issue("admin@example.com")
+    assert store.verify("admin@example.com", code)
+    assert not store.verify("admin@example.com", code)
+
+def test_code_is_dropped_after_max_attempts(store):
+    code = store.issue("admin@example.com")
+    for _ in range(otp.OTP_MAX_ATTEMPTS - 1):
+        assert not store.verify("admin@example.com", "wrong")
+    assert store.verify("admin@example.com", code)
+
+    code = store.issue("admin@example.com")
+    for _ in range(otp.OTP_MAX_ATTEMPTS):
+        assert not store.verify("admin@example.com", "wrong")
+    assert not store.verify("admin@example.com", code)
+
+def test_new_code_replaces_the_old_one(store):
+    old = store.issue("admin@example.com")
+    new = store.issue("admin@example.com")
+    assert old == new or not store.verify("admin@example.com", old)
+    assert store.verify("admin@example.com", new)
+
+def test_requests_are_limited_per_window(store, monkeypatch):
+    for _ in range(otp.OTP_REQUESTS_PER_WINDOW):
+        assert store.allow_request("admin@example.com")
+    assert not store.allow_request("admin@example.com")
+    assert store.allow_request("other@example.com")
+
+    # A new window starts once the old one ran out
+    monkeypatch.setattr(otp, "OTP_REQUEST_WINDOW_SECONDS", 0)
+    store.allow_request("next@example.com")
+    assert store.allow_request("next@example.com")
+
+def test_expired_code_is_rejected(store, monkeypatch):
+    monkeypatch.setattr(otp, "OTP_TTL_SECONDS", -1)
+    code = store.issue("admin@example.com")
+    assert not store.verify("admin@example.com", code)
+
+def test_forgot_password_flow(client, db, monkeypatch):
+    sent = []
+    monkeypatch.setattr(auth_router, "deliver_otp", lambda email_or_phone, code: sent.append((email_or_phone, code)))
+    response = client.post("/auth/forgot-password", json={"email_or_phone": "admin@example.com"})
+    assert response.status_code == 200
+
+    # Only the identity is queued; the code is made and kept by the store
+    payload = json.loads(db.query(models.Job.payload).filter(models.Job.kind == "send_otp").scalar())
+    assert payload == {"email_or_phone": "admin@example.com"}
+    assert jobs.drain() == 1
+    (email_or_phone, code), = sent
+
+    wrong = client.post("/auth/reset-password", json={"email_or_phone": email_or_phone, "otp": "wrong", "new_password": "secret"})
+    assert wrong.status_code == 400
+    reset = client.post("/auth/reset-password", json={"email_or_phone": email_or_phone, "otp": code, "new_password": "secret"})
+    assert reset.status_code == 200
+    assert client.post("/auth/token", data={"username": "admin", "password": "secret"}).status_code == 200
+
+def test_forgot_password_is_rate_limited(client, db):
+    for _ in range(otp.OTP_REQUESTS_PER_WINDOW):
+        assert client.post("/auth/forgot-password", json={"email_or_phone": "nobody@example.com"}).status_code == 200
+    assert client.post("/auth/forgot-password", json={"email_or_phone": "NOBODY@example.com"}).status_code == 429
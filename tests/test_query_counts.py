@@ -0,0 +1,49 @@
+from app import models
+
+# The summary endpoints must not issue a query per row (X-Query-Count
+# comes from the SQL instrumentation in app/instrumentation.py)
+
+def add_tickets(db, count):
+    for i in range(count):
+        ticket = models.Ticket(
+            title=f"Ticket {i}", description="Fan noise", category=models.TicketCategory.HARDWARE,
+            priority=models.TicketPriority.LOW, status=models.TicketStatus.OPEN, created_by=1
+        )
+        db.add(ticket)
+        db.flush()
+        db.add(models.Comment(ticket_id=ticket.ticket_id, content="Checked", created_by=1))
+        db.add(models.Attachment(ticket_id=ticket.ticket_id, file_name="a.txt", file_path="a.txt", created_by=1))
+    db.commit()
+
+def add_tests(db, count):
+    for i in range(count):
+        test = models.Test(
+            title=f"Test {i}", description="Burn-in", test_type=models.TestType.FUNCTIONAL,
+            status=models.TestStatus.PENDING, created_by=1
+        )
+        db.add(test)
+        db.flush()
+        db.add(models.TestResult(test_id=test.test_id, result="pass", created_by=1))
+        db.add(models.Attachment(test_id=test.test_id, file_name="a.txt", file_path="a.txt", created_by=1))
+    db.commit()
+
+def query_count(client, headers, path):
+    response = client.get(path, headers=headers)
+    assert response.status_code == 200, response.text
+    return int(response.headers["X-Query-Count"])
+
+def test_ticket_summary_query_count_is_constant(client, db, admin_headers):
+    add_tickets(db, 2)
+    few = query_count(client, admin_headers, "/tickets/summary")
+    add_tickets(db, 20)
+    many = query_count(client, admin_headers, "/tickets/summary")
+    assert many == few
+    assert many <= 4
+
+def test_test_summary_query_count_is_constant(client, db, admin_headers):
+    add_tests(db, 2)
+    few = query_count(client, admin_headers, "/tests/summary")
+    add_tests(db, 20)
+    many = query_count(client, admin_headers, "/tests/summary")
+    assert many == few
+    assert many <= 4
@@ -0,0 +1,89 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import auth
+from app.ratelimit import MemoryBuckets, RateLimitMiddleware, RateLimitStats, parse_limit
+
+# The suite runs with RATE_LIMIT_ENABLED=0, so these tests wrap a small app
+# in the middleware with limits low enough to hit. An hour-long period keeps
+# buckets from refilling while a test runs.
+
+def make_client(read="2/3600", login="1/3600", write="5/3600", ip="100/3600"):
+    app = FastAPI()
+
+    @app.get("/items")
+    def items():
+        return []
+
+    @app.post("/auth/token")
+    def token():
+        return {}
+
+    @app.get("/healthcheck")
+    def healthcheck():
+        return {"status": "ok"}
+
+    limits = {"read": parse_limit(read), "login": parse_limit(login), "write": parse_limit(write), "ip": parse_limit(ip)}
+    buckets = MemoryBuckets(limits)
+    stats = RateLimitStats()
+    app.add_middleware(RateLimitMiddleware, buckets=buckets, limits=limits, enabled=True, stats=stats)
+    return TestClient(app), buckets, stats
+
+def bearer(username):
+    return {"Authorization": "Bearer " + auth.create_access_token({"sub": username})}
+
+def tokens_left(buckets, key):
+    for shard in buckets._shards:
+        if key in shard:
+            return shard[key][0]
+    return None
+
+def test_sustained_overuse_gets_429_with_retry_after():
+    client, buckets, stats = make_client()
+    alice = bearer("alice")
+    assert client.get("/items", headers=alice).status_code == 200
+    assert client.get("/items", headers=alice).status_code == 200
+
+    rejected = client.get("/items", headers=alice)
+    assert rejected.status_code == 429
+    assert rejected.json() == {"detail": "Too many requests"}
+    # One token refills every 1800 seconds at 2/3600
+    assert 1790 <= int(rejected.headers["retry-after"]) <= 1800
+    assert stats.snapshot() == {"rejected": {"read": 1}}
+
+    # Buckets are per user, and exempt paths are never limited
+    assert client.get("/items", headers=bearer("bob")).status_code == 200
+    assert client.get("/healthcheck", headers=alice).status_code == 200
+
+def test_login_is_limited_per_ip_whatever_the_token():
+    client, buckets, stats = make_client()
+    assert client.post("/auth/token", headers=bearer("alice")).status_code == 200
+    assert client.post("/auth/token", headers=bearer("bob")).status_code == 429
+
+def test_invalid_token_falls_back_to_the_ip():
+    client, buckets, stats = make_client()
+    forged = {"Authorization": "Bearer not-a-token"}
+    assert client.get("/items", headers=forged).status_code == 200
+    assert client.get("/items").status_code == 200
+    assert client.get("/items", headers=forged).status_code == 429
+
+def test_ip_rejection_refunds_the_route_token():
+    client, buckets, stats = make_client(read="5/3600", ip="2/3600")
+    alice = bearer("alice")
+    assert client.get("/items", headers=alice).status_code == 200
+    assert client.get("/items", headers=alice).status_code == 200
+    assert client.get("/items", headers=alice).status_code == 429
+    assert stats.snapshot() == {"rejected": {"ip": 1}}
+    assert tokens_left(buckets, "read:user:alice") == pytest.approx(3, abs=0.01)
+
+def test_disabled_middleware_lets_everything_through():
+    app = FastAPI()
+
+    @app.get("/items")
+    def items():
+        return []
+
+    app.add_middleware(RateLimitMiddleware, limits={name: parse_limit("1/3600") for name in ("read", "login", "write", "ip")}, enabled=False)
+    client = TestClient(app)
+    assert all(client.get("/items").status_code == 200 for _ in range(3))
@@ -0,0 +1,44 @@
+from app import models
+from app.serial_index import serial_index
+
+# The serial index is per process; writes made through another worker only
+# reach it through change_log, which resolve() reads before answering
+
+def add_part(db, serial_number, status="Good"):
+    part = models.Inventory(
+        type="Hdd", name_product="WD Red", part_number="WD8000", serial_number=serial_number,
+        location="1st floor", status=status
+    )
+    db.add(part)
+    db.commit()
+    return part
+
+def scan(client, headers, *serials):
+    response = client.post("/inventory/scan", json={"session_id": "s1", "serial_numbers": list(serials)}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def test_scan_finds_parts_and_reports_unknown_and_duplicates(client, db, admin_headers):
+    add_part(db, "SN-1")
+    serial_index.build(db)
+    result = scan(client, admin_headers, "sn-1", "SN-1", "SN-404")
+    assert [match["serial_number"] for match in result["found"]] == ["SN-1"]
+    assert result["unknown"] == ["SN-404"]
+    assert result["duplicates"] == ["SN-1"]
+
+def test_scan_sees_changes_made_elsewhere(client, db, admin_headers):
+    part = add_part(db, "SN-1")
+    serial_index.build(db)
+
+    # Written without going through this process's index
+    part.status = "Not good"
+    db.commit()
+    add_part(db, "SN-2")
+    serial_index._refreshed_at = 0
+    result = scan(client, admin_headers, "SN-1", "SN-2")
+    assert {match["serial_number"]: match["status"] for match in result["found"]} == {"SN-1": "Not good", "SN-2": "Good"}
+
+    db.delete(part)
+    db.commit()
+    serial_index._refreshed_at = 0
+    assert scan(client, admin_headers, "SN-1")["unknown"] == ["SN-1"]
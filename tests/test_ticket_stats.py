@@ -0,0 +1,46 @@
+# Ticket counters move with every create, update and delete and must agree
+# with a rebuild from the tickets table
+
+def create_ticket(client, headers, category="hardware", priority="low"):
+    response = client.post("/tickets/", json={
+        "title": "Fan noise", "description": "Loud fan", "category": category, "priority": priority
+    }, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["ticket_id"]
+
+def stats(client, headers):
+    response = client.get("/tickets/stats", headers=headers)
+    assert response.status_code == 200
+    body = response.json()
+    body.pop("owner_id")
+    return body
+
+def test_counters_follow_updates_and_deletes(client, db, admin_headers):
+    first = create_ticket(client, admin_headers)
+    second = create_ticket(client, admin_headers, category="network", priority="high")
+    create_ticket(client, admin_headers)
+    assert client.put(f"/tickets/{first}", json={"status": "resolved", "priority": "urgent"}, headers=admin_headers).status_code == 200
+    assert client.delete(f"/tickets/{second}", headers=admin_headers).status_code in (200, 204)
+
+    counted = stats(client, admin_headers)
+    assert counted["total"] == 2
+    assert counted["by_status"] == {"open": 1, "resolved": 1}
+    assert counted["by_priority"] == {"low": 1, "urgent": 1}
+    assert counted["by_category"] == {"hardware": 2}
+
+    rebuilt = client.post("/tickets/stats/rebuild", headers=admin_headers)
+    assert rebuilt.status_code == 200
+    assert stats(client, admin_headers) == counted
+
+def test_users_only_see_their_own_counts(client, db, admin_headers, user_headers):
+    create_ticket(client, admin_headers)
+    bob = user_headers("user", username="bob")
+    create_ticket(client, bob)
+    response = client.get("/tickets/stats", params={"user_id": 1}, headers=bob)
+    assert response.json()["total"] == 1
+
+def test_null_counter_fields_are_rejected(client, db, admin_headers):
+    ticket_id = create_ticket(client, admin_headers)
+    for field in ("status", "priority", "category"):
+        assert client.put(f"/tickets/{ticket_id}", json={field: None}, headers=admin_headers).status_code == 422
+    assert stats(client, admin_headers)["total"] == 1
@@ -0,0 +1,78 @@
+import pytest
+from fastapi import HTTPException
+
+from app import auth, models
+
+# Tokens carry a version; revoking a user's tokens (role change, deletion,
+# password reset) rejects every token issued before, but only once the
+# revoking transaction commits
+
+@pytest.fixture(autouse=True)
+def revocations(monkeypatch):
+    # Counters are per process and user ids repeat across test databases
+    fresh = auth.RevocationSet(sync_seconds=0)
+    monkeypatch.setattr(auth, "revocations", fresh)
+    return fresh
+
+def login(client, username, password="password"):
+    response = client.post("/auth/token", data={"username": username, "password": password})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def bearer(tokens):
+    return {"Authorization": "Bearer " + tokens["access_token"]}
+
+def test_login_tokens_carry_claims(client, db):
+    tokens = login(client, "admin")
+    claims = auth.decode_token(tokens["access_token"])
+    assert (claims["sub"], claims["uid"], claims["role"], claims["ver"]) == ("admin", 1, "admin", 0)
+    assert auth.decode_token(tokens["refresh_token"], token_type="refresh")["type"] == "refresh"
+    assert client.get("/tickets/", headers=bearer(tokens)).status_code == 200
+
+def test_refresh_token_is_not_an_access_token(client, db):
+    tokens = login(client, "admin")
+    assert client.get("/tickets/", headers={"Authorization": "Bearer " + tokens["refresh_token"]}).status_code == 401
+    assert client.post("/auth/refresh", json={"refresh_token": tokens["access_token"]}).status_code == 401
+
+def test_role_change_revokes_old_tokens(client, db):
+    # UserResponse needs a phone number
+    db.add(models.User(
+        username="bob", email="bob@example.com", phone="+15550100200", first_name="Bob", last_name="User",
+        password_hash=auth.get_password_hash("password"), role="user", is_active=True, is_deleted=False
+    ))
+    db.commit()
+    old = login(client, "bob")
+    bob_id = auth.decode_token(old["access_token"])["uid"]
+    admin = login(client, "admin")
+
+    response = client.put(f"/users/{bob_id}/role", json={"new_role": "staff"}, headers=bearer(admin))
+    assert response.status_code == 200, response.text
+    assert client.get("/tickets/", headers=bearer(old)).status_code == 401
+    assert client.post("/auth/refresh", json={"refresh_token": old["refresh_token"]}).status_code == 401
+
+    # Logging in again picks up the new role and version
+    new = login(client, "bob")
+    claims = auth.decode_token(new["access_token"])
+    assert (claims["role"], claims["ver"]) == ("staff", 1)
+    assert client.get("/tickets/", headers=bearer(new)).status_code == 200
+
+def test_refresh_issues_a_working_pair(client, db):
+    tokens = login(client, "admin")
+    response = client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 200
+    refreshed = response.json()
+    assert client.get("/tickets/", headers=bearer(refreshed)).status_code == 200
+    assert auth.decode_token(refreshed["refresh_token"], token_type="refresh")["uid"] == 1
+
+def test_rolled_back_revocation_is_not_applied(db, revocations):
+    auth.revoke_tokens(db, 1)
+    db.rollback()
+    assert revocations.current(1) == 0
+    assert db.query(models.TokenVersion).count() == 0
+
+    auth.revoke_tokens(db, 1)
+    db.commit()
+    assert revocations.current(1) == 1
+    with pytest.raises(HTTPException) as rejected:
+        auth.decode_token(auth.create_access_token({"sub": "admin", "uid": 1, "role": "admin", "ver": 0}))
+    assert rejected.value.status_code == 401
@@ -0,0 +1,23 @@
+import argparse
+import logging
+import signal
+import threading
+from app import main  # noqa: F401 - same setup as the API: tables, change feed, job handlers
+from app.jobs import run_worker
+
+# Job queue worker, run next to the API:
+#
+#   python worker.py --concurrency 4
+#
+# Stops on SIGINT/SIGTERM after the jobs it is running have finished.
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run queued background jobs")
+    parser.add_argument("--concurrency", type=int, default=4, help="jobs run at the same time")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    stop = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    run_worker(concurrency=args.concurrency, stop=stop)